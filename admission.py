@@ -0,0 +1,216 @@
+"""
+Admission Control
+Keeps expensive endpoints (resume analysis, transcription, question
+generation) from taking every worker thread. Each has a concurrency limit
+and a short FIFO queue; a request that finds both full, or that waits in
+the queue too long, is answered at once with 429 and a Retry-After
+estimated from recent service times, before its upload is read.
+
+Under gthread a queued request still holds a thread, as does every open
+interview event stream, so running requests, queued requests and streams
+all count against one budget: the worker's threads minus a reserve that
+only cheap endpoints (job lists, tree fetches, health checks) can use.
+
+A request that hands its upstream work to a background thread (SLO mode)
+keeps its slot until that work finishes (see detach()), so answering early
+does not let more upstream work in.
+"""
+
+import math
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, Callable, Optional, Tuple
+
+import metrics
+import tracing
+
+IN_FLIGHT = metrics.gauge('admission_in_flight', 'Admitted requests running per endpoint', ('endpoint',))
+QUEUE_DEPTH = metrics.gauge('admission_queue_depth', 'Requests waiting for admission per endpoint', ('endpoint',))
+REJECTED = metrics.counter(
+    'admission_rejected_total', 'Requests refused with 429 by endpoint and reason (queue_full, capacity, timeout)',
+    ('endpoint', 'reason'))
+QUEUE_WAIT = metrics.histogram(
+    'admission_queue_wait_seconds', 'Time admitted requests waited in the queue', ('endpoint',),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+
+# Weight of the newest request in an endpoint's average service time
+SERVICE_TIME_SMOOTHING = 0.2
+MAX_RETRY_AFTER = 60
+
+
+class Rejected(Exception):
+    """A request refused admission; retry_after is the suggested wait in seconds."""
+
+    def __init__(self, endpoint: str, reason: str, retry_after: int):
+        super().__init__(f"Too many {endpoint} requests in progress, try again in {retry_after} s")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Endpoint:
+    def __init__(self, limit: int, queue_size: int, service_time: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.running = 0
+        self.waiting: deque = deque()
+        self.service_time = service_time
+
+
+class AdmissionController:
+    """Concurrency limits and bounded queues per endpoint, within a shared thread budget."""
+
+    def __init__(self, limits: Dict[str, Tuple[int, int]], threads: int, reserved: int, max_wait: float,
+                 held_elsewhere: Callable[[], int] = lambda: 0, initial_service_time: float = 5.0):
+        """
+        Args:
+            limits: Endpoint name -> (concurrent requests, queued requests)
+            threads: Worker threads serving requests
+            reserved: Threads kept free for endpoints without limits
+            max_wait: Longest a request waits in a queue before it is refused
+            held_elsewhere: Threads currently held by long-lived responses (e.g. event streams)
+            initial_service_time: Assumed seconds per request until some have finished
+        """
+        self.budget = max(1, threads - reserved)
+        self.max_wait = max_wait
+        self.held_elsewhere = held_elsewhere
+        self._endpoints = {name: _Endpoint(max(1, limit), max(0, queue), initial_service_time)
+                           for name, (limit, queue) in limits.items()}
+        # Threads held by admitted and queued requests of all endpoints
+        self._held = 0
+        self._lock = threading.Lock()
+
+    def limits(self, endpoint: str) -> bool:
+        return endpoint in self._endpoints
+
+    def _spare(self) -> int:
+        return self.budget - self._held - self.held_elsewhere()
+
+    def _retry_after(self, state: _Endpoint) -> int:
+        # Time for the requests ahead to drain through the endpoint's slots
+        ahead = state.running + len(state.waiting) + 1
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(state.service_time * ahead / state.limit)))
+
+    def _reject(self, endpoint: str, state: _Endpoint, reason: str) -> Rejected:
+        REJECTED.inc(endpoint=endpoint, reason=reason)
+        return Rejected(endpoint, reason, self._retry_after(state))
+
+    def acquire(self, endpoint: str) -> float:
+        """
+        Admit a request, waiting in the endpoint's queue if its slots are taken.
+
+        Returns:
+            The admission time, to pass to release()
+
+        Raises:
+            Rejected: If the queue is full, no thread can be spared, or the wait exceeded max_wait
+        """
+        state = self._endpoints[endpoint]
+        with self._lock:
+            if self._spare() <= 0:
+                raise self._reject(endpoint, state, 'capacity')
+            if state.running < state.limit and not state.waiting:
+                state.running += 1
+                self._held += 1
+                IN_FLIGHT.set(state.running, endpoint=endpoint)
+                return time.monotonic()
+            if len(state.waiting) >= state.queue_size:
+                raise self._reject(endpoint, state, 'queue_full')
+            turn = threading.Event()
+            state.waiting.append(turn)
+            self._held += 1
+            QUEUE_DEPTH.set(len(state.waiting), endpoint=endpoint)
+
+        start = time.monotonic()
+        with tracing.span('admission_wait', endpoint=endpoint):
+            turn.wait(self.max_wait)
+        with self._lock:
+            # release() hands the slot over under the lock, so a grant racing the timeout is kept
+            if not turn.is_set():
+                state.waiting.remove(turn)
+                self._held -= 1
+                QUEUE_DEPTH.set(len(state.waiting), endpoint=endpoint)
+                raise self._reject(endpoint, state, 'timeout')
+        QUEUE_WAIT.observe(time.monotonic() - start, endpoint=endpoint)
+        return time.monotonic()
+
+    def release(self, endpoint: str, admitted_at: float):
+        """Free a request's slot, handing it to the next queued request if any."""
+        state = self._endpoints[endpoint]
+        elapsed = time.monotonic() - admitted_at
+        with self._lock:
+            state.service_time += SERVICE_TIME_SMOOTHING * (elapsed - state.service_time)
+            if state.waiting:
+                # The waiter's thread is already counted in _held; ours is freed
+                state.waiting.popleft().set()
+                QUEUE_DEPTH.set(len(state.waiting), endpoint=endpoint)
+            else:
+                state.running -= 1
+                IN_FLIGHT.set(state.running, endpoint=endpoint)
+            self._held -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current usage per endpoint and of the shared budget."""
+        with self._lock:
+            return {
+                'budget': self.budget,
+                'held': self._held,
+                'held_elsewhere': self.held_elsewhere(),
+                'endpoints': {name: {'limit': state.limit, 'running': state.running, 'queued': len(state.waiting),
+                                     'queue_size': state.queue_size, 'service_time': round(state.service_time, 3)}
+                              for name, state in self._endpoints.items()}
+            }
+
+
+def init_app(app, limits: Dict[str, Tuple[int, int]], threads: int, reserved: int, max_wait: float,
+             held_elsewhere: Callable[[], int] = lambda: 0) -> AdmissionController:
+    """
+    Apply admission control to the listed endpoints of a Flask app.
+
+    Args:
+        app: The Flask application
+        limits: Endpoint name -> (concurrent requests, queued requests)
+        threads: Worker threads serving requests
+        reserved: Threads kept free for endpoints without limits
+        max_wait: Longest a request waits in a queue before it gets 429
+        held_elsewhere: Threads currently held by long-lived responses (e.g. event streams)
+    """
+    from flask import g, jsonify, request
+
+    controller = AdmissionController(limits, threads, reserved, max_wait, held_elsewhere)
+
+    @app.before_request
+    def admit():
+        if not controller.limits(request.endpoint):
+            return None
+        try:
+            g.admission = (controller, request.endpoint, controller.acquire(request.endpoint))
+        except Rejected as e:
+            return jsonify({'error': str(e)}), 429, {'Retry-After': str(e.retry_after)}
+        return None
+
+    @app.teardown_request
+    def release(error=None):
+        admitted = g.pop('admission', None)
+        if admitted is not None:
+            admitted[0].release(*admitted[1:])
+
+    return controller
+
+
+def detach() -> Optional[Callable[[], None]]:
+    """
+    Take the current request's admission slot out of request teardown.
+
+    Returns:
+        A function that frees the slot, to call once when the work the request handed off finishes;
+        None if the request holds no slot
+    """
+    from flask import g, has_request_context
+
+    admitted = g.pop('admission', None) if has_request_context() else None
+    if admitted is None:
+        return None
+    controller, endpoint, admitted_at = admitted
+    return lambda: controller.release(endpoint, admitted_at)
@@ -1,16 +1,34 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from flask_cors import CORS
 import json
 import os
-import glob
 import re
-import uuid
-import hashlib
-import requests
+from contextlib import nullcontext
 from pathlib import Path
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 from resume_skill_tree import ResumeSkillTreeGenerator
+import metrics
+import xai_client
+import uploads
+import resilience
+import prompts
+import matching
+import slo
+import question_bank
+import tree_intern
+import interview_sessions
+import interview_stream
+import audio_preprocess
+import search
+import tracing
+import admission
+from matching import find_skill_similarities_simple
+from skill_tree_pack import open_pack, job_key, candidate_key
+from storage import Storage
+from job_index import JobIndex, LRUCache
+from skill_tree_common import (tree_hash, iter_html_visualization, assign_node_ids, node_index,
+                               analysis_patch, similarity_patch)
 
 # Load environment variables from .env file in the root directory
 env_path = os.path.join(os.path.dirname(__file__), '.env')
@@ -24,13 +42,59 @@ def get_api_key():
     return api_key
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['Retry-After', 'X-Trace-Id'])
+metrics.init_app(app)
 
 # Configuration
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
 AUDIO_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads', 'audio')
 CANDIDATE_SKILL_TREES_DIR = os.path.join(os.path.dirname(__file__), 'data', 'candidate_skill_trees')
 JOB_SKILL_TREES_DIR = os.path.join(os.path.dirname(__file__), 'data', 'job_skill_trees')
+DATABASE_PATH = os.getenv('TALENT_POOL_DB', os.path.join(os.path.dirname(__file__), 'data', 'talent_pool.db'))
+SKILL_TREE_PACK_PATH = os.getenv('SKILL_TREE_PACK_PATH', os.path.join(os.path.dirname(__file__), 'data', 'skill_trees.pack'))
+JOB_TREE_CACHE_SIZE = int(os.getenv('JOB_TREE_CACHE_SIZE', '512'))
+HTML_CACHE_SIZE = int(os.getenv('HTML_CACHE_SIZE', '64'))
+MAX_RESUME_BYTES = int(os.getenv('MAX_RESUME_BYTES', str(10 * 1024 * 1024)))
+MAX_AUDIO_BYTES = int(os.getenv('MAX_AUDIO_BYTES', str(25 * 1024 * 1024)))
+UPLOAD_SPOOL_MAX_MEMORY = int(os.getenv('UPLOAD_SPOOL_MAX_MEMORY', str(1024 * 1024)))
+UPLOAD_ORPHAN_MAX_AGE = int(os.getenv('UPLOAD_ORPHAN_MAX_AGE', '3600'))
+# Downmix, resample and trim silence from recordings before transcription (needs ffmpeg; NumPy for trimming)
+AUDIO_PREPROCESS = os.getenv('AUDIO_PREPROCESS', '1').lower() in ('1', 'true', 'yes')
+# Most candidates (or jobs) one batched matching request may compare
+MAX_MATCH_ITEMS = int(os.getenv('MAX_MATCH_ITEMS', '200'))
+# Interview event streams per worker process; each holds a thread for as long as it is open
+MAX_INTERVIEW_STREAMS = int(os.getenv('MAX_INTERVIEW_STREAMS', '4'))
+# Threads per worker (set by main.py) and how many of them only cheap endpoints may use
+WEB_THREADS = int(os.getenv('WEB_THREADS', '8'))
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', '1').lower() in ('1', 'true', 'yes')
+ADMISSION_RESERVED_THREADS = int(os.getenv('ADMISSION_RESERVED_THREADS', '2'))
+# Longest a request waits for a slot of its endpoint before getting 429
+ADMISSION_MAX_WAIT = float(os.getenv('ADMISSION_MAX_WAIT', '5'))
+# Concurrent and queued requests per worker for the endpoints that hold a thread for a long upstream call
+ENDPOINT_ADMISSION = {
+    'upload_resume': (int(os.getenv('UPLOAD_RESUME_CONCURRENCY', '2')), int(os.getenv('UPLOAD_RESUME_QUEUE', '2'))),
+    'transcribe_audio': (int(os.getenv('TRANSCRIBE_CONCURRENCY', '2')), int(os.getenv('TRANSCRIBE_QUEUE', '4'))),
+    'generate_questions': (int(os.getenv('QUESTIONS_CONCURRENCY', '2')), int(os.getenv('QUESTIONS_QUEUE', '4'))),
+    'match_candidates': (int(os.getenv('MATCH_CONCURRENCY', '2')), int(os.getenv('MATCH_QUEUE', '2'))),
+    'match_jobs': (int(os.getenv('MATCH_CONCURRENCY', '2')), int(os.getenv('MATCH_QUEUE', '2')))
+}
+# Time budget for each endpoint's upstream calls; calls past it fail fast and the endpoint uses its fallback
+ENDPOINT_DEADLINES = {
+    'generate_questions': float(os.getenv('QUESTIONS_DEADLINE', '20')),
+    'upload_resume': float(os.getenv('UPLOAD_RESUME_DEADLINE', '45')),
+    'transcribe_audio': float(os.getenv('TRANSCRIBE_DEADLINE', '30'))
+}
+# Latency SLO per endpoint: once it passes, the endpoint answers with its local fallback marked provisional
+# plus a result token, and the xAI result is stored for GET /api/v1/results/<token> when it lands (0 = wait)
+ENDPOINT_SLOS = {
+    'generate_questions': float(os.getenv('QUESTIONS_SLO', '3')),
+    'upload_resume': float(os.getenv('UPLOAD_RESUME_SLO', '5'))
+}
+# Request tracing: sampled traces (trace header or TRACE_SAMPLE_RATE) and slow ones are appended to TRACE_FILE
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', '1').lower() in ('1', 'true', 'yes')
+TRACE_FILE = os.getenv('TRACE_FILE', os.path.join(os.path.dirname(__file__), 'data', 'traces.jsonl'))
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
 ALLOWED_EXTENSIONS = {'pdf'}
 ALLOWED_AUDIO_EXTENSIONS = {'webm', 'mp3', 'wav', 'ogg', 'm4a'}
 
@@ -39,6 +103,112 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(AUDIO_FOLDER, exist_ok=True)
 os.makedirs(CANDIDATE_SKILL_TREES_DIR, exist_ok=True)
 
+# Traced first, so the other request hooks run inside the request's trace (see tracing.py for the headers)
+if TRACING_ENABLED:
+    tracing.init_app(
+        app,
+        TRACE_FILE,
+        sample_rate=float(os.getenv('TRACE_SAMPLE_RATE', '0')),
+        slow_seconds=float(os.getenv('TRACE_SLOW_SECONDS', '2')),
+        max_bytes=int(os.getenv('TRACE_FILE_MAX_BYTES', str(20 * 1024 * 1024))),
+        token=os.getenv('TRACE_TOKEN')
+    )
+
+# Uploads are streamed into size-capped spooled temp files that are removed when the request ends
+uploads.init_app(app, {
+    'upload_resume': MAX_RESUME_BYTES,
+    'transcribe_audio': MAX_AUDIO_BYTES
+}, spool_max_memory=UPLOAD_SPOOL_MAX_MEMORY, spool_dir=UPLOAD_FOLDER)
+
+# Limits and queues for expensive endpoints; open event streams count against the same threads.
+# Registered before the deadlines so a request's deadline starts once it is admitted, not while it queues
+admission_controller = None
+if ADMISSION_ENABLED:
+    admission_controller = admission.init_app(
+        app, ENDPOINT_ADMISSION, WEB_THREADS, ADMISSION_RESERVED_THREADS, ADMISSION_MAX_WAIT,
+        held_elsewhere=lambda: interview_streams.open_count()
+    )
+
+resilience.init_app(app, ENDPOINT_DEADLINES)
+
+# Opt-in request profiling (see profiling.py for the trigger headers)
+if PROFILING_ENABLED:
+    import profiling
+    profiling.init_app(
+        app,
+        PROFILE_DIR,
+        token=os.getenv('PROFILING_TOKEN'),
+        sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', '0')),
+        keep=int(os.getenv('PROFILE_KEEP', '50')),
+        tracemalloc_frames=int(os.getenv('PROFILE_TRACEMALLOC_FRAMES', '0'))
+    )
+
+# Sweeps files orphaned in the upload folders (e.g. by crashed workers)
+upload_janitor = uploads.UploadJanitor([UPLOAD_FOLDER, AUDIO_FOLDER], max_age_seconds=UPLOAD_ORPHAN_MAX_AGE)
+upload_janitor.start()
+
+# Memory-mapped pack of all skill trees (built with `python skill_tree_pack.py build`)
+SKILL_TREE_PACK = open_pack(SKILL_TREE_PACK_PATH)
+
+# Job id -> tree file resolver (one directory scan); picks the file for ids with several
+job_index = JobIndex(JOB_SKILL_TREES_DIR)
+
+# SQLite store for jobs, candidates and analysis results; new and changed JSON files are imported at startup
+storage = Storage(DATABASE_PATH)
+
+def import_tree_files():
+    """Import job and candidate JSON files added or changed since the last import into storage"""
+    counts = storage.import_json_dirs(JOB_SKILL_TREES_DIR, CANDIDATE_SKILL_TREES_DIR, jobs=job_index)
+    if counts['jobs'] or counts['candidates']:
+        print(f"Imported {counts['jobs']} jobs and {counts['candidates']} candidates into {DATABASE_PATH}")
+
+import_tree_files()
+
+# Runs xAI-backed work for SLO-mode endpoints, deferring results that miss the latency budget
+# (a request keeps its admission slot until its background work finishes)
+slo_runner = slo.SLORunner(storage, hold=admission.detach)
+
+# Appends interview events and pushes them to the interview's event streams
+interview_streams = interview_stream.InterviewStreams(storage, MAX_INTERVIEW_STREAMS)
+
+# Parsed job trees
+job_tree_cache = LRUCache(JOB_TREE_CACHE_SIZE, name='job_tree')
+
+# Name -> node id index of each cached job tree, keyed by job id
+node_index_cache = LRUCache(JOB_TREE_CACHE_SIZE, name='node_index')
+
+# Rendered HTML visualizations keyed by tree content hash
+html_cache = LRUCache(HTML_CACHE_SIZE, name='skill_tree_html')
+
+def reload_job_trees():
+    """Reload hook: rescan the job directory, import changed files and drop cached trees after job files change"""
+    global SKILL_TREE_PACK
+    job_index.reload()
+    import_tree_files()
+    # Requests may still be decoding from the old pack; its mapping is closed once they drop it
+    SKILL_TREE_PACK = open_pack(SKILL_TREE_PACK_PATH)
+    job_tree_cache.clear()
+    node_index_cache.clear()
+    tree_intern.job_trees.clear()
+
+# Readiness: caches are warmed once per process (before fork when preloaded) and drained on shutdown
+server_state = {'warm': False, 'draining': False}
+
+def warm_caches():
+    """Parse the job catalog into the job tree cache; returns the number of trees loaded"""
+    loaded = 0
+    for job in storage.list_jobs()[:JOB_TREE_CACHE_SIZE]:
+        if load_job_skill_tree(job['job_id']) is not None:
+            loaded += 1
+    # The catalog's trees now share their duplicate subtrees; the lookup tables are no longer needed
+    tree_intern.job_trees.release()
+    server_state['warm'] = True
+    return loaded
+
+def begin_drain():
+    """Mark the process as shutting down so readiness checks fail while in-flight work finishes"""
+    server_state['draining'] = True
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -46,7 +216,7 @@ def allowed_audio_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_AUDIO_EXTENSIONS
 
 # Default skill tree data
-DEFAULT_SKILL_TREE = {
+DEFAULT_SKILL_TREE = assign_node_ids({
     "name": "Skills",
     "children": [
         {
@@ -106,56 +276,110 @@ DEFAULT_SKILL_TREE = {
     "job_id": 4374125007,
     "job_title": "Member of Technical Staff, Post-training",
     "location": "Palo Alto, CA; San Francisco, CA"
-}
+})
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness check"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness check: ready once caches are warm, not ready again once draining"""
+    ready = server_state['warm'] and not server_state['draining']
+    return jsonify({
+        'ready': ready,
+        'warm': server_state['warm'],
+        'draining': server_state['draining'],
+        'job_trees_cached': len(job_tree_cache),
+        'upstream_in_flight': xai_client.in_flight(),
+        'admission': admission_controller.snapshot() if admission_controller else None
+    }), 200 if ready else 503
+
 @app.route('/api/v1/jobs', methods=['GET'])
 def list_jobs():
     """List all available jobs"""
-    jobs = []
-    json_files = glob.glob(os.path.join(JOB_SKILL_TREES_DIR, 'job_*.json'))
+    # Already sorted by job title
+    return jsonify({'jobs': storage.list_jobs()})
+
+def load_job_skill_tree(job_id):
+    """Load a job skill tree (cached and interned, so read-only) from the pack if available, otherwise from storage or its JSON file"""
+    return job_tree_cache.get_or_load(str(job_id), lambda: tree_intern.job_trees.intern(_read_job_skill_tree(job_id)))
+
+def _read_job_skill_tree(job_id):
+    # Ids are assigned before interning, so nodes with the same path in different jobs stay shared
+    if SKILL_TREE_PACK:
+        tree = SKILL_TREE_PACK.get(job_key(job_id))
+        if tree:
+            return assign_node_ids(tree)
     
-    for json_file in json_files:
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                job_id = data.get('job_id')
-                job_title = data.get('job_title', 'Unknown')
-                location = data.get('location', '')
-                
-                if job_id:
-                    jobs.append({
-                        'job_id': job_id,
-                        'job_title': job_title,
-                        'location': location
-                    })
-        except Exception as e:
-            print(f"Error reading {json_file}: {e}")
-            continue
+    tree = storage.get_job(job_id)
+    if tree:
+        return assign_node_ids(tree)
     
-    # Sort by job title
-    jobs.sort(key=lambda x: x['job_title'])
-    return jsonify({'jobs': jobs})
+    # Files added since the last import (see reload_job_trees) are read directly
+    json_file = job_index.path_for(job_id)
+    if json_file:
+        with open(json_file, 'r', encoding='utf-8') as f:
+            return assign_node_ids(json.load(f))
+    return None
+
+def job_node_index(job_skill_tree):
+    """Name -> node id index of a job tree, built once per cached tree"""
+    key = str(job_skill_tree.get('job_id'))
+    cached = node_index_cache.get(key)
+    # Trees are replaced on reload (and the default tree shares its job id), so the entry must be for this tree
+    if cached is None or cached[0] is not job_skill_tree:
+        cached = (job_skill_tree, node_index(job_skill_tree))
+        node_index_cache.put(key, cached)
+    return cached[1]
+
+def full_response_requested():
+    """Whether the client asked for full analyses alongside the node patches (?full=1 or a full form field)"""
+    return request.values.get('full') in ('1', 'true')
 
 @app.route('/api/v1/skill-trees/<job_id>', methods=['GET'])
 def get_skill_tree(job_id):
     """Get skill tree by job ID"""
-    # Try to find the job file
-    json_files = glob.glob(os.path.join(JOB_SKILL_TREES_DIR, f'job_{job_id}_*.json'))
-    
-    if json_files:
-        try:
-            with open(json_files[0], 'r', encoding='utf-8') as f:
-                return jsonify(json.load(f))
-        except Exception as e:
-            print(f"Error reading skill tree for job {job_id}: {e}")
+    try:
+        job_skill_tree = load_job_skill_tree(job_id)
+        if job_skill_tree:
+            return jsonify(job_skill_tree)
+    except Exception as e:
+        print(f"Error reading skill tree for job {job_id}: {e}")
     
     # Fallback to default
     return jsonify(DEFAULT_SKILL_TREE)
 
+def skill_tree_html_response(tree, title):
+    """Stream the HTML visualization of a tree, serving repeats from the cache"""
+    cache_key = (tree_hash(tree), title)
+    cached = html_cache.get(cache_key)
+    tracing.annotate(html_cached=cached is not None)
+    if cached is not None:
+        return Response(cached, mimetype='text/html')
+    
+    def generate():
+        chunks = []
+        for chunk in iter_html_visualization(tree, title):
+            chunks.append(chunk)
+            yield chunk
+        html_cache.put(cache_key, ''.join(chunks))
+    
+    return Response(generate(), mimetype='text/html')
+
+@app.route('/api/v1/skill-trees/<job_id>/html', methods=['GET'])
+def get_skill_tree_html(job_id):
+    """Render a job skill tree as an HTML page"""
+    job_skill_tree = load_job_skill_tree(job_id)
+    if not job_skill_tree:
+        return jsonify({'error': 'Skill tree not found'}), 404
+    return skill_tree_html_response(job_skill_tree, job_skill_tree.get('job_title', 'Job Skill Tree'))
+
 @app.route('/api/v1/skill-trees/default', methods=['GET'])
 def get_default_skill_tree():
     """Get default skill tree"""
@@ -167,34 +391,28 @@ def generate_questions_with_grok(job_skill_tree, candidate_skill_tree, job_title
     if not api_key:
         return None
     
-    api_url = "https://api.x.ai/v1/chat/completions"
-    
-    # Extract key information from skill trees
-    job_skills = extract_skills_from_tree(job_skill_tree) if job_skill_tree else []
-    candidate_skills = extract_skills_from_tree(candidate_skill_tree) if candidate_skill_tree else []
+    # Requirements and skills ranked by importance and fitted to the prompt budget; candidate skills
+    # that relate to the job come first
+    budget = prompts.BUDGETS['questions']
+    requirements, dropped_requirements = prompts.fit_items(
+        prompts.tree_skills(job_skill_tree, ('requirement',)), budget * 2 // 5,
+        encode=lambda items: "\n".join(f"- {req}" for req in items))
+    job_skills, dropped_job_skills = prompts.fit_items(
+        prompts.tree_skills(job_skill_tree, ('skill',)), budget * 3 // 10, encode=', '.join)
+    candidate_skills = prompts.rank_by_mentions(prompts.tree_skills(candidate_skill_tree, ('skill',)),
+                                                ' '.join(requirements + job_skills))
+    candidate_skills, dropped_candidate_skills = prompts.fit_items(candidate_skills, budget * 3 // 10, encode=', '.join)
     
     # Build a job description summary from the skill tree
     job_description = f"Position: {job_title}"
     if location:
         job_description += f" in {location}"
     
-    # Add requirements from the skill tree
-    requirements = []
-    def extract_requirements(node):
-        if node.get('type') == 'requirement':
-            requirements.append(node.get('name', ''))
-        if node.get('children'):
-            for child in node['children']:
-                extract_requirements(child)
-    
-    if job_skill_tree:
-        extract_requirements(job_skill_tree)
-    
-    job_description += f"\n\nKey Requirements:\n" + "\n".join(f"- {req}" for req in requirements[:10])
-    job_description += f"\n\nRequired Skills: {', '.join(job_skills[:15])}"
+    job_description += f"\n\nKey Requirements:\n" + "\n".join(f"- {req}" for req in requirements)
+    job_description += f"\n\nRequired Skills: {', '.join(job_skills)}"
     
     # Build candidate summary
-    candidate_summary = "Candidate Skills: " + ", ".join(candidate_skills[:15]) if candidate_skills else "No candidate resume uploaded yet."
+    candidate_summary = "Candidate Skills: " + ", ".join(candidate_skills) if candidate_skills else "No candidate resume uploaded yet."
     
     prompt = f"""You are an expert interview question generator. Generate personalized interview questions by comparing a job posting with a candidate's resume.
 
@@ -221,39 +439,23 @@ Return ONLY a JSON array of question strings, no additional text or formatting:
 Example format:
 ["Can you describe your experience with Kubernetes in production environments?", "How have you handled disaster recovery scenarios?", ...]"""
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
-    payload = {
-        "messages": [
-            {
-                "role": "system",
-                "content": "You are an expert interview question generator. Always return valid JSON arrays only, no markdown or additional text."
-            },
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ],
-        "model": "grok-4-fast",
-        "stream": False,
-        "temperature": 0.7
-    }
+    messages = [
+        {
+            "role": "system",
+            "content": "You are an expert interview question generator. Always return valid JSON arrays only, no markdown or additional text."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+    
+    prompts.record('questions', messages,
+                   len(dropped_requirements) + len(dropped_job_skills) + len(dropped_candidate_skills))
     
     try:
-        response = requests.post(api_url, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        result = response.json()
-        
-        content = result.get('choices', [{}])[0].get('message', {}).get('content', '[]')
-        content = content.strip()
-        
-        # Remove markdown code blocks if present
-        if content.startswith('```'):
-            lines = content.split('\n')
-            content = '\n'.join([line for line in lines if not line.strip().startswith('```')])
+        result = xai_client.chat_completion('questions', api_key, messages, model="grok-4-fast", temperature=0.7)
+        content = xai_client.message_content(result, default='[]')
         
         questions = json.loads(content)
         
@@ -267,6 +469,35 @@ Example format:
         print(f"Error calling Grok API for question generation: {e}")
         return None
 
+def fallback_questions(job_title, skills):
+    """Hardcoded questions, with a few about the listed skills"""
+    questions = [
+        f"Can you explain why you are a good fit for our {job_title} position?",
+        "What technical challenges have you faced in your previous projects?",
+        "How do you approach problem-solving in a technical context?",
+        "Can you describe a complex project you've worked on?",
+        "What methodologies do you use for software development?"
+    ]
+    
+    # If skills provided, add skill-specific questions
+    if skills:
+        skill_list = skills.split(',')[:3]
+        for skill in skill_list:
+            questions.append(f"Can you tell me about your experience with {skill.strip()}?")
+    
+    return questions[:8]
+
+def load_question_bank(job_skill_tree):
+    """Precomputed questions for a job tree, or None if there is no bank for this exact tree content"""
+    if not job_skill_tree or not job_skill_tree.get('job_id'):
+        return None
+    bank = storage.get_question_bank(job_skill_tree['job_id'])
+    # Banks for an older version of the tree count as misses
+    if bank and bank['tree_hash'] != tree_hash(job_skill_tree):
+        bank = None
+    metrics.record_cache('question_bank', bank is not None)
+    return bank['questions'] if bank else None
+
 @app.route('/api/v1/generate-interview-questions', methods=['POST'])
 def generate_questions():
     """Generate interview questions based on skill tree, job description, and candidate resume"""
@@ -275,10 +506,27 @@ def generate_questions():
     candidate_skill_tree = data.get('candidate_skill_tree')
     job_title = data.get('job_title', 'Software Engineer')
     location = data.get('location', '')
+    skills = data.get('skills', '')
+    session_id = data.get('session_id')
     
-    # Try to generate questions using Grok API
-    api_key = get_api_key()
-    if api_key and job_skill_tree:
+    def publish(result):
+        # Final questions are pushed to the interview's streams; provisional ones are followed by the final ones
+        if session_id and result.get('questions') and storage.get_interview_session(session_id):
+            interview_streams.append(session_id, [('questions', {'questions': result['questions']})])
+        return result
+    
+    bank = load_question_bank(job_skill_tree)
+    if bank and not candidate_skill_tree:
+        # Nothing candidate-specific to tailor: answer from the precomputed bank
+        return jsonify(publish(question_bank.response(question_bank.select(bank))))
+    
+    def local():
+        if bank:
+            candidate_skills = extract_skills_from_tree(candidate_skill_tree)
+            return question_bank.response(question_bank.select(bank, candidate_skills=candidate_skills))
+        return {"questions": fallback_questions(job_title, skills)}
+    
+    def upstream():
         try:
             questions = generate_questions_with_grok(
                 job_skill_tree, 
@@ -287,28 +535,121 @@ def generate_questions():
                 location
             )
             if questions:
-                return jsonify({"questions": questions})
+                return {"questions": questions}
         except Exception as e:
             print(f"Error generating questions with Grok: {e}")
-            # Fall back to hardcoded questions
-    
-    # Fallback to hardcoded questions
-    skills = data.get('skills', '')
-    questions = [
-        f"Can you explain why you are a good fit for our {job_title} position?",
-        "What technical challenges have you faced in your previous projects?",
-        "How do you approach problem-solving in a technical context?",
-        "Can you describe a complex project you've worked on?",
-        "What methodologies do you use for software development?"
-    ]
+        # Fall back to hardcoded questions
+        return local()
     
-    # If skills provided, add skill-specific questions
-    if skills:
-        skill_list = skills.split(',')[:3]
-        for skill in skill_list:
-            questions.append(f"Can you tell me about your experience with {skill.strip()}?")
-    
-    return jsonify({"questions": questions[:8]})
+    # Try to generate questions using Grok API
+    if get_api_key() and job_skill_tree:
+        return jsonify(slo_runner.run('generate_questions', ENDPOINT_SLOS['generate_questions'],
+                                      ENDPOINT_DEADLINES['generate_questions'], lambda: publish(upstream()), local))
+    return jsonify(publish(local()))
+
+@app.route('/api/v1/skill-trees/<job_id>/questions', methods=['GET'])
+def get_question_bank(job_id):
+    """Precomputed questions for a job, optionally only those tagged with ?skill="""
+    bank = storage.get_question_bank(job_id)
+    if not bank:
+        return jsonify({'error': 'No question bank for this job'}), 404
+    questions = bank['questions']
+    skill = request.args.get('skill')
+    if skill:
+        questions = question_bank.for_skill(questions, skill)
+    return jsonify({'job_id': int(job_id), 'source': bank['source'], 'questions': questions})
+
+@app.route('/api/v1/results/<token>', methods=['GET'])
+def get_deferred_result(token):
+    """Final result for a provisional response: pending, ready (with the result) or failed"""
+    entry = slo_runner.get(token)
+    if entry is None:
+        return jsonify({'error': 'Unknown result token'}), 404
+    return jsonify(entry)
+
+@app.route('/api/v1/interviews', methods=['POST'])
+def create_interview():
+    """Start an interview session for a job (and optionally a candidate)"""
+    data = request.get_json(silent=True) or {}
+    job_id = data.get('job_id')
+    if job_id is not None and not str(job_id).isdigit():
+        return jsonify({'error': 'job_id must be an integer'}), 400
+    session_id = interview_sessions.new_session_id()
+    storage.create_interview_session(session_id, job_id, data.get('file_id'))
+    return jsonify({**storage.get_interview_session(session_id), 'cursor': 0}), 201
+
+@app.route('/api/v1/interviews/<session_id>', methods=['GET'])
+def get_interview_events(session_id):
+    """Events of an interview appended after the ?since= cursor"""
+    session = storage.get_interview_session(session_id)
+    if session is None:
+        return jsonify({'error': 'Interview not found'}), 404
+    try:
+        since = max(0, int(request.args.get('since', 0)))
+        limit = min(max(1, int(request.args.get('limit', interview_sessions.PAGE_SIZE))), interview_sessions.PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    # One extra row tells whether another page follows
+    events = storage.list_interview_events(session_id, since, limit + 1)
+    more = len(events) > limit
+    events = events[:limit]
+    return jsonify({**session, 'events': events, 'cursor': events[-1]['seq'] if events else since, 'more': more})
+
+@app.route('/api/v1/interviews/<session_id>/events', methods=['POST'])
+def append_interview_events(session_id):
+    """Append events (transcript, question_asked, question_skipped, skill_patch) to an interview"""
+    if storage.get_interview_session(session_id) is None:
+        return jsonify({'error': 'Interview not found'}), 404
+    data = request.get_json(silent=True) or {}
+    events = data.get('events', [data] if 'type' in data else [])
+    if not isinstance(events, list) or not events:
+        return jsonify({'error': 'No events provided'}), 400
+    if len(events) > interview_sessions.MAX_EVENTS_PER_APPEND:
+        return jsonify({'error': f'At most {interview_sessions.MAX_EVENTS_PER_APPEND} events per request'}), 400
+    try:
+        events = [interview_sessions.validate_event(event) for event in events]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    appended = interview_streams.append(session_id, events)
+    return jsonify({'events': appended, 'cursor': appended[-1]['seq']}), 201
+
+@app.route('/api/v1/interviews/<session_id>/state', methods=['GET'])
+def get_interview_state(session_id):
+    """Current state of an interview (the fold of its events) and the cursor to sync from"""
+    session = storage.get_interview_session(session_id)
+    if session is None:
+        return jsonify({'error': 'Interview not found'}), 404
+    events = storage.list_interview_events(session_id)
+    return jsonify({**session, **interview_sessions.fold(events), 'cursor': events[-1]['seq'] if events else 0})
+
+@app.route('/api/v1/interviews/<session_id>/stream', methods=['GET'])
+def stream_interview(session_id):
+    """Server-Sent Events of an interview after the Last-Event-ID header or ?since= cursor"""
+    if storage.get_interview_session(session_id) is None:
+        return jsonify({'error': 'Interview not found'}), 404
+    try:
+        since = max(0, int(request.headers.get('Last-Event-ID') or request.args.get('since', 0)))
+    except ValueError:
+        return jsonify({'error': 'since must be an integer'}), 400
+    stream = interview_streams.open(session_id, since, stop=lambda: server_state['draining'])
+    if stream is None:
+        return jsonify({'error': 'Too many open event streams'}), 503, {'Retry-After': str(interview_stream.RETRY_MS // 1000)}
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/v1/search', methods=['GET'])
+def search_interviews():
+    """Search transcripts and candidate skill trees (?q=, skill, color, kind, job_id, file_id, limit)"""
+    job_id = request.args.get('job_id')
+    if job_id is not None and not job_id.isdigit():
+        return jsonify({'error': 'job_id must be an integer'}), 400
+    try:
+        return jsonify(search.search(storage, request.args.get('q'), request.args.get('skill'),
+                                     request.args.get('color'), request.args.get('kind'), job_id,
+                                     request.args.get('file_id'),
+                                     int(request.args.get('limit', search.DEFAULT_LIMIT))))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 def extract_skills_from_tree(tree, skills_list=None):
     """Recursively extract all skills from a skill tree"""
@@ -326,125 +667,15 @@ def extract_skills_from_tree(tree, skills_list=None):
 
 def find_skill_similarities_with_grok(job_skills, candidate_skills):
     """Use Grok API to find similar skills between job and candidate"""
-    api_key = get_api_key()
-    if not api_key:
-        # Fallback to simple matching if no API key
-        return find_skill_similarities_simple(job_skills, candidate_skills)
-    
-    api_url = "https://api.x.ai/v1/chat/completions"
-    
-    prompt = f"""You are a skill matching expert. Compare the following two lists of skills and identify which candidate skills match or are similar to job skills.
-
-Job Skills:
-{json.dumps(job_skills, indent=2)}
-
-Candidate Skills:
-{json.dumps(candidate_skills, indent=2)}
-
-For each candidate skill, determine if it matches or is similar to any job skill. Consider:
-- Exact matches (case-insensitive)
-- Synonyms (e.g., "Python" matches "Python programming")
-- Related skills (e.g., "React" matches "React.js" or "React framework")
-- Abbreviations (e.g., "ML" matches "Machine Learning")
-
-Return a JSON object with this structure:
-{{
-    "matches": [
-        {{
-            "candidate_skill": "candidate skill name",
-            "job_skill": "matching job skill name",
-            "similarity": "exact|synonym|related"
-        }}
-    ],
-    "candidate_only": ["skill1", "skill2"],
-    "job_only": ["skill1", "skill2"]
-}}
-
-Only return valid JSON, no additional text."""
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
-    payload = {
-        "messages": [
-            {
-                "role": "system",
-                "content": "You are a skill matching expert. Always return valid JSON only."
-            },
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ],
-        "model": "grok-4-fast",
-        "stream": False,
-        "temperature": 0.1
-    }
-    
-    try:
-        response = requests.post(api_url, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        result = response.json()
-        
-        content = result.get('choices', [{}])[0].get('message', {}).get('content', '{}')
-        content = content.strip()
-        
-        # Remove markdown code blocks if present
-        if content.startswith('```'):
-            lines = content.split('\n')
-            content = '\n'.join([line for line in lines if not line.strip().startswith('```')])
-        
-        similarity_data = json.loads(content)
-        return similarity_data
-        
-    except Exception as e:
-        print(f"Error calling Grok API for skill matching: {e}")
-        # Fallback to simple matching
-        return find_skill_similarities_simple(job_skills, candidate_skills)
-
-def find_skill_similarities_simple(job_skills, candidate_skills):
-    """Simple fallback matching using lowercase comparison"""
-    job_skills_lower = [s.lower() for s in job_skills]
-    candidate_skills_lower = [s.lower() for s in candidate_skills]
-    
-    matches = []
-    candidate_only = []
-    job_only = []
-    
-    for candidate_skill in candidate_skills:
-        candidate_lower = candidate_skill.lower()
-        matched = False
-        for job_skill in job_skills:
-            job_lower = job_skill.lower()
-            if candidate_lower == job_lower or candidate_lower in job_lower or job_lower in candidate_lower:
-                matches.append({
-                    "candidate_skill": candidate_skill,
-                    "job_skill": job_skill,
-                    "similarity": "exact" if candidate_lower == job_lower else "related"
-                })
-                matched = True
-                break
-        if not matched:
-            candidate_only.append(candidate_skill)
-    
-    for job_skill in job_skills:
-        job_lower = job_skill.lower()
-        if not any(job_lower == m["job_skill"].lower() for m in matches):
-            job_only.append(job_skill)
-    
-    return {
-        "matches": matches,
-        "candidate_only": candidate_only,
-        "job_only": job_only
-    }
+    return matching.match_pair(get_api_key(), job_skills, candidate_skills)
 
 @app.route('/api/v1/upload-resume', methods=['POST'])
 def upload_resume():
     """Handle resume upload and generate candidate skill tree"""
-    if 'resume' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
+    # The multipart body is parsed (and spooled) on first access
+    with tracing.span('upload_receive'):
+        if 'resume' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
     
     file = request.files['resume']
     if file.filename == '':
@@ -454,73 +685,181 @@ def upload_resume():
         return jsonify({'error': 'Invalid file type. Only PDF files are allowed.'}), 400
     
     try:
-        # Save uploaded file temporarily to calculate hash
-        filename = secure_filename(file.filename)
-        file_ext = filename.rsplit('.', 1)[1].lower()
-        temp_file_id = str(uuid.uuid4())
-        temp_saved_filename = f"{temp_file_id}.{file_ext}"
-        temp_file_path = os.path.join(UPLOAD_FOLDER, temp_saved_filename)
-        file.save(temp_file_path)
-        
         # Calculate hash of file content to identify if we've seen this resume before
-        with open(temp_file_path, 'rb') as f:
-            file_hash = hashlib.md5(f.read()).hexdigest()
+        with metrics.stage('resume_hash'):
+            file_hash = uploads.file_md5(file.stream)
         
         # Use hash as file_id for deterministic identification
         file_id = file_hash[:16]  # Use first 16 chars of hash as file_id
-        output_json = os.path.join(CANDIDATE_SKILL_TREES_DIR, f"candidate_{file_id}_skill_tree.json")
+        tracing.annotate(file_id=file_id)
         
         # Check if skill tree already exists
-        if os.path.exists(output_json):
+        with metrics.stage('candidate_lookup'):
+            candidate_skill_tree = storage.get_candidate_by_hash(file_hash)
+        metrics.record_cache('candidate_tree', candidate_skill_tree is not None)
+        tracing.annotate(candidate_cached=candidate_skill_tree is not None)
+        if candidate_skill_tree:
             print(f"Found existing skill tree for resume (hash: {file_id}), loading from cache...")
-            with open(output_json, 'r', encoding='utf-8') as f:
-                candidate_skill_tree = json.load(f)
         else:
-            # Generate skill tree
+            # Fall back to trees imported from JSON before their file hash was known
+            candidate_skill_tree = storage.get_candidate(file_id)
+            if candidate_skill_tree:
+                storage.save_candidate(file_id, candidate_skill_tree, file_hash=file_hash)
+        
+        generator = resume_text = None
+        if not candidate_skill_tree:
             print(f"Generating new skill tree for resume (hash: {file_id})...")
             generator = ResumeSkillTreeGenerator()
-            candidate_skill_tree = generator.generate_skill_tree(temp_file_path, output_json=output_json)
-        
-        # Clean up temporary uploaded file
-        try:
-            os.remove(temp_file_path)
-        except:
-            pass
+            # The upload is gone once the request ends, so the text is extracted up front
+            with metrics.stage('pdf_extract'):
+                resume_text = generator.extract_text_from_pdf(file.stream)
+                tracing.annotate(chars=len(resume_text))
+            print(f"Extracted {len(resume_text)} characters from PDF")
         
         # Get current job skill tree if available
         job_id = request.form.get('job_id')
         job_skill_tree = None
         if job_id:
-            json_files = glob.glob(os.path.join(JOB_SKILL_TREES_DIR, f'job_{job_id}_*.json'))
-            if json_files:
-                with open(json_files[0], 'r', encoding='utf-8') as f:
-                    job_skill_tree = json.load(f)
+            with tracing.span('job_tree_load', job_id=job_id):
+                job_skill_tree = load_job_skill_tree(job_id)
         
         # If no job_id provided, try to get from current session or use default
         if not job_skill_tree:
             # Try to get from request or use a default
             job_skill_tree = DEFAULT_SKILL_TREE
         
-        # Extract skills from both trees
         job_skills = extract_skills_from_tree(job_skill_tree)
-        candidate_skills = extract_skills_from_tree(candidate_skill_tree)
+        full = full_response_requested()
         
-        # Find skill similarities using Grok
-        similarity_data = find_skill_similarities_with_grok(job_skills, candidate_skills)
+        def analyze(use_api):
+            skill_tree = candidate_skill_tree
+            if skill_tree is None:
+                skill_tree = generator.skill_tree_from_text(resume_text, use_api=use_api)
+                # Provisional trees are not stored; the final one replaces them
+                if use_api:
+                    with tracing.span('candidate_save'):
+                        storage.save_candidate(file_id, skill_tree, file_hash=file_hash)
+            candidate_skills = extract_skills_from_tree(skill_tree)
+            
+            if not use_api:
+                with tracing.span('similarity_local'):
+                    similarity_data = find_skill_similarities_simple(job_skills, candidate_skills)
+            else:
+                # Find skill similarities using Grok
+                with metrics.stage('similarity'):
+                    similarity_data = find_skill_similarities_with_grok(job_skills, candidate_skills)
+                if job_skill_tree.get('job_id'):
+                    storage.save_similarity(job_skill_tree['job_id'], file_id, similarity_data)
+            
+            result = {
+                'success': True,
+                'skill_tree': skill_tree,
+                'file_id': file_id,
+                # Job tree nodes the candidate matches, by node id
+                'similarity_patch': similarity_patch(job_node_index(job_skill_tree), similarity_data)
+            }
+            if full:
+                result['similarity_data'] = similarity_data
+            return result
         
-        return jsonify({
-            'success': True,
-            'skill_tree': candidate_skill_tree,
-            'file_id': file_id,
-            'similarity_data': similarity_data
-        })
+        return jsonify(slo_runner.run('upload_resume', ENDPOINT_SLOS['upload_resume'],
+                                      ENDPOINT_DEADLINES['upload_resume'],
+                                      lambda: analyze(True), lambda: analyze(False)))
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def batch_similarities(anchor_tree, others, anchor):
+    """Match one job against many candidates (or one candidate against many jobs) in batched calls"""
+    # others holds (job_id, file_id, tree) for the other side; results are stored and returned in that order
+    anchor_skills = extract_skills_from_tree(anchor_tree)
+    with metrics.stage('similarity'):
+        results = matching.match_batch(get_api_key(), anchor_skills,
+                                       [extract_skills_from_tree(tree) for _, _, tree in others], anchor=anchor)
+    for (job_id, file_id, _), similarity_data in zip(others, results):
+        storage.save_similarity(job_id, file_id, similarity_data)
+    return results
+
+def _match_request_ids(key):
+    """Ids listed under key in the JSON body, or an error response"""
+    data = request.get_json(silent=True) or {}
+    ids = data.get(key)
+    if not isinstance(ids, list) or not ids:
+        return None, (jsonify({'error': f'{key} must be a non-empty list'}), 400)
+    if len(ids) > MAX_MATCH_ITEMS:
+        return None, (jsonify({'error': f'At most {MAX_MATCH_ITEMS} {key} per request'}), 400)
+    return list(dict.fromkeys(str(i) for i in ids)), None
+
+@app.route('/api/v1/skill-trees/<job_id>/match-candidates', methods=['POST'])
+def match_candidates(job_id):
+    """Match many candidates against a job, best matches first"""
+    job_skill_tree = load_job_skill_tree(job_id)
+    if not job_skill_tree:
+        return jsonify({'error': 'Skill tree not found'}), 404
+    file_ids, error = _match_request_ids('file_ids')
+    if error:
+        return error
+    
+    others = []
+    not_found = []
+    for file_id in file_ids:
+        candidate_skill_tree = storage.get_candidate(file_id)
+        if candidate_skill_tree:
+            others.append((job_skill_tree.get('job_id', job_id), file_id, candidate_skill_tree))
+        else:
+            not_found.append(file_id)
+    
+    results = [{
+        'file_id': file_id,
+        'match_count': len(similarity_data.get('matches', [])),
+        'similarity_data': similarity_data
+    } for (_, file_id, _), similarity_data in zip(others, batch_similarities(job_skill_tree, others, 'job'))]
+    results.sort(key=lambda result: result['match_count'], reverse=True)
+    return jsonify({'job_id': job_skill_tree.get('job_id', job_id), 'results': results, 'not_found': not_found})
+
+@app.route('/api/v1/candidate-skill-trees/<file_id>/match-jobs', methods=['POST'])
+def match_jobs(file_id):
+    """Match a candidate against many jobs, best matches first"""
+    candidate_skill_tree = storage.get_candidate(file_id)
+    if not candidate_skill_tree:
+        return jsonify({'error': 'Candidate skill tree not found'}), 404
+    job_ids, error = _match_request_ids('job_ids')
+    if error:
+        return error
+    
+    others = []
+    not_found = []
+    for job_id in job_ids:
+        job_skill_tree = load_job_skill_tree(job_id)
+        if job_skill_tree:
+            others.append((job_skill_tree.get('job_id', job_id), file_id, job_skill_tree))
+        else:
+            not_found.append(job_id)
+    
+    results = [{
+        'job_id': job_id,
+        'job_title': tree.get('job_title', 'Unknown'),
+        'match_count': len(similarity_data.get('matches', [])),
+        'similarity_data': similarity_data
+    } for (job_id, _, tree), similarity_data in zip(others, batch_similarities(candidate_skill_tree, others, 'candidate'))]
+    results.sort(key=lambda result: result['match_count'], reverse=True)
+    return jsonify({'file_id': file_id, 'results': results, 'not_found': not_found})
+
 @app.route('/api/v1/candidate-skill-trees/<file_id>', methods=['GET'])
 def get_candidate_skill_tree(file_id):
     """Get candidate skill tree by file ID"""
+    try:
+        candidate_skill_tree = storage.get_candidate(file_id)
+        if candidate_skill_tree:
+            return jsonify(candidate_skill_tree)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if SKILL_TREE_PACK:
+        candidate_skill_tree = SKILL_TREE_PACK.get(candidate_key(file_id))
+        if candidate_skill_tree:
+            return jsonify(candidate_skill_tree)
+    
     json_file = os.path.join(CANDIDATE_SKILL_TREES_DIR, f"candidate_{file_id}_skill_tree.json")
     
     if os.path.exists(json_file):
@@ -532,19 +871,23 @@ def get_candidate_skill_tree(file_id):
     
     return jsonify({'error': 'Skill tree not found'}), 404
 
-def transcribe_audio_with_grok(audio_file_path):
-    """Transcribe audio file using Grok STT API"""
+@app.route('/api/v1/candidate-skill-trees/<file_id>/html', methods=['GET'])
+def get_candidate_skill_tree_html(file_id):
+    """Render a candidate skill tree as an HTML page"""
+    candidate_skill_tree = storage.get_candidate(file_id)
+    if not candidate_skill_tree and SKILL_TREE_PACK:
+        candidate_skill_tree = SKILL_TREE_PACK.get(candidate_key(file_id))
+    if not candidate_skill_tree:
+        return jsonify({'error': 'Skill tree not found'}), 404
+    return skill_tree_html_response(candidate_skill_tree, "Resume Skill Tree")
+
+def transcribe_audio_with_grok(audio_file, filename=None):
+    """Transcribe audio using Grok STT API; audio_file is a path or a binary file object named by filename"""
     api_key = get_api_key()
     if not api_key:
         raise ValueError("XAI_API_KEY not found")
     
-    api_url = "https://api.x.ai/v1/audio/transcriptions"
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}"
-    }
-    
-    audio_path = Path(audio_file_path)
+    audio_path = Path(filename or audio_file)
     content_type = "audio/webm"
     if audio_path.suffix == ".mp3":
         content_type = "audio/mpeg"
@@ -556,14 +899,14 @@ def transcribe_audio_with_grok(audio_file_path):
         content_type = "audio/ogg"
     
     try:
-        with open(audio_path, 'rb') as f:
-            files = {
-                "file": (audio_path.name, f, content_type)
-            }
-            response = requests.post(api_url, headers=headers, files=files, timeout=60)
-            response.raise_for_status()
+        if isinstance(audio_file, (str, os.PathLike)):
+            audio_context = open(audio_file, 'rb')
+        else:
+            audio_file.seek(0)
+            audio_context = nullcontext(audio_file)
+        with audio_context as f:
+            result = xai_client.transcribe('stt', api_key, audio_path.name, f, content_type)
         
-        result = response.json()
         return result.get('text', '')
     except Exception as e:
         print(f"Error transcribing audio: {e}")
@@ -578,15 +921,16 @@ def analyze_speech_for_skills(transcript, job_skill_tree):
     if not api_key:
         return None
     
-    # Extract all skills from job skill tree
-    job_skills = extract_skills_from_tree(job_skill_tree)
-    
-    api_url = "https://api.x.ai/v1/chat/completions"
+    # Job skills the candidate mentioned come first, then the rest as far as the prompt budget allows
+    transcript = ' '.join(transcript.split())
+    job_skills, dropped_job_skills = prompts.fit_items(
+        prompts.rank_by_mentions(prompts.dedupe(extract_skills_from_tree(job_skill_tree)), transcript),
+        prompts.BUDGETS['speech_analysis'])
     
     prompt = f"""Analyze the following interview transcript and identify which skills from the job requirements were mentioned by the candidate. For each skill, determine the candidate's experience level and assign a color code.
 
 Job Skills/Requirements:
-{json.dumps(job_skills[:30], indent=2)}
+{prompts.compact_json(job_skills)}
 
 Interview Transcript:
 "{transcript}"
@@ -613,39 +957,22 @@ Return a JSON object with this structure:
 
 Only return valid JSON, no additional text. Only include skills that were actually mentioned in the transcript."""
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
-    payload = {
-        "messages": [
-            {
-                "role": "system",
-                "content": "You are an expert at analyzing interview transcripts. Always return valid JSON only."
-            },
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ],
-        "model": "grok-4-fast",
-        "stream": False,
-        "temperature": 0.3
-    }
+    messages = [
+        {
+            "role": "system",
+            "content": "You are an expert at analyzing interview transcripts. Always return valid JSON only."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+    
+    prompts.record('speech_analysis', messages, len(dropped_job_skills))
     
     try:
-        response = requests.post(api_url, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        result = response.json()
-        
-        content = result.get('choices', [{}])[0].get('message', {}).get('content', '{}')
-        content = content.strip()
-        
-        # Remove markdown code blocks if present
-        if content.startswith('```'):
-            lines = content.split('\n')
-            content = '\n'.join([line for line in lines if not line.strip().startswith('```')])
+        result = xai_client.chat_completion('speech_analysis', api_key, messages, model="grok-4-fast", temperature=0.3)
+        content = xai_client.message_content(result)
         
         analysis = json.loads(content)
         return analysis
@@ -668,48 +995,61 @@ def transcribe_audio():
         return jsonify({'error': 'Invalid file type. Allowed: webm, mp3, wav, ogg, m4a'}), 400
     
     try:
-        # Generate unique filename
-        file_id = str(uuid.uuid4())
-        filename = secure_filename(file.filename)
-        file_ext = filename.rsplit('.', 1)[1].lower()
-        saved_filename = f"{file_id}.{file_ext}"
-        file_path = os.path.join(AUDIO_FOLDER, saved_filename)
-        
-        # Save uploaded file
-        file.save(file_path)
-        
-        # Transcribe using Grok STT
-        transcript = transcribe_audio_with_grok(file_path)
+        # Transcribe the spooled upload using Grok STT
+        filename = secure_filename(file.filename) or f"audio.{file.filename.rsplit('.', 1)[1].lower()}"
+        audio, preprocessing = file.stream, None
+        if AUDIO_PREPROCESS:
+            with metrics.stage('audio_preprocess'):
+                audio, filename, preprocessing = audio_preprocess.preprocess(file.stream, filename)
+        with metrics.stage('transcription'):
+            transcript = transcribe_audio_with_grok(audio, filename)
         
         # Get job skill tree if available
         job_id = request.form.get('job_id')
         job_skill_tree = None
         if job_id:
-            json_files = glob.glob(os.path.join(JOB_SKILL_TREES_DIR, f'job_{job_id}_*.json'))
-            if json_files:
-                with open(json_files[0], 'r', encoding='utf-8') as f:
-                    job_skill_tree = json.load(f)
+            job_skill_tree = load_job_skill_tree(job_id)
         
         # Analyze transcript for skills
         skill_analysis = None
         if job_skill_tree and transcript:
-            skill_analysis = analyze_speech_for_skills(transcript, job_skill_tree)
-        
-        # Clean up audio file
-        try:
-            os.remove(file_path)
-        except:
-            pass
+            with metrics.stage('speech_analysis'):
+                skill_analysis = analyze_speech_for_skills(transcript, job_skill_tree)
         
-        return jsonify({
+        # Node id -> color of the skills the analysis found, for the client to recolor just those nodes
+        skill_patch = analysis_patch(job_node_index(job_skill_tree), skill_analysis) if skill_analysis else {}
+        body = {
             'success': True,
             'transcript': transcript,
-            'skill_analysis': skill_analysis
-        })
+            'skill_patch': skill_patch,
+            'preprocessing': preprocessing
+        }
+        if full_response_requested():
+            body['skill_analysis'] = skill_analysis
+        if transcript:
+            session_id = request.form.get('session_id')
+            session = storage.get_interview_session(session_id) if session_id else None
+            # Linked to its interview and candidate so it can be searched by either
+            file_id = request.form.get('file_id') or (session or {}).get('file_id')
+            storage.save_transcript(job_skill_tree.get('job_id') if job_skill_tree else None, transcript, skill_analysis,
+                                    session_id=session['session_id'] if session else None, file_id=file_id)
+            # Record the segment in the interview's event log so every client syncs it
+            if session:
+                appended = interview_streams.append(
+                    session_id, interview_sessions.transcription_events(transcript, skill_patch))
+                body['events'] = appended
+                body['cursor'] = appended[-1]['seq']
+        
+        return jsonify(body)
     
+    except resilience.CircuitOpen as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(int(e.retry_after) + 1)}
+    except resilience.DeadlineExceeded as e:
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    warm_caches()
     app.run(debug=True, port=5000)
 
@@ -0,0 +1,223 @@
+"""
+Audio Preprocessing
+Shrinks recordings before they are sent for transcription: the upload is
+decoded with ffmpeg, downmixed to mono 16 kHz, long pauses (e.g. while the
+interviewer reads a question) are cut by an energy-based voice activity
+detector, and the rest is re-encoded as low-bitrate Opus. Both tools are
+optional: without ffmpeg the upload is sent unchanged, and without NumPy it
+is downmixed and resampled but not trimmed. The original is also sent
+whenever decoding fails or processing would not make it smaller or shorter.
+
+Usage:
+    python audio_preprocess.py <recording> [...] [--out DIR]   # bytes and audio seconds saved per file
+"""
+
+import io
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Dict, Any, Iterator, Optional, Tuple
+
+import metrics
+
+SAMPLE_RATE = 16000
+SAMPLE_BYTES = 2
+FRAME_SECONDS = 0.03
+# Frames this many dB above the noise floor (10th percentile of frame energy) are speech
+SPEECH_ABOVE_FLOOR_DB = 12.0
+# Frames quieter than this are never speech
+MIN_SPEECH_DBFS = -50.0
+# Audio kept on either side of speech, so word onsets and endings survive
+PAD_SECONDS = 0.25
+# Pauses shorter than this (after padding) are kept
+MIN_SILENCE_SECONDS = 0.8
+OPUS_BITRATE = '24k'
+FFMPEG_TIMEOUT = 30
+
+PREPROCESSED = metrics.counter(
+    'audio_preprocess_total', 'Recordings by preprocessing outcome (processed or why they were sent unchanged)',
+    ('outcome',))
+BYTES_SAVED = metrics.counter('audio_preprocess_saved_bytes_total', 'Upload bytes saved by audio preprocessing')
+SECONDS_SAVED = metrics.counter(
+    'audio_preprocess_saved_audio_seconds_total', 'Seconds of silence cut from recordings before transcription')
+
+
+def ffmpeg_path() -> Optional[str]:
+    return os.getenv('FFMPEG_PATH') or shutil.which('ffmpeg')
+
+
+def _numpy():
+    # Loaded on first use; trimming is skipped without it
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _ffmpeg(args, data: Optional[bytes] = None, pass_fds: Tuple[int, ...] = ()) -> bytes:
+    command = [ffmpeg_path(), '-nostdin', '-hide_banner', '-loglevel', 'error'] + args
+    return subprocess.run(command, input=data, capture_output=True, timeout=FFMPEG_TIMEOUT, check=True,
+                          pass_fds=pass_fds).stdout
+
+
+def decode(path: str, pass_fds: Tuple[int, ...] = ()) -> bytes:
+    """Decode an audio file (a path, or /dev/fd/N with N in pass_fds) to mono 16 kHz signed 16-bit PCM."""
+    return _ffmpeg(['-i', path, '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', 'pipe:1'],
+                   pass_fds=pass_fds)
+
+
+@contextmanager
+def _ffmpeg_input(stream: BinaryIO, suffix: str) -> Iterator[Tuple[str, Tuple[int, ...]]]:
+    """
+    Path ffmpeg can open (and seek, as MP4/M4A need) for stream, with the descriptors to pass it.
+
+    Files on disk, including spooled uploads that rolled over, are handed over by descriptor; uploads
+    still spooled in memory are copied to a temporary file in chunks.
+    """
+    stream.seek(0)
+    if not isinstance(stream, tempfile.SpooledTemporaryFile) or stream._rolled:
+        try:
+            fd = stream.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            fd = None
+        if fd is not None:
+            yield f"/dev/fd/{fd}", (fd,)
+            return
+    with tempfile.NamedTemporaryFile(suffix=suffix) as source:
+        shutil.copyfileobj(stream, source)
+        source.flush()
+        stream.seek(0)
+        yield source.name, ()
+
+
+def encode(pcm: bytes) -> bytes:
+    """Encode mono 16 kHz PCM as Opus in WebM, tuned for speech."""
+    return _ffmpeg(['-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), '-i', 'pipe:0',
+                    '-c:a', 'libopus', '-b:a', OPUS_BITRATE, '-application', 'voip', '-f', 'webm', 'pipe:1'], pcm)
+
+
+def trim_silence(pcm: bytes) -> bytes:
+    """
+    Cut long pauses from mono 16 kHz PCM with an energy-based voice activity detector.
+
+    Frames well above the recording's noise floor are speech; speech is padded by PAD_SECONDS and
+    pauses of at least MIN_SILENCE_SECONDS between (or around) it are dropped. Recordings without a
+    clear gap between speech and silence are returned unchanged.
+    """
+    np = _numpy()
+    samples = np.frombuffer(pcm, dtype='<i2')
+    frame = int(SAMPLE_RATE * FRAME_SECONDS)
+    frames = len(samples) // frame
+    if frames < 2:
+        return pcm
+
+    energy = samples[:frames * frame].reshape(frames, frame).astype(np.float64) / 32768.0
+    rms_db = 10 * np.log10(np.mean(energy * energy, axis=1) + 1e-12)
+    floor, peak = np.percentile(rms_db, 10), np.percentile(rms_db, 95)
+    if peak - floor < SPEECH_ABOVE_FLOOR_DB or peak < MIN_SPEECH_DBFS:
+        # All speech, all silence or too noisy to tell apart
+        return pcm
+    speech = rms_db > max(floor + SPEECH_ABOVE_FLOOR_DB, MIN_SPEECH_DBFS)
+
+    pad = int(round(PAD_SECONDS / FRAME_SECONDS))
+    keep = np.convolve(speech.astype(np.int8), np.ones(2 * pad + 1, dtype=np.int8), mode='same') > 0
+
+    # Short pauses stay; find the silent runs and restore those under MIN_SILENCE_SECONDS
+    min_silence = int(round(MIN_SILENCE_SECONDS / FRAME_SECONDS))
+    edges = np.flatnonzero(np.diff(np.concatenate(([1], keep.astype(np.int8), [1]))))
+    for start, end in zip(edges[::2], edges[1::2]):
+        if end - start < min_silence:
+            keep[start:end] = True
+
+    mask = np.repeat(keep, frame)
+    # Samples after the last whole frame follow it
+    mask = np.concatenate((mask, np.full(len(samples) - len(mask), keep[-1])))
+    return samples[mask].tobytes()
+
+
+def preprocess(stream: BinaryIO, filename: str) -> Tuple[BinaryIO, str, Dict[str, Any]]:
+    """
+    Prepare an uploaded recording for transcription.
+
+    Args:
+        stream: The uploaded file (read from the start)
+        filename: Its name; the suffix tells ffmpeg the container
+
+    Returns:
+        (file to send, its name, stats): the stats hold the outcome, bytes and audio seconds before
+        and after; on any outcome other than 'processed' the original stream and name are returned
+    """
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(0)
+    stats = {'outcome': 'processed', 'bytes_in': size, 'bytes_out': size}
+
+    def unchanged(outcome):
+        stream.seek(0)
+        stats['outcome'] = outcome
+        stats['bytes_out'] = stats['bytes_in']
+        stats['seconds_out'] = stats.get('seconds_in')
+        PREPROCESSED.inc(outcome=outcome)
+        return stream, filename, stats
+
+    if not ffmpeg_path():
+        return unchanged('no_ffmpeg')
+
+    try:
+        with _ffmpeg_input(stream, Path(filename).suffix) as (source, pass_fds):
+            pcm = decode(source, pass_fds)
+        stats['seconds_in'] = round(len(pcm) / SAMPLE_BYTES / SAMPLE_RATE, 2)
+        if _numpy() is not None:
+            pcm = trim_silence(pcm)
+        stats['seconds_out'] = round(len(pcm) / SAMPLE_BYTES / SAMPLE_RATE, 2)
+        if not pcm:
+            return unchanged('no_audio')
+        encoded = encode(pcm)
+    except (subprocess.SubprocessError, OSError) as e:
+        stderr = (getattr(e, 'stderr', None) or b'').decode('utf-8', 'replace').strip()
+        error = stderr.splitlines()[-1] if stderr else e
+        print(f"Audio preprocessing of {filename} failed, sending it unchanged: {error}")
+        return unchanged('error')
+
+    if len(encoded) >= size and stats['seconds_out'] >= stats['seconds_in']:
+        return unchanged('not_smaller')
+
+    stats['bytes_out'] = len(encoded)
+    PREPROCESSED.inc(outcome='processed')
+    BYTES_SAVED.inc(max(0, size - len(encoded)))
+    SECONDS_SAVED.inc(stats['seconds_in'] - stats['seconds_out'])
+    return io.BytesIO(encoded), f"{Path(filename).stem or 'recording'}.webm", stats
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Preprocess recordings as the transcription endpoint does")
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--out', help="directory to write the processed recordings to")
+    args = parser.parse_args()
+
+    if not ffmpeg_path():
+        print("ffmpeg not found (install it or set FFMPEG_PATH); recordings would be sent unchanged")
+        sys.exit(1)
+    if _numpy() is None:
+        print("NumPy not installed; recordings are downmixed and resampled but silence is not trimmed")
+
+    for path in args.files:
+        with open(path, 'rb') as f:
+            processed, _, stats = preprocess(f, os.path.basename(path))
+            print(f"{path}: {stats['outcome']}, {stats['bytes_in']:,} -> {stats['bytes_out']:,} bytes, "
+                  f"{stats.get('seconds_in')} -> {stats.get('seconds_out')} s of audio")
+            if args.out and stats['outcome'] == 'processed':
+                os.makedirs(args.out, exist_ok=True)
+                # Named apart from the inputs so a recording is never overwritten
+                with open(os.path.join(args.out, f"{Path(path).stem}.preprocessed.webm"), 'wb') as out:
+                    out.write(processed.read())
+
+
+if __name__ == "__main__":
+    main()
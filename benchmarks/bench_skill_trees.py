@@ -0,0 +1,269 @@
+"""
+Skill Tree Benchmarks
+Times the pure skill-tree functions over the real corpus in data/ (every job
+tree and candidate tree), plus list_jobs end-to-end through the Flask test
+client. Results can be saved as a named baseline and later compared against
+it to catch regressions.
+
+Usage:
+    python benchmarks/bench_skill_trees.py                       # run and print
+    python benchmarks/bench_skill_trees.py --save before         # save baseline
+    python benchmarks/bench_skill_trees.py --compare before      # compare to baseline
+    python benchmarks/bench_skill_trees.py --filter similarity --repeat 10
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+from typing import Dict, Any, List, Callable, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+BASELINE_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'baselines')
+
+# Benchmarks timing alternative ways to do the same work, reported side by side as (name, reference)
+COMPARISONS = [('pack_decode', 'json_file_load')]
+JOB_SKILL_TREES_DIR = os.path.join(ROOT_DIR, 'data', 'job_skill_trees')
+CANDIDATE_SKILL_TREES_DIR = os.path.join(ROOT_DIR, 'data', 'candidate_skill_trees')
+
+
+def load_corpus() -> Tuple[List[Tuple[str, str]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Read every job and candidate tree; returns (raw files, job trees, candidate trees)."""
+    raw, jobs, candidates = [], [], []
+    for path in sorted(glob.glob(os.path.join(JOB_SKILL_TREES_DIR, 'job_*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        raw.append((path, text))
+        tree = json.loads(text)
+        if tree.get('job_id'):
+            jobs.append(tree)
+    for path in sorted(glob.glob(os.path.join(CANDIDATE_SKILL_TREES_DIR, 'candidate_*_skill_tree.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        raw.append((path, text))
+        candidates.append(json.loads(text))
+    return raw, jobs, candidates
+
+
+def tree_to_skill_data(tree: Dict[str, Any]) -> Dict[str, Any]:
+    """Reshape a stored tree into the LLM response format build_skill_tree consumes."""
+    def leaves(node):
+        if node.get('type'):
+            yield node['name']
+        for child in node.get('children') or ():
+            yield from leaves(child)
+
+    technical, soft_skills, domains, certifications = {}, [], [], []
+    for category in tree.get('children') or ():
+        name = category.get('name', '')
+        if name == 'Technical Skills':
+            for group in category.get('children') or ():
+                technical[group.get('name', 'other').lower().replace(' ', '_')] = list(leaves(group))
+        elif 'Soft' in name:
+            soft_skills.extend(leaves(category))
+        elif 'Certification' in name:
+            certifications.extend(leaves(category))
+        else:
+            domains.extend(leaves(category))
+    return {"skills": {"technical": technical, "soft_skills": soft_skills,
+                       "domains": domains, "certifications": certifications}}
+
+
+def build_benchmarks() -> List[Tuple[str, Callable[[], Any], int]]:
+    """Benchmarks as (name, function, operations per call)."""
+    # Isolate the app's database and caches from the working tree, and keep tracing out of the timings
+    # and out of data/traces.jsonl
+    tmp_dir = tempfile.mkdtemp(prefix='skill-tree-bench-')
+    os.environ['TALENT_POOL_DB'] = os.path.join(tmp_dir, 'bench.db')
+    os.environ['SKILL_TREE_PACK_PATH'] = os.path.join(tmp_dir, 'skill_trees.pack')
+    os.environ['TRACING_ENABLED'] = '0'
+
+    import app as app_module
+    from skill_tree_common import build_skill_tree, generate_html_visualization, _render_tree_html
+    from skill_tree_pack import write_pack, SkillTreePack, job_key
+
+    raw, jobs, candidates = load_corpus()
+    trees = jobs + candidates
+    skill_data = [tree_to_skill_data(tree) for tree in trees]
+    job_skills = [app_module.extract_skills_from_tree(tree) for tree in jobs]
+    candidate_skills = [app_module.extract_skills_from_tree(tree) for tree in candidates]
+    html_path = os.path.join(tmp_dir, 'tree.html')
+
+    pack_path = os.path.join(tmp_dir, 'bench.pack')
+    write_pack({job_key(tree['job_id']): tree for tree in jobs}, pack_path)
+    pack = SkillTreePack(pack_path)
+    pack_keys = pack.keys()
+    # The same job trees as the pack, read the way the app does without one
+    job_paths = [path for path, text in raw
+                 if path.startswith(JOB_SKILL_TREES_DIR) and json.loads(text).get('job_id')]
+
+    client = app_module.app.test_client()
+
+    def extract_all():
+        for tree in trees:
+            app_module.extract_skills_from_tree(tree)
+
+    def build_all():
+        for data in skill_data:
+            build_skill_tree(data)
+
+    def similarity_all_pairs():
+        for job in job_skills:
+            for candidate in candidate_skills:
+                app_module.find_skill_similarities_simple(job, candidate)
+
+    def render_all():
+        for tree in trees:
+            _render_tree_html(tree)
+
+    def generate_html_all():
+        for tree in trees:
+            generate_html_visualization(tree, html_path, "Benchmark")
+
+    def json_load_all():
+        for _, text in raw:
+            json.loads(text)
+
+    def json_dump_all():
+        for tree in trees:
+            json.dumps(tree, indent=2, ensure_ascii=False)
+
+    def pack_decode_all():
+        for key in pack_keys:
+            pack.get(key)
+
+    def json_file_load_all():
+        for path in job_paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                json.load(f)
+
+    def list_jobs():
+        response = client.get('/api/v1/jobs')
+        assert response.status_code == 200
+        response.get_data()
+
+    pairs = len(job_skills) * len(candidate_skills)
+    return [
+        ('extract_skills_from_tree', extract_all, len(trees)),
+        ('build_skill_tree', build_all, len(skill_data)),
+        ('find_skill_similarities_simple', similarity_all_pairs, pairs),
+        ('_render_tree_html', render_all, len(trees)),
+        ('generate_html_visualization', generate_html_all, len(trees)),
+        ('json_load', json_load_all, len(raw)),
+        ('json_dump', json_dump_all, len(trees)),
+        ('pack_decode', pack_decode_all, len(pack_keys)),
+        ('json_file_load', json_file_load_all, len(job_paths)),
+        ('list_jobs', list_jobs, 1),
+    ]
+
+
+def run_benchmark(func: Callable[[], Any], ops: int, repeat: int, min_time: float) -> Dict[str, Any]:
+    """Time func; each sample repeats it until min_time has elapsed. Reports seconds per operation."""
+    func()  # warm up
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        if time.perf_counter() - start >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / (loops * ops))
+    return {
+        'ops': ops,
+        'loops': loops,
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    """Print a comparison table; returns True if any benchmark regressed beyond threshold."""
+    regressed = False
+    print(f"\n{'benchmark':34} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            print(f"{name:34} {'-':>12} {format_time(result['median']):>12} {'new':>9}")
+            continue
+        change = result['median'] / base['median'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressed = True
+        elif change < -threshold:
+            flag = '  faster'
+        print(f"{name:34} {format_time(base['median']):>12} {format_time(result['median']):>12} "
+              f"{change:>+8.1%}{flag}")
+    return regressed
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark skill tree functions over the data/ corpus")
+    parser.add_argument('--repeat', type=int, default=5, help="timed samples per benchmark")
+    parser.add_argument('--min-time', type=float, default=0.2, help="minimum seconds per sample")
+    parser.add_argument('--filter', default='', help="only run benchmarks whose name contains this")
+    parser.add_argument('--save', metavar='NAME', help="save results as baseline NAME")
+    parser.add_argument('--compare', metavar='NAME', help="compare results with baseline NAME")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="relative slowdown reported as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    results = {}
+    for name, func, ops in build_benchmarks():
+        if args.filter not in name:
+            continue
+        result = run_benchmark(func, ops, args.repeat, args.min_time)
+        results[name] = result
+        print(f"{name:34} {format_time(result['median']):>12} per op  "
+              f"(min {format_time(result['min'])}, {ops} ops x {result['loops']} loops)")
+
+    for name, reference in COMPARISONS:
+        if name in results and reference in results:
+            ratio = results[name]['median'] / results[reference]['median']
+            print(f"\n{name} takes {ratio:.2f}x the time of {reference}")
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, f, indent=2)
+        print(f"\nSaved baseline to {path}")
+
+    if args.compare:
+        path = os.path.join(BASELINE_DIR, f"{args.compare}.json")
+        with open(path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
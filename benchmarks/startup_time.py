@@ -0,0 +1,133 @@
+"""
+Startup Time Report
+Measures cold-start time of the web app and the resume CLI in fresh
+interpreters and breaks import time down per module (from `python -X
+importtime`). With --check, exits non-zero if a target exceeds its time
+budget or imports a module that should only be loaded on first use.
+
+Usage:
+    python benchmarks/startup_time.py                    # report for app and resume_skill_tree
+    python benchmarks/startup_time.py --top 40 --target app
+    python benchmarks/startup_time.py --check            # guard cold start (e.g. in CI)
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from typing import Dict, Any, List, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# target module -> (default budget in seconds, modules it must not import at startup)
+TARGETS = {
+    'app': (1.5, ('pdfplumber', 'pdfminer', 'PyPDF2', 'requests')),
+    'resume_skill_tree': (0.6, ('pdfplumber', 'pdfminer', 'PyPDF2', 'flask', 'requests')),
+}
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """Parse -X importtime output into (module, depth, self us, cumulative us) rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(target: str, env: Dict[str, str]) -> Tuple[float, List[Tuple[str, int, int, int]]]:
+    """Import target in a fresh interpreter; returns (wall seconds, importtime rows)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+                            cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{result.stderr[-2000:]}")
+    return elapsed, parse_importtime(result.stderr)
+
+
+def report(target: str, runs: List[Tuple[float, List[Tuple[str, int, int, int]]]], top: int) -> Dict[str, Any]:
+    times = sorted(elapsed for elapsed, _ in runs)
+    # Break down the run closest to the median
+    median = statistics.median(times)
+    _, rows = min(runs, key=lambda run: abs(run[0] - median))
+
+    packages: Dict[str, int] = {}
+    for name, _, self_us, _ in rows:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    imports_total = sum(packages.values())
+
+    print(f"\n{target}: cold start median {median * 1000:.0f} ms (min {times[0] * 1000:.0f} ms, "
+          f"{len(times)} runs), imports {imports_total / 1000:.0f} ms, {len(rows)} modules")
+    print(f"  {'package':32} {'self':>9} {'share':>7}")
+    for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {package:32} {self_us / 1000:>7.1f}ms {self_us / imports_total:>6.1%}")
+
+    # Rows are listed children first, so the target's direct imports precede its own row
+    direct = []
+    end = max(i for i, row in enumerate(rows) if row[0] == target and row[1] == 0)
+    for name, depth, self_us, cumulative_us in reversed(rows[:end]):
+        if depth == 0:
+            break
+        if depth == 1:
+            direct.append((name, cumulative_us))
+    print(f"  {'imported by ' + target:32} {'cumulative':>9}")
+    for name, cumulative_us in sorted(direct, key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {name:32} {cumulative_us / 1000:>7.1f}ms")
+    print(f"  {target + ' (module body)':32} {rows[end][2] / 1000:>7.1f}ms")
+    return {'median': median, 'modules': {name for name, _, _, _ in rows}}
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Report and guard cold-start time of the app and CLI")
+    parser.add_argument('--target', action='append', choices=sorted(TARGETS),
+                        help="module to measure (default: all)")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters per target")
+    parser.add_argument('--top', type=int, default=15, help="packages listed in the breakdown")
+    parser.add_argument('--check', action='store_true',
+                        help="exit non-zero if a target exceeds its budget or eagerly imports a lazy module")
+    parser.add_argument('--budget', action='append', default=[], metavar='TARGET=SECONDS',
+                        help="override a target's cold-start budget")
+    args = parser.parse_args()
+
+    budgets = {target: budget for target, (budget, _) in TARGETS.items()}
+    for override in args.budget:
+        target, _, seconds = override.partition('=')
+        budgets[target] = float(seconds)
+
+    # Keep the working tree's database out of it; one untimed run seeds the temp database
+    tmp_dir = tempfile.mkdtemp(prefix='startup-time-')
+    env = dict(os.environ, TALENT_POOL_DB=os.path.join(tmp_dir, 'startup.db'))
+
+    failures = []
+    for target in args.target or sorted(TARGETS):
+        measure(target, env)
+        runs = [measure(target, env) for _ in range(args.runs)]
+        result = report(target, runs, args.top)
+
+        eager = [module for module in TARGETS[target][1] if module in result['modules']]
+        if eager:
+            failures.append(f"{target} imports {', '.join(eager)} at startup")
+        if result['median'] > budgets[target]:
+            failures.append(f"{target} cold start {result['median'] * 1000:.0f} ms exceeds "
+                            f"budget {budgets[target] * 1000:.0f} ms")
+
+    if args.check:
+        print()
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        if failures:
+            sys.exit(1)
+        print("Cold start within budget")
+
+
+if __name__ == "__main__":
+    main()
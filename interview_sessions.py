@@ -0,0 +1,96 @@
+"""
+Interview Sessions
+Server-side state of an interview as an append-only event log: transcript
+segments, asked and skipped questions and skill tree node colors. Every event gets
+a sequence number that doubles as a sync cursor, so a client that has seen
+events up to a cursor fetches only what was appended after it, whether it
+is the recording browser, a reconnecting one or an extra observer. The
+current state of an interview is the fold of its events.
+"""
+
+import json
+import secrets
+from typing import Dict, Any, List, Optional, Tuple
+
+# Event type -> field its data must carry
+EVENT_TYPES = {
+    'transcript': 'text',
+    'question_asked': 'question',
+    'question_skipped': 'question',
+    # Node id -> color from a speech analysis
+    'skill_patch': 'patch',
+    # Full analyses, as recorded before skill trees had node ids
+    'skill_analysis': 'mentioned_skills',
+    'questions': 'questions',
+}
+# Events one append request may carry, and the largest event accepted
+MAX_EVENTS_PER_APPEND = 50
+MAX_EVENT_BYTES = 64 * 1024
+# Events returned per sync request
+PAGE_SIZE = 200
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(12)
+
+
+def validate_event(event: Any) -> Tuple[str, Dict[str, Any]]:
+    """
+    Check a client-submitted event.
+
+    Args:
+        event: {'type': ..., 'data': {...}}
+
+    Returns:
+        (type, data)
+
+    Raises:
+        ValueError: If the type is unknown, the data lacks its required field or is too large
+    """
+    if not isinstance(event, dict) or event.get('type') not in EVENT_TYPES:
+        raise ValueError(f"Event type must be one of: {', '.join(EVENT_TYPES)}")
+    data = event.get('data')
+    field = EVENT_TYPES[event['type']]
+    if not isinstance(data, dict) or field not in data:
+        raise ValueError(f"A {event['type']} event needs data.{field}")
+    if event['type'] == 'skill_patch' and not isinstance(data['patch'], dict):
+        raise ValueError("data.patch must map node ids to colors")
+    if len(json.dumps(data)) > MAX_EVENT_BYTES:
+        raise ValueError(f"Event data exceeds {MAX_EVENT_BYTES} bytes")
+    return event['type'], data
+
+
+def transcription_events(transcript: str, skill_patch: Optional[Dict[str, str]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Events recording one transcribed recording and the node colors its skill analysis set."""
+    events = [('transcript', {'text': transcript})]
+    if skill_patch:
+        events.append(('skill_patch', {'patch': skill_patch}))
+    return events
+
+
+def fold(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Replay events into the interview state.
+
+    Returns:
+        transcript and questions in event order, the latest generated questions, and per skill node
+        (by id, or by name for analyses recorded without ids) the latest color the analyses gave it
+    """
+    state = {'transcript': [], 'questions': [], 'recommended_questions': [], 'skills': {}}
+    for event in events:
+        data = event['data']
+        if event['type'] == 'transcript':
+            state['transcript'].append({'text': data['text'], 'created_at': event['created_at']})
+        elif event['type'] in ('question_asked', 'question_skipped'):
+            state['questions'].append({'question': data['question'], 'asked': event['type'] == 'question_asked',
+                                       'created_at': event['created_at']})
+        elif event['type'] == 'questions':
+            state['recommended_questions'] = data['questions']
+        elif event['type'] == 'skill_patch':
+            for node_id, color in data['patch'].items():
+                state['skills'][node_id] = {'color': color}
+        elif event['type'] == 'skill_analysis':
+            for skill in data['mentioned_skills']:
+                if isinstance(skill, dict) and skill.get('mentioned') and skill.get('skill_name') and skill.get('color'):
+                    state['skills'][skill['skill_name']] = {'color': skill['color'], 'reason': skill.get('reason', '')}
+    return state
@@ -0,0 +1,129 @@
+"""
+Interview Event Stream
+Pushes interview session events to clients as Server-Sent Events. A stream
+tails the session's event log from the client's cursor (the Last-Event-ID
+header when the browser reconnects), so a slow client only falls behind in
+the log: nothing is queued per client and each write is at most one page of
+events. Appends made in this process wake waiting streams immediately;
+appends made by other workers are picked up by a short poll of the log.
+
+Every open stream holds a worker thread, so streams per process are capped
+and each stream ends after MAX_STREAM_SECONDS (the browser reconnects from
+its last event id), which also lets draining workers shut down.
+"""
+
+import json
+import time
+import threading
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import metrics
+import interview_sessions
+
+# Comment line sent when nothing else was, so proxies and clients see the connection is alive
+HEARTBEAT_INTERVAL = 15.0
+# How often a waiting stream checks the log for events appended by other workers
+POLL_INTERVAL = 1.0
+MAX_STREAM_SECONDS = 300
+# Browser reconnect delay after a stream ends
+RETRY_MS = 2000
+
+STREAMS_OPEN = metrics.gauge('interview_streams_open', 'Interview event streams currently open in this worker')
+STREAMS_REJECTED = metrics.counter(
+    'interview_streams_rejected_total', 'Interview event streams refused because the worker was at its limit')
+EVENTS_SENT = metrics.counter(
+    'interview_stream_events_total', 'Interview events pushed over event streams', ('type',))
+
+
+def format_event(event: Dict[str, Any]) -> str:
+    """One SSE message; the event's sequence number is its id."""
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+class InterviewStreams:
+    """Appends interview events and serves them as event streams, at most max_streams at a time."""
+
+    def __init__(self, storage, max_streams: int):
+        self.storage = storage
+        self.max_streams = max_streams
+        self._open = 0
+        self._lock = threading.Lock()
+        # Bumped on every local append; waiting streams wake up and read the log
+        self._changed = threading.Condition()
+        self._version = 0
+
+    def append(self, session_id: str, events: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Append (type, data) events to a session's log and wake its streams."""
+        appended = self.storage.append_interview_events(session_id, events)
+        with self._changed:
+            self._version += 1
+            self._changed.notify_all()
+        return appended
+
+    def open(self, session_id: str, since: int, stop: Callable[[], bool]) -> Optional[Iterable[str]]:
+        """
+        Start streaming a session's events after since.
+
+        Args:
+            session_id: Interview session
+            since: Sequence number of the last event the client has
+            stop: Checked between writes; the stream ends when it returns True
+
+        Returns:
+            The SSE messages (a closable response body), or None if this worker already serves max_streams streams
+        """
+        with self._lock:
+            if self._open >= self.max_streams:
+                STREAMS_REJECTED.inc()
+                return None
+            self._open += 1
+        STREAMS_OPEN.inc()
+        return _Stream(self._stream(session_id, since, stop), self._release)
+
+    def open_count(self) -> int:
+        """Streams this worker is serving (each holds a thread)."""
+        return self._open
+
+    def _release(self):
+        with self._lock:
+            self._open -= 1
+        STREAMS_OPEN.dec()
+
+    def _stream(self, session_id: str, cursor: int, stop: Callable[[], bool]) -> Iterator[str]:
+        yield f"retry: {RETRY_MS}\n\n"
+        started = last_write = time.monotonic()
+        while not stop() and time.monotonic() - started < MAX_STREAM_SECONDS:
+            with self._changed:
+                version = self._version
+            events = self.storage.list_interview_events(session_id, cursor, interview_sessions.PAGE_SIZE)
+            if events:
+                # The write blocks while the client's socket is full, so a slow reader is never sent ahead
+                yield ''.join(format_event(event) for event in events)
+                for event in events:
+                    EVENTS_SENT.inc(type=event['type'])
+                cursor = events[-1]['seq']
+                last_write = time.monotonic()
+                continue
+            if time.monotonic() - last_write >= HEARTBEAT_INTERVAL:
+                yield ": heartbeat\n\n"
+                last_write = time.monotonic()
+            with self._changed:
+                self._changed.wait_for(lambda: self._version != version, POLL_INTERVAL)
+
+
+class _Stream:
+    """Response body of a stream; the server calls close() when the response ends or the client goes away."""
+
+    def __init__(self, messages: Iterator[str], release: Callable[[], None]):
+        self._messages = messages
+        self._release = release
+        self._closed = False
+
+    def __iter__(self):
+        return self._messages
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._messages.close()
+            self._release()
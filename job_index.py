@@ -0,0 +1,136 @@
+"""
+Job Skill Tree Index
+Resolves job ids to their skill tree JSON files from a single directory scan
+and keeps recently loaded trees in a bounded LRU cache. The storage import,
+the pack and the question bank all take job files from a JobIndex, so a job
+id with several files resolves to the same file everywhere.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable
+
+import metrics
+
+JOB_FILE_PATTERN = re.compile(r'^job_(\d+)_.*\.json$')
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with hit/miss counters (reported to metrics when named)."""
+
+    def __init__(self, maxsize: int = 128, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                value = self._data[key]
+            else:
+                self.misses += 1
+                value = default
+        if self.name:
+            metrics.record_cache(self.name, value is not default)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader: Callable[[], Any]):
+        """Return the cached value for key, calling loader() on a miss (None results are not cached)."""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class JobIndex:
+    """Maps job ids to skill tree files (the first by name when an id has several), built from one scan of the job directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._paths: Dict[str, str] = {}
+        self._duplicates: Dict[str, List[str]] = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Rescan the directory; call after job tree files are added, renamed or removed."""
+        found: Dict[str, List[str]] = {}
+        try:
+            mtime = os.path.getmtime(self.directory)
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    match = JOB_FILE_PATTERN.match(entry.name)
+                    if match and entry.is_file():
+                        found.setdefault(match.group(1), []).append(entry.path)
+        except FileNotFoundError:
+            mtime = None
+
+        paths = {}
+        duplicates = {}
+        for job_id, files in found.items():
+            files.sort()
+            paths[job_id] = files[0]
+            if len(files) > 1:
+                duplicates[job_id] = files
+                print(f"Warning: job id {job_id} has {len(files)} skill tree files, using "
+                      f"{os.path.basename(files[0])}; also found: "
+                      f"{', '.join(os.path.basename(f) for f in files[1:])}")
+
+        with self._lock:
+            self._paths = paths
+            self._duplicates = duplicates
+            self._mtime = mtime
+
+    def _reload_if_changed(self) -> bool:
+        try:
+            mtime = os.path.getmtime(self.directory)
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            self.reload()
+            return True
+        return False
+
+    def path_for(self, job_id) -> Optional[str]:
+        """Path of the skill tree file for job_id, or None if unknown."""
+        job_id = str(job_id)
+        path = self._paths.get(job_id)
+        if path is None and self._reload_if_changed():
+            path = self._paths.get(job_id)
+        return path
+
+    def paths(self) -> Dict[str, str]:
+        """Job id -> the skill tree file it resolves to, for every job in the directory."""
+        return dict(self._paths)
+
+    @property
+    def duplicates(self) -> Dict[str, List[str]]:
+        """Job ids that map to more than one file, with all candidate paths."""
+        return dict(self._duplicates)
+
+    def __len__(self):
+        return len(self._paths)
@@ -0,0 +1,358 @@
+"""
+Mock xAI API Server
+Local stand-in for the xAI endpoints the app and the stt/ examples call, with
+configurable latency distributions and error rates:
+
+    POST /v1/chat/completions                 canned JSON shaped like the real
+                                              responses parsed in app.py and
+                                              resume_skill_tree.py
+    POST /v1/audio/transcriptions             {"text": ...}
+    GET  /v1/realtime/audio/transcriptions    WebSocket streaming transcripts
+
+Latency specs: fixed:SECONDS, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA.
+
+Usage:
+    python loadtest/mock_xai.py --port 8900 --chat-latency lognormal:1.5:0.5 --error-rate 0.02
+    XAI_API_BASE=http://127.0.0.1:8900/v1 python app.py
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import base64
+import random
+import struct
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Callable, Optional
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+CANNED_QUESTIONS = [
+    "Can you walk me through the most complex system you have designed end to end?",
+    "How do you decide between consistency and availability in a distributed system?",
+    "Describe a production incident you debugged and what you changed afterwards.",
+    "How have you profiled and optimized a performance-critical code path?",
+    "What is your approach to testing infrastructure code?",
+    "Tell me about a time you disagreed with a technical decision and how it was resolved.",
+    "How do you keep large training or data pipelines reproducible?",
+    "Which tradeoffs matter most when choosing a serialization format?",
+]
+
+CANNED_RESUME_ANALYSIS = {
+    "skills": {
+        "technical": {
+            "programming_languages": ["Python", "Rust", "TypeScript", "SQL"],
+            "frameworks": ["PyTorch", "Flask", "React"],
+            "tools": ["Docker", "Kubernetes", "Git"],
+            "databases": ["PostgreSQL", "Redis"],
+            "cloud_platforms": ["AWS", "GCP"]
+        },
+        "soft_skills": ["Communication", "Leadership"],
+        "domains": ["Machine Learning", "Distributed Systems"],
+        "certifications": []
+    },
+    "experience_levels": {"Python": "expert", "Rust": "intermediate"},
+    "skill_relationships": [{"parent": "Python", "child": "PyTorch", "type": "related"}]
+}
+
+CANNED_TRANSCRIPTS = [
+    "I have been writing Python professionally for about eight years, mostly backend services.",
+    "I used Rust during an internship but I would not call myself an expert.",
+    "We ran everything on Kubernetes and I owned the deployment pipeline.",
+    "I don't have much experience with CUDA kernels, honestly.",
+]
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Build a sampler returning a delay in seconds from a latency spec string."""
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(':')] if params else []
+    if kind == 'fixed':
+        return lambda: values[0] if values else 0.0
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'lognormal':
+        median, sigma = values
+        return lambda: random.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class MockConfig:
+    def __init__(self, chat_latency: str = 'fixed:0', stt_latency: str = 'fixed:0',
+                 realtime_latency: str = 'fixed:0', error_rate: float = 0.0, error_status: int = 500,
+                 seed: Optional[int] = None):
+        self.chat_latency = parse_latency(chat_latency)
+        self.stt_latency = parse_latency(stt_latency)
+        self.realtime_latency = parse_latency(realtime_latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        if seed is not None:
+            random.seed(seed)
+
+    def count(self, error: bool):
+        with self._lock:
+            self.requests += 1
+            if error:
+                self.errors += 1
+
+
+def _json_arrays(text: str) -> List[List[str]]:
+    """All JSON string arrays embedded in a prompt."""
+    arrays = []
+    for match in re.finditer(r'\[[^\[\]]*\]', text):
+        try:
+            value = json.loads(match.group(0))
+        except ValueError:
+            continue
+        if isinstance(value, list) and value and all(isinstance(v, str) for v in value):
+            arrays.append(value)
+    return arrays
+
+
+def chat_response_content(system: str, prompt: str) -> str:
+    """Canned assistant message content matching what each app call site parses."""
+    system = system.lower()
+    arrays = _json_arrays(prompt)
+    if 'question bank' in system:
+        skills = arrays[0] if arrays else []
+        return json.dumps([{"question": f"{random.choice(CANNED_QUESTIONS)} ({skill})", "skills": [skill]}
+                           for skill in skills[:24]])
+    if 'question generator' in system:
+        return json.dumps(random.sample(CANNED_QUESTIONS, k=min(8, len(CANNED_QUESTIONS))))
+    if 'skill matching' in system and ' id:\n' in prompt:
+        # Batched matching: one anchor list, then {"<id>": [skills]} for the other side
+        anchor_is_job = prompt.lstrip().startswith('You are a skill matching expert. Compare the skills of one job')
+        anchor_lower = {s.lower(): s for s in (arrays[0] if arrays else [])}
+        items = json.loads(prompt.split(' id:\n', 1)[1].split('\n', 1)[0])
+        results = {}
+        for item_id, skills in items.items():
+            shared = [s for s in skills if s.lower() in anchor_lower]
+            results[item_id] = [[s, anchor_lower[s.lower()], "exact"] if anchor_is_job
+                                else [anchor_lower[s.lower()], s, "exact"] for s in shared]
+        return json.dumps({"results": results})
+    if 'skill matching' in system:
+        job_skills = arrays[0] if arrays else []
+        candidate_skills = arrays[1] if len(arrays) > 1 else []
+        job_lower = {s.lower(): s for s in job_skills}
+        matches = [{"candidate_skill": s, "job_skill": job_lower[s.lower()], "similarity": "exact"}
+                   for s in candidate_skills if s.lower() in job_lower]
+        matched = {m["job_skill"] for m in matches}
+        return json.dumps({
+            "matches": matches,
+            "candidate_only": [s for s in candidate_skills if s.lower() not in job_lower],
+            "job_only": [s for s in job_skills if s not in matched]
+        })
+    if 'interview transcripts' in system:
+        skills = arrays[0] if arrays else []
+        mentioned = random.sample(skills, k=min(2, len(skills)))
+        return json.dumps({"mentioned_skills": [
+            {"skill_name": s, "mentioned": True, "color": random.choice(["red", "yellow", "green"]),
+             "reason": "Mentioned in the transcript."} for s in mentioned
+        ]})
+    if 'resume' in system:
+        return "```json\n" + json.dumps(CANNED_RESUME_ANALYSIS) + "\n```"
+    return "{}"
+
+
+class MockXAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config: MockConfig = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _maybe_fail(self) -> bool:
+        if random.random() < self.config.error_rate:
+            self.config.count(True)
+            status = self.config.error_status
+            headers = {'Retry-After': '1'} if status == 429 else None
+            self._send_json(status, {"error": "injected failure"}, headers)
+            return True
+        self.config.count(False)
+        return False
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+        path = self.path.rstrip('/')
+        if path.endswith('/chat/completions'):
+            time.sleep(self.config.chat_latency())
+            if self._maybe_fail():
+                return
+            payload = json.loads(body or b'{}')
+            messages = payload.get('messages', [])
+            system = ' '.join(m.get('content', '') for m in messages if m.get('role') == 'system')
+            prompt = ' '.join(m.get('content', '') for m in messages if m.get('role') == 'user')
+            content = chat_response_content(system, prompt)
+            prompt_tokens = (len(system) + len(prompt)) // 4
+            completion_tokens = len(content) // 4
+            self._send_json(200, {
+                "id": f"mock-{random.getrandbits(48):012x}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get('model', 'grok-4-fast'),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens}
+            })
+        elif path.endswith('/audio/transcriptions'):
+            time.sleep(self.config.stt_latency())
+            if self._maybe_fail():
+                return
+            self._send_json(200, {"text": random.choice(CANNED_TRANSCRIPTS), "language": "en",
+                                  "duration": round(len(body) / 32000, 2)})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/realtime/audio/transcriptions') and \
+                self.headers.get('Upgrade', '').lower() == 'websocket':
+            self._serve_websocket()
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    # Minimal WebSocket (RFC 6455) support for the realtime transcription stand-in
+
+    def _serve_websocket(self):
+        key = self.headers.get('Sec-WebSocket-Key', '')
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        self.send_response(101, 'Switching Protocols')
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.close_connection = True
+
+        audio_bytes = 0
+        transcript_index = 0
+        words: List[str] = []
+        while True:
+            frame = self._read_frame()
+            if frame is None:
+                return
+            opcode, data = frame
+            if opcode == 0x8:
+                self._write_frame(0x8, data[:2])
+                return
+            if opcode == 0x9:
+                self._write_frame(0xA, data)
+                continue
+            if opcode not in (0x1, 0x2):
+                continue
+            try:
+                message = json.loads(data)
+            except ValueError:
+                continue
+            if message.get('type') != 'audio':
+                continue
+
+            # 16 kHz linear16 mono: emit an interim result per ~0.5 s and a final one per ~2 s of audio
+            previous = audio_bytes
+            audio_bytes += len(base64.b64decode(message.get('data', {}).get('audio', '')))
+            if audio_bytes // 16000 == previous // 16000:
+                continue
+            time.sleep(self.config.realtime_latency())
+            sentence = CANNED_TRANSCRIPTS[transcript_index % len(CANNED_TRANSCRIPTS)].split()
+            words = sentence[:len(words) + max(1, len(sentence) // 4)]
+            is_final = len(words) >= len(sentence)
+            self._write_frame(0x1, json.dumps({"data": {"type": "speech_recognized", "data": {
+                "transcript": ' '.join(words), "is_final": is_final}}}).encode())
+            if is_final:
+                transcript_index += 1
+                words = []
+
+    def _read_exact(self, size: int) -> Optional[bytes]:
+        data = self.rfile.read(size)
+        return data if len(data) == size else None
+
+    def _read_frame(self):
+        header = self._read_exact(2)
+        if header is None:
+            return None
+        opcode = header[0] & 0x0F
+        masked = header[1] & 0x80
+        length = header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('>H', self._read_exact(2) or b'\0\0')[0]
+        elif length == 127:
+            length = struct.unpack('>Q', self._read_exact(8) or b'\0' * 8)[0]
+        mask = self._read_exact(4) if masked else None
+        payload = self._read_exact(length) if length else b''
+        if payload is None:
+            return None
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return opcode, payload
+
+    def _write_frame(self, opcode: int, payload: bytes):
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([len(payload)])
+        elif len(payload) < 1 << 16:
+            header += bytes([126]) + struct.pack('>H', len(payload))
+        else:
+            header += bytes([127]) + struct.pack('>Q', len(payload))
+        self.wfile.write(header + payload)
+        self.wfile.flush()
+
+
+def make_server(port: int, config: MockConfig, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    handler = type('ConfiguredMockXAIHandler', (MockXAIHandler,), {'config': config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--chat-latency', default='lognormal:1.0:0.4', help="chat-completions latency spec")
+    parser.add_argument('--stt-latency', default='lognormal:0.6:0.3', help="audio-transcriptions latency spec")
+    parser.add_argument('--realtime-latency', default='fixed:0.05', help="per realtime transcript latency spec")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument('--error-status', type=int, default=500, help="HTTP status of injected failures")
+    parser.add_argument('--seed', type=int, default=None, help="random seed")
+
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(args.chat_latency, args.stt_latency, args.realtime_latency,
+                      args.error_rate, args.error_status, args.seed)
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Mock xAI API server for load testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = make_server(args.port, config_from_args(args), args.host)
+    print(f"Mock xAI API listening on http://{args.host}:{server.server_port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
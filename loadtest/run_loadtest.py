@@ -0,0 +1,293 @@
+"""
+Interview Load Test
+Drives simulated interviews against the Flask app at increasing concurrency
+levels while the app talks to a local mock xAI server (loadtest/mock_xai.py),
+and reports throughput, latency percentiles and error rates per endpoint.
+
+Each simulated interview: list jobs, fetch a job skill tree, upload a resume,
+generate questions, then transcribe a number of recordings.
+
+By default both the mock server and the app are started as subprocesses on
+free ports; pass --app-url and/or --xai-url to target running instances.
+
+Usage:
+    python loadtest/run_loadtest.py --concurrency 1,4,16 --duration 30
+    python loadtest/run_loadtest.py --chat-latency lognormal:2:0.6 --error-rate 0.05 --json results.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+
+import requests
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(LOADTEST_DIR)
+sys.path.insert(0, LOADTEST_DIR)
+
+import mock_xai
+
+DEFAULT_RESUME = os.path.join(ROOT_DIR, 'data', 'AlbertoMejiaResume.pdf')
+DEFAULT_AUDIO = os.path.join(ROOT_DIR, 'stt', 'audio', 'mono.wav')
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=2)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def serve_app(port: int):
+    """Run the Flask app on a threaded werkzeug server (subprocess entry point)."""
+    import logging
+    sys.path.insert(0, ROOT_DIR)
+    from werkzeug.serving import make_server
+    from app import app
+
+    # Per-request access logs would dominate the run's output
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    print(f"App listening on http://127.0.0.1:{port}", flush=True)
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class Recorder:
+    """Thread-safe collection of per-endpoint request outcomes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.interviews = 0
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def interview_done(self):
+        with self._lock:
+            self.interviews += 1
+
+
+class InterviewClient:
+    """One simulated interviewer issuing requests sequentially."""
+
+    def __init__(self, base_url: str, recorder: Recorder, resume: bytes, audio: bytes, audio_name: str,
+                 recordings: int, unique_resumes: bool):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.resume = resume
+        self.audio = audio
+        self.audio_name = audio_name
+        self.recordings = recordings
+        self.unique_resumes = unique_resumes
+        self.session = requests.Session()
+
+    def _call(self, endpoint: str, method: str, path: str, **kwargs) -> Optional[requests.Response]:
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=300, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        self.recorder.record(endpoint, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    def run_interview(self, jobs: List[Dict[str, Any]]):
+        response = self._call('list_jobs', 'GET', '/api/v1/jobs')
+        if response is not None:
+            jobs = response.json().get('jobs') or jobs
+        job = random.choice(jobs) if jobs else {'job_id': 'default', 'job_title': 'Software Engineer'}
+        job_id = job['job_id']
+
+        response = self._call('skill_tree', 'GET', f'/api/v1/skill-trees/{job_id}')
+        job_tree = response.json() if response is not None else None
+
+        resume = self.resume
+        if self.unique_resumes:
+            # Trailing bytes change the content hash without breaking the PDF
+            resume += f"\n%loadtest-{random.getrandbits(64):016x}\n".encode()
+        response = self._call('upload_resume', 'POST', '/api/v1/upload-resume',
+                              files={'resume': ('resume.pdf', resume, 'application/pdf')},
+                              data={'job_id': str(job_id)})
+        candidate_tree = response.json().get('skill_tree') if response is not None else None
+
+        self._call('generate_questions', 'POST', '/api/v1/generate-interview-questions', json={
+            'job_skill_tree': job_tree,
+            'candidate_skill_tree': candidate_tree,
+            'job_title': job.get('job_title', ''),
+            'location': job.get('location', '')
+        })
+
+        for _ in range(self.recordings):
+            self._call('transcribe_audio', 'POST', '/api/v1/transcribe-audio',
+                       files={'audio': (self.audio_name, self.audio)}, data={'job_id': str(job_id)})
+
+        self.recorder.interview_done()
+
+
+def run_level(base_url: str, concurrency: int, duration: float, args, jobs) -> Dict[str, Any]:
+    """Run interviews with the given number of concurrent clients for duration seconds."""
+    recorder = Recorder()
+    with open(args.resume, 'rb') as f:
+        resume = f.read()
+    with open(args.audio, 'rb') as f:
+        audio = f.read()
+    stop_at = time.time() + duration
+
+    def worker():
+        client = InterviewClient(base_url, recorder, resume, audio, os.path.basename(args.audio),
+                                 args.recordings, args.unique_resumes)
+        while time.time() < stop_at:
+            client.run_interview(jobs)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    total_requests = total_errors = 0
+    for endpoint, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        errors = recorder.errors.get(endpoint, 0)
+        total_requests += len(latencies)
+        total_errors += errors
+        endpoints[endpoint] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'error_rate': errors / len(latencies),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1],
+        }
+    return {
+        'concurrency': concurrency,
+        'elapsed': elapsed,
+        'interviews': recorder.interviews,
+        'requests': total_requests,
+        'throughput_rps': total_requests / elapsed if elapsed else 0.0,
+        'interviews_per_minute': recorder.interviews / elapsed * 60 if elapsed else 0.0,
+        'error_rate': total_errors / total_requests if total_requests else 0.0,
+        'endpoints': endpoints,
+    }
+
+
+def print_level(result: Dict[str, Any]):
+    print(f"\nconcurrency={result['concurrency']}  interviews={result['interviews']}  "
+          f"requests={result['requests']}  throughput={result['throughput_rps']:.2f} req/s  "
+          f"({result['interviews_per_minute']:.1f} interviews/min)  errors={result['error_rate']:.1%}")
+    print(f"  {'endpoint':20} {'reqs':>6} {'err%':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for endpoint, stats in result['endpoints'].items():
+        print(f"  {endpoint:20} {stats['requests']:>6} {stats['error_rate']:>6.1%} "
+              f"{stats['p50'] * 1000:>7.0f}ms {stats['p95'] * 1000:>7.0f}ms "
+              f"{stats['p99'] * 1000:>7.0f}ms {stats['max'] * 1000:>7.0f}ms")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Load test the interview app against a mock xAI API")
+    parser.add_argument('--serve-app', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    parser.add_argument('--app-url', help="use a running app instead of starting one")
+    parser.add_argument('--xai-url', help="use a running (mock) xAI API base URL instead of starting one")
+    parser.add_argument('--concurrency', default='1,4,16', help="comma-separated concurrency levels")
+    parser.add_argument('--duration', type=float, default=20, help="seconds per concurrency level")
+    parser.add_argument('--recordings', type=int, default=5, help="audio transcriptions per interview")
+    parser.add_argument('--resume', default=DEFAULT_RESUME, help="PDF uploaded as the candidate resume")
+    parser.add_argument('--audio', default=DEFAULT_AUDIO, help="audio file sent for each recording")
+    parser.add_argument('--unique-resumes', action='store_true',
+                        help="make every upload a cache miss so resume analysis runs each time")
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON")
+    mock_xai.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.serve_app:
+        serve_app(args.serve_app)
+        return
+
+    processes = []
+    tmp_dir = tempfile.mkdtemp(prefix='interview-loadtest-')
+    try:
+        xai_url = args.xai_url
+        if not xai_url:
+            port = free_port()
+            mock_args = [sys.executable, os.path.join(LOADTEST_DIR, 'mock_xai.py'), '--port', str(port),
+                         '--chat-latency', args.chat_latency, '--stt-latency', args.stt_latency,
+                         '--realtime-latency', args.realtime_latency, '--error-rate', str(args.error_rate),
+                         '--error-status', str(args.error_status)]
+            if args.seed is not None:
+                mock_args += ['--seed', str(args.seed)]
+            processes.append(subprocess.Popen(mock_args))
+            xai_url = f"http://127.0.0.1:{port}/v1"
+            wait_for(xai_url)
+
+        app_url = args.app_url
+        if not app_url:
+            port = free_port()
+            env = dict(os.environ, XAI_API_BASE=xai_url, XAI_API_KEY=os.getenv('LOADTEST_API_KEY', 'mock-key'),
+                       TALENT_POOL_DB=os.path.join(tmp_dir, 'loadtest.db'))
+            processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve-app', str(port)],
+                                              env=env, stdout=subprocess.DEVNULL))
+            app_url = f"http://127.0.0.1:{port}"
+            wait_for(app_url + '/api/v1/jobs')
+
+        jobs = requests.get(app_url + '/api/v1/jobs', timeout=30).json().get('jobs', [])
+        print(f"Target app {app_url}, xAI API {xai_url}, {len(jobs)} jobs")
+
+        results = []
+        for level in [int(c) for c in args.concurrency.split(',') if c.strip()]:
+            result = run_level(app_url, level, args.duration, args, jobs)
+            print_level(result)
+            results.append(result)
+
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({'app_url': app_url, 'xai_url': xai_url, 'levels': results}, f, indent=2)
+            print(f"\nWrote {args.json}")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,124 @@
+"""
+Production Server
+Runs the Flask app under gunicorn: a pre-fork server with threaded workers.
+The app and the job catalog are loaded once in the master before forking, so
+parsed skill trees are shared copy-on-write between workers. On SIGTERM each
+worker fails its readiness check, finishes in-flight requests and waits for
+outstanding xAI API calls before exiting.
+
+Usage:
+    python main.py                                  # WEB_CONCURRENCY workers x WEB_THREADS threads
+    python main.py --workers 4 --threads 16 --bind 0.0.0.0:8000
+"""
+
+import gc
+import os
+import sys
+import signal
+import argparse
+import importlib
+import multiprocessing
+
+from gunicorn.app.base import BaseApplication
+
+import xai_client
+
+# Enough to finish a request that is waiting on a full-length API call
+DEFAULT_GRACEFUL_TIMEOUT = xai_client.DEFAULT_TIMEOUT + 15
+
+# Modules the app imports lazily on first use; importing them in the master shares them with workers
+LAZY_MODULES = ('requests', 'pdfplumber', 'PyPDF2')
+
+
+def default_workers() -> int:
+    return int(os.getenv('WEB_CONCURRENCY', str(min(multiprocessing.cpu_count(), 4))))
+
+
+def warm_app():
+    """Import the app and warm its caches; returns the WSGI app."""
+    import app as app_module
+    loaded = app_module.warm_caches()
+    print(f"Warmed job tree cache with {loaded} trees (pid {os.getpid()})")
+    return app_module.app
+
+
+def post_fork(server, worker):
+    # Threads do not survive fork, so the preloaded app's upload janitor is restarted in each worker
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.upload_janitor.start()
+
+
+def post_worker_init(worker):
+    import app as app_module
+    handle_term = signal.getsignal(signal.SIGTERM)
+
+    def begin_drain(signum, frame):
+        app_module.begin_drain()
+        if callable(handle_term):
+            handle_term(signum, frame)
+
+    signal.signal(signal.SIGTERM, begin_drain)
+
+
+def worker_exit(server, worker):
+    # Requests are already finished here; wait for API calls made outside of requests
+    if not xai_client.wait_idle(worker.cfg.graceful_timeout):
+        worker.log.warning("Exiting with %d xAI API calls still in flight", xai_client.in_flight())
+
+
+class InterviewServer(BaseApplication):
+    """Gunicorn application that preloads and warms the Flask app before forking workers."""
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        application = warm_app()
+        if self.cfg.preload_app:
+            for name in LAZY_MODULES:
+                importlib.import_module(name)
+        # Keep the preloaded objects out of the cyclic GC so collections in workers do not touch
+        # (and copy) their pages
+        gc.freeze()
+        return application
+
+
 def main():
-    print("Hello from interviewing-site!")
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Run the interview app with gunicorn")
+    parser.add_argument('--bind', default=os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}"))
+    parser.add_argument('--workers', type=int, default=default_workers())
+    parser.add_argument('--threads', type=int, default=int(os.getenv('WEB_THREADS', '8')),
+                        help="threads per worker; requests mostly wait on the xAI API")
+    parser.add_argument('--graceful-timeout', type=int,
+                        default=int(os.getenv('GRACEFUL_TIMEOUT', str(DEFAULT_GRACEFUL_TIMEOUT))))
+    parser.add_argument('--no-preload', action='store_true', help="load the app separately in each worker")
+    args = parser.parse_args()
+    # The app sizes its admission control by the threads per worker and splits the xAI rate limits
+    # between workers
+    os.environ['WEB_THREADS'] = str(args.threads)
+    os.environ['WEB_WORKERS'] = str(args.workers)
+
+    InterviewServer({
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'preload_app': not args.no_preload,
+        'graceful_timeout': args.graceful_timeout,
+        # Worker heartbeats come from the main loop, not request threads, so this can stay short
+        'timeout': 30,
+        'accesslog': os.getenv('ACCESS_LOG', '-'),
+        'post_fork': post_fork,
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit,
+    }).run()
 
 
 if __name__ == "__main__":
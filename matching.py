@@ -0,0 +1,385 @@
+"""
+Skill Matching
+Matches candidate skill lists against job skill lists. match_pair() asks the
+xAI API about one job/candidate pair; match_batch() packs many candidates
+against one job (or many jobs against one candidate) into as few calls as the
+token budget allows and reads back a structured per-item response. Items whose
+part of a batch response fails validation are retried with per-pair calls,
+and skills are matched locally when there is no API key or the API is
+unavailable. Every function returns the same structure:
+
+    {"matches": [{"candidate_skill", "job_skill", "similarity"}], "candidate_only": [...], "job_only": [...]}
+"""
+
+import json
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import metrics
+import prompts
+import xai_client
+
+MODEL = "grok-4-fast"
+SIMILARITY_KINDS = ('exact', 'synonym', 'related')
+
+# Roughly what one ["candidate skill","job skill","related"] triple costs in the response
+MATCH_TOKENS = 16
+# Items per batch call, and the response size a batch is sized for
+MAX_BATCH_ITEMS = 25
+MAX_BATCH_COMPLETION_TOKENS = 4000
+# Batch and per-item retry calls sent at once
+BATCH_CONCURRENCY = 4
+
+BATCH_ITEMS = metrics.counter(
+    'similarity_batch_items_total',
+    'Items matched by batched similarity calls, by outcome (ok, retried alone, matched locally)', ('outcome',))
+
+MATCHING_CRITERIA = """Consider:
+- Exact matches (case-insensitive)
+- Synonyms (e.g., "Python" matches "Python programming")
+- Related skills (e.g., "React" matches "React.js" or "React framework")
+- Abbreviations (e.g., "ML" matches "Machine Learning")"""
+
+
+def find_skill_similarities_simple(job_skills: List[str], candidate_skills: List[str]) -> Dict[str, Any]:
+    """Simple fallback matching using lowercase comparison"""
+    matches = []
+    candidate_only = []
+    job_only = []
+
+    for candidate_skill in candidate_skills:
+        candidate_lower = candidate_skill.lower()
+        matched = False
+        for job_skill in job_skills:
+            job_lower = job_skill.lower()
+            if candidate_lower == job_lower or candidate_lower in job_lower or job_lower in candidate_lower:
+                matches.append({
+                    "candidate_skill": candidate_skill,
+                    "job_skill": job_skill,
+                    "similarity": "exact" if candidate_lower == job_lower else "related"
+                })
+                matched = True
+                break
+        if not matched:
+            candidate_only.append(candidate_skill)
+
+    for job_skill in job_skills:
+        job_lower = job_skill.lower()
+        if not any(job_lower == m["job_skill"].lower() for m in matches):
+            job_only.append(job_skill)
+
+    return {
+        "matches": matches,
+        "candidate_only": candidate_only,
+        "job_only": job_only
+    }
+
+
+def _fit(skills: List[str]) -> Tuple[List[str], List[str]]:
+    # Each side of a comparison gets half of the per-pair budget
+    return prompts.fit_items(prompts.dedupe(skills), prompts.BUDGETS['similarity'] // 2)
+
+
+def _add_dropped(similarity_data: Dict[str, Any], job_skills: List[str], candidate_skills: List[str],
+                 dropped_job_skills: List[str], dropped_candidate_skills: List[str]) -> Dict[str, Any]:
+    """Match skills that were left out of the prompt locally and merge them into the result."""
+    if dropped_job_skills or dropped_candidate_skills:
+        matches = similarity_data.setdefault('matches', [])
+        candidate_only = similarity_data.setdefault('candidate_only', [])
+        # Candidate skills the model never saw, against every job skill
+        local = find_skill_similarities_simple(job_skills, dropped_candidate_skills)
+        matches.extend(local['matches'])
+        candidate_only.extend(local['candidate_only'])
+        # Job skills the model never saw (and no dropped candidate skill matched), against every candidate skill
+        matched = {m.get('job_skill', '').lower() for m in matches}
+        local = find_skill_similarities_simple(
+            [skill for skill in dropped_job_skills if skill.lower() not in matched], candidate_skills)
+        matches.extend(local['matches'])
+        similarity_data.setdefault('job_only', []).extend(local['job_only'])
+        newly_matched = {m['candidate_skill'].lower() for m in local['matches']}
+        similarity_data['candidate_only'] = [skill for skill in candidate_only if skill.lower() not in newly_matched]
+    return similarity_data
+
+
+def match_pair(api_key: Optional[str], job_skills: List[str], candidate_skills: List[str]) -> Dict[str, Any]:
+    """
+    Match one candidate's skills against one job's skills with a single API call.
+
+    Args:
+        api_key: xAI API key (matches locally if empty)
+        job_skills: Job skill and requirement names
+        candidate_skills: Candidate skill names
+
+    Returns:
+        Similarity data (see module docstring)
+    """
+    if not api_key:
+        # Fallback to simple matching if no API key
+        return find_skill_similarities_simple(job_skills, candidate_skills)
+
+    prompt_job_skills, dropped_job_skills = _fit(job_skills)
+    prompt_candidate_skills, dropped_candidate_skills = _fit(candidate_skills)
+
+    prompt = f"""You are a skill matching expert. Compare the following two lists of skills and identify which candidate skills match or are similar to job skills.
+
+Job Skills:
+{prompts.compact_json(prompt_job_skills)}
+
+Candidate Skills:
+{prompts.compact_json(prompt_candidate_skills)}
+
+For each candidate skill, determine if it matches or is similar to any job skill. {MATCHING_CRITERIA}
+
+Return a JSON object with this structure:
+{{
+    "matches": [
+        {{
+            "candidate_skill": "candidate skill name",
+            "job_skill": "matching job skill name",
+            "similarity": "exact|synonym|related"
+        }}
+    ],
+    "candidate_only": ["skill1", "skill2"],
+    "job_only": ["skill1", "skill2"]
+}}
+
+Only return valid JSON, no additional text."""
+
+    messages = [
+        {
+            "role": "system",
+            "content": "You are a skill matching expert. Always return valid JSON only."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+    prompts.record('similarity', messages, len(dropped_job_skills) + len(dropped_candidate_skills))
+
+    try:
+        result = xai_client.chat_completion('similarity', api_key, messages, model=MODEL, temperature=0.1)
+        content = xai_client.message_content(result)
+
+        similarity_data = json.loads(content)
+        return _add_dropped(similarity_data, job_skills, candidate_skills, dropped_job_skills, dropped_candidate_skills)
+
+    except Exception as e:
+        print(f"Error calling Grok API for skill matching: {e}")
+        # Fallback to simple matching
+        return find_skill_similarities_simple(job_skills, candidate_skills)
+
+
+# Batched matching
+
+def _key(skill: str) -> str:
+    return ' '.join(skill.lower().split())
+
+
+class _Item:
+    """One list in a batch, with the prompt-sized skill lists for its pair."""
+
+    def __init__(self, index: int, job_skills: List[str], candidate_skills: List[str],
+                 prompt_job_skills: List[str], prompt_candidate_skills: List[str],
+                 dropped_job_skills: List[str], dropped_candidate_skills: List[str]):
+        self.index = index
+        self.job_skills = job_skills
+        self.candidate_skills = candidate_skills
+        self.prompt_job_skills = prompt_job_skills
+        self.prompt_candidate_skills = prompt_candidate_skills
+        self.dropped_job_skills = dropped_job_skills
+        self.dropped_candidate_skills = dropped_candidate_skills
+
+
+def _batches(items: List[_Item], anchor_tokens: int, anchor: str) -> List[List[_Item]]:
+    """Greedily group items so each call's variable content and expected response fit the budgets."""
+    budget = prompts.BUDGETS['similarity_batch']
+    batches = []
+    current: List[_Item] = []
+    used = anchor_tokens
+    completion = 0
+    for item in items:
+        skills = item.prompt_candidate_skills if anchor == 'job' else item.prompt_job_skills
+        cost = prompts.estimate_tokens(prompts.compact_json({str(item.index): skills})) + 1
+        # Each candidate skill yields at most one match triple
+        response = MATCH_TOKENS * min(len(item.prompt_candidate_skills), len(item.prompt_job_skills)) + 4
+        if current and (used + cost > budget or completion + response > MAX_BATCH_COMPLETION_TOKENS
+                        or len(current) >= MAX_BATCH_ITEMS):
+            batches.append(current)
+            current, used, completion = [], anchor_tokens, 0
+        current.append(item)
+        used += cost
+        completion += response
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _validate(entry: Any, item: _Item) -> Optional[Dict[str, Any]]:
+    """Similarity data for an item's part of a batch response, or None if it is malformed."""
+    if not isinstance(entry, list):
+        return None
+    candidates = {_key(skill): skill for skill in item.prompt_candidate_skills}
+    jobs = {_key(skill): skill for skill in item.prompt_job_skills}
+    matches = []
+    matched_candidates = set()
+    matched_jobs = set()
+    for triple in entry:
+        if not (isinstance(triple, list) and len(triple) == 3 and all(isinstance(v, str) for v in triple)):
+            return None
+        candidate_skill, job_skill, similarity = triple
+        candidate_key, job_key = _key(candidate_skill), _key(job_skill)
+        # Names must come from the lists in the prompt
+        if candidate_key not in candidates or job_key not in jobs or similarity not in SIMILARITY_KINDS:
+            return None
+        if candidate_key in matched_candidates:
+            continue
+        matched_candidates.add(candidate_key)
+        matched_jobs.add(job_key)
+        matches.append({
+            "candidate_skill": candidates[candidate_key],
+            "job_skill": jobs[job_key],
+            "similarity": similarity
+        })
+    similarity_data = {
+        "matches": matches,
+        "candidate_only": [s for s in item.prompt_candidate_skills if _key(s) not in matched_candidates],
+        "job_only": [s for s in item.prompt_job_skills if _key(s) not in matched_jobs]
+    }
+    return _add_dropped(similarity_data, item.job_skills, item.candidate_skills, item.dropped_job_skills,
+                        item.dropped_candidate_skills)
+
+
+def _batch_messages(batch: List[_Item], anchor: str) -> List[Dict[str, str]]:
+    if anchor == 'job':
+        anchor_label, item_label = 'job', 'candidate'
+        anchor_skills = batch[0].prompt_job_skills
+        item_skills = {str(item.index): item.prompt_candidate_skills for item in batch}
+    else:
+        anchor_label, item_label = 'candidate', 'job'
+        anchor_skills = batch[0].prompt_candidate_skills
+        item_skills = {str(item.index): item.prompt_job_skills for item in batch}
+
+    prompt = f"""You are a skill matching expert. Compare the skills of one {anchor_label} with the skills of each of several {item_label}s, and identify which candidate skills match or are similar to job skills.
+
+{anchor_label.capitalize()} Skills:
+{prompts.compact_json(anchor_skills)}
+
+{item_label.capitalize()} Skills by {item_label} id:
+{prompts.compact_json(item_skills)}
+
+For every {item_label}, determine for each candidate skill whether it matches or is similar to any job skill. {MATCHING_CRITERIA}
+
+Return a JSON object with an entry for every {item_label} id listing its matches as [candidate skill, job skill, similarity] triples, where similarity is one of "exact", "synonym" or "related". Use skill names exactly as given and an empty list for no matches:
+{{"results":{{"<{item_label} id>":[["candidate skill","job skill","exact"]]}}}}
+
+Only return valid JSON, no additional text."""
+
+    return [
+        {
+            "role": "system",
+            "content": "You are a skill matching expert. Always return valid JSON only."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def _match_batch_call(api_key: str, batch: List[_Item], anchor: str) -> Dict[int, Optional[Dict[str, Any]]]:
+    """
+    Send one batch; returns similarity data per item index (None for items to retry alone).
+
+    Raises:
+        Whatever xai_client.chat_completion raises when the call itself fails
+    """
+    messages = _batch_messages(batch, anchor)
+    dropped = sum(len(item.dropped_candidate_skills) if anchor == 'job' else len(item.dropped_job_skills)
+                  for item in batch)
+    prompts.record('similarity_batch', messages, dropped)
+
+    result = xai_client.chat_completion('similarity_batch', api_key, messages, model=MODEL, temperature=0.1)
+    try:
+        entries = json.loads(xai_client.message_content(result)).get('results')
+    except (ValueError, AttributeError):
+        entries = None
+    if not isinstance(entries, dict):
+        print(f"Batched skill matching returned no usable results for {len(batch)} items")
+        entries = {}
+    return {item.index: _validate(entries.get(str(item.index)), item) for item in batch}
+
+
+def match_batch(api_key: Optional[str], anchor_skills: List[str], skill_lists: List[List[str]],
+                anchor: str = 'job') -> List[Dict[str, Any]]:
+    """
+    Match many skill lists against one in as few API calls as the token budget allows.
+
+    Args:
+        api_key: xAI API key (matches locally if empty)
+        anchor_skills: The shared list: a job's skills (anchor='job') or a candidate's (anchor='candidate')
+        skill_lists: Candidate skill lists (anchor='job') or job skill lists (anchor='candidate')
+        anchor: Which side anchor_skills is on
+
+    Returns:
+        Similarity data for each list in skill_lists, in order
+    """
+    if anchor not in ('job', 'candidate'):
+        raise ValueError(f"anchor must be 'job' or 'candidate', not {anchor!r}")
+
+    def pair(skills):
+        return (anchor_skills, skills) if anchor == 'job' else (skills, anchor_skills)
+
+    if not api_key:
+        return [find_skill_similarities_simple(*pair(skills)) for skills in skill_lists]
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(skill_lists)
+    prompt_anchor, dropped_anchor = _fit(anchor_skills)
+    items = []
+    for index, skills in enumerate(skill_lists):
+        prompt_skills, dropped_skills = _fit(skills)
+        if not prompt_anchor or not prompt_skills:
+            # Nothing to ask about
+            results[index] = find_skill_similarities_simple(*pair(skills))
+        elif anchor == 'job':
+            items.append(_Item(index, anchor_skills, skills, prompt_anchor, prompt_skills, dropped_anchor, dropped_skills))
+        else:
+            items.append(_Item(index, skills, anchor_skills, prompt_skills, prompt_anchor, dropped_skills, dropped_anchor))
+
+    anchor_tokens = prompts.estimate_tokens(prompts.compact_json(prompt_anchor))
+    batches = _batches(items, anchor_tokens, anchor)
+
+    def run_batch(batch):
+        try:
+            return batch, _match_batch_call(api_key, batch, anchor), None
+        except Exception as e:
+            return batch, {}, e
+
+    retry = []
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix='similarity-batch') as pool:
+        # Worker threads inherit the caller's context, including its request deadline
+        context = contextvars.copy_context()
+        for batch, matched, error in pool.map(lambda batch: context.copy().run(run_batch, batch), batches):
+            if error is not None:
+                # The API failed as a whole, so per-item calls would too
+                print(f"Error calling Grok API for batched skill matching: {error}")
+                for item in batch:
+                    results[item.index] = find_skill_similarities_simple(item.job_skills, item.candidate_skills)
+                BATCH_ITEMS.inc(len(batch), outcome='local')
+                continue
+            for item in batch:
+                if matched[item.index] is None:
+                    retry.append(item)
+                else:
+                    results[item.index] = matched[item.index]
+                    BATCH_ITEMS.inc(outcome='ok')
+
+        if retry:
+            BATCH_ITEMS.inc(len(retry), outcome='retried')
+            retried = pool.map(
+                lambda item: context.copy().run(match_pair, api_key, item.job_skills, item.candidate_skills), retry)
+            for item, similarity_data in zip(retry, retried):
+                results[item.index] = similarity_data
+    return results
@@ -0,0 +1,258 @@
+"""
+Metrics
+Minimal in-process counters, gauges and latency histograms exposed in the
+Prometheus text format, plus Flask hooks for per-route request latency.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple, Callable, Optional, Iterator
+
+import tracing
+
+# Latency buckets in seconds, wide enough for minute-scale LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class _ScalarMetric(_Metric):
+    """One value per label set, stored here or read from a callback at scrape time."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        if self._callback:
+            return self._callback()
+        with self._lock:
+            return dict(self._values)
+
+    def collect(self) -> List[str]:
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in sorted(self.values().items())
+        ]
+
+
+class Counter(_ScalarMetric):
+    """Monotonically increasing value per label set."""
+    kind = 'counter'
+
+
+class Gauge(_ScalarMetric):
+    """Value that can go up and down."""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram of observed values per label set."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}   # bucket counts..., sum, count
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        lines = self.header()
+        for key, values in sorted(series.items()):
+            for bound, count in zip(self.buckets, values):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(count)}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(values[-2])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(values[-1])}')
+        return lines
+
+
+class Registry:
+    """Ordered collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.collect())
+            except Exception as e:
+                print(f"Error collecting metric {metric.name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Tuple[str, ...] = (), callback=None) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames, callback))
+
+
+def gauge(name: str, documentation: str, labelnames: Tuple[str, ...] = (), callback=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, callback))
+
+
+def histogram(name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+              buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# Core application metrics
+
+HTTP_REQUEST_DURATION = histogram(
+    'http_request_duration_seconds', 'Flask request latency by route', ('route', 'method', 'status'))
+UPSTREAM_REQUEST_DURATION = histogram(
+    'upstream_request_duration_seconds', 'xAI API call latency by call site', ('call_site', 'outcome'))
+UPSTREAM_TOKENS = counter(
+    'upstream_tokens_total', 'Tokens reported by xAI API responses', ('call_site', 'model', 'kind'))
+PIPELINE_STAGE_DURATION = histogram(
+    'pipeline_stage_duration_seconds', 'Duration of request pipeline stages', ('stage',))
+CACHE_REQUESTS = counter(
+    'cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result'))
+
+
+def _cache_hit_ratios() -> Dict[Tuple[str, ...], float]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), value in CACHE_REQUESTS.values().items():
+        hits_total = totals.setdefault(cache, [0, 0])
+        hits_total[1] += value
+        if result == 'hit':
+            hits_total[0] += value
+    return {(cache,): hits / total for cache, (hits, total) in totals.items() if total}
+
+
+CACHE_HIT_RATIO = gauge('cache_hit_ratio', 'Fraction of cache lookups that were hits', ('cache',),
+                        callback=_cache_hit_ratios)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+@contextmanager
+def stage(name: str, **attrs) -> Iterator[None]:
+    """Context manager timing one pipeline stage, also recorded as a span of the current trace."""
+    with PIPELINE_STAGE_DURATION.time(stage=name), tracing.span(name, **attrs):
+        yield
+
+
+def record_token_usage(call_site: str, result: Dict[str, Any]):
+    """Count token usage from an OpenAI-compatible response body."""
+    usage = result.get('usage') if isinstance(result, dict) else None
+    if not isinstance(usage, dict):
+        return
+    model = result.get('model', '')
+    for kind in ('prompt_tokens', 'completion_tokens', 'reasoning_tokens'):
+        value = usage.get(kind)
+        if value is None and kind == 'reasoning_tokens':
+            value = (usage.get('completion_tokens_details') or {}).get('reasoning_tokens')
+        if isinstance(value, (int, float)) and value:
+            UPSTREAM_TOKENS.inc(value, call_site=call_site, model=model, kind=kind.replace('_tokens', ''))
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def init_app(app):
+    """Record per-route latency for every request and serve /metrics."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_latency(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, route=route,
+                                          method=request.method, status=response.status_code)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,261 @@
+"""
+Request Profiling
+Opt-in profiling for the Flask app: per-request cProfile or statistical
+stack sampling (triggered by header or by random sampling), tracemalloc
+snapshots for tracking memory growth, and token-protected endpoints for
+listing and downloading the captured profiles.
+
+Trigger a profile with the headers `X-Profile: cprofile` (or `sample`) and
+`X-Profile-Token: <PROFILING_TOKEN>`; the response carries `X-Profile-Id`.
+"""
+
+import io
+import os
+import sys
+import hmac
+import time
+import random
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+# Functions summarized at the top of every cProfile report
+HOT_PATHS = (
+    'extract_skills_from_tree',
+    'extract_text_from_pdf',
+    '_render_tree_html',
+    '_iter_tree_html',
+    'build_skill_tree',
+    'find_skill_similarities_simple',
+)
+
+PROFILE_EXTENSIONS = ('.prof', '.txt', '.collapsed', '.tracemalloc')
+
+
+class StackSampler:
+    """Statistical profiler that periodically samples one thread's Python stack."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """Samples in collapsed-stack format (for flamegraph.pl or speedscope)."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class Profiler:
+    """Captures and stores request profiles and memory snapshots."""
+
+    def __init__(self, profile_dir: str, token: Optional[str] = None, sample_rate: float = 0.0,
+                 keep: int = 50, sample_interval: float = 0.005):
+        self.profile_dir = profile_dir
+        self.token = token
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.sample_interval = sample_interval
+        # cProfile hooks are process-wide since Python 3.12, so only one runs at a time
+        self._cprofile_lock = threading.Lock()
+        self._last_snapshot: Optional[tracemalloc.Snapshot] = None
+        os.makedirs(profile_dir, exist_ok=True)
+
+    def authorized(self, supplied: Optional[str]) -> bool:
+        return bool(self.token) and bool(supplied) and hmac.compare_digest(self.token, supplied)
+
+    def choose_mode(self, requested: Optional[str], supplied_token: Optional[str]) -> Optional[str]:
+        """Profiling mode for a request: explicit header (with valid token) or random sampling."""
+        if requested and self.authorized(supplied_token):
+            return 'sample' if requested.lower() == 'sample' else 'cprofile'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def start(self, mode: str) -> Optional[Dict[str, Any]]:
+        session = {'mode': mode, 'start': time.perf_counter()}
+        if mode == 'cprofile':
+            if not self._cprofile_lock.acquire(blocking=False):
+                mode = session['mode'] = 'sample'
+            else:
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                except ValueError:
+                    # Another profiling tool (e.g. a debugger) owns the hook
+                    self._cprofile_lock.release()
+                    return None
+                session['profile'] = profile
+                return session
+        sampler = StackSampler(threading.get_ident(), self.sample_interval)
+        sampler.start()
+        session['sampler'] = sampler
+        return session
+
+    def profile_name(self, session: Dict[str, Any], label: str) -> str:
+        """File name the session's profile will be written to."""
+        slug = ''.join(c if c.isalnum() else '-' for c in label).strip('-')[:60] or 'request'
+        extension = '.prof' if 'profile' in session else '.collapsed'
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{slug}{extension}"
+
+    def finish(self, session: Dict[str, Any], name: str, label: str):
+        """Stop profiling and write the result under name (see profile_name)."""
+        elapsed_ms = (time.perf_counter() - session['start']) * 1000
+        base = os.path.splitext(name)[0]
+
+        if 'profile' in session:
+            profile = session['profile']
+            profile.disable()
+            self._cprofile_lock.release()
+            profile.dump_stats(os.path.join(self.profile_dir, name))
+            with open(os.path.join(self.profile_dir, base + '.txt'), 'w', encoding='utf-8') as f:
+                f.write(self._text_report(profile, label, elapsed_ms))
+        else:
+            sampler = session['sampler']
+            sampler.stop()
+            with open(os.path.join(self.profile_dir, name), 'w', encoding='utf-8') as f:
+                f.write(f"# {label} ({elapsed_ms:.1f} ms)\n")
+                f.write(sampler.collapsed())
+
+        self._prune()
+
+    def _text_report(self, profile: cProfile.Profile, label: str, elapsed_ms: float) -> str:
+        out = io.StringIO()
+        out.write(f"{label} ({elapsed_ms:.1f} ms)\n\nHot paths:\n")
+        stats = pstats.Stats(profile, stream=out)
+        stats.sort_stats('cumulative').print_stats('|'.join(HOT_PATHS))
+        out.write("\nTop functions by cumulative time:\n")
+        stats.print_stats(40)
+        return out.getvalue()
+
+    def _prune(self):
+        entries = self.list_profiles()
+        for entry in entries[self.keep:]:
+            try:
+                os.remove(os.path.join(self.profile_dir, entry['name']))
+            except OSError:
+                pass
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Stored profiles, newest first."""
+        entries = []
+        with os.scandir(self.profile_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(PROFILE_EXTENSIONS):
+                    stat = entry.stat()
+                    entries.append({'name': entry.name, 'size': stat.st_size, 'modified': stat.st_mtime})
+        entries.sort(key=lambda e: e['modified'], reverse=True)
+        return entries
+
+    def memory_snapshot(self, limit: int = 25) -> Dict[str, Any]:
+        """Take a tracemalloc snapshot, store it and report growth since the previous one."""
+        if not tracemalloc.is_tracing():
+            return {'error': 'tracemalloc is not enabled (set PROFILE_TRACEMALLOC_FRAMES)'}
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-memory.tracemalloc"
+        snapshot.dump(os.path.join(self.profile_dir, name))
+        current, peak = tracemalloc.get_traced_memory()
+
+        if self._last_snapshot is not None:
+            stats = snapshot.compare_to(self._last_snapshot, 'lineno')
+            top = [{'location': str(s.traceback), 'size': s.size, 'size_diff': s.size_diff,
+                    'count_diff': s.count_diff} for s in stats[:limit]]
+        else:
+            stats = snapshot.statistics('lineno')
+            top = [{'location': str(s.traceback), 'size': s.size, 'count': s.count} for s in stats[:limit]]
+        compared = self._last_snapshot is not None
+        self._last_snapshot = snapshot
+        self._prune()
+        return {'snapshot': name, 'traced_current': current, 'traced_peak': peak,
+                'compared_to_previous': compared, 'top': top}
+
+
+def init_app(app, profile_dir: str, token: Optional[str] = None, sample_rate: float = 0.0,
+             keep: int = 50, tracemalloc_frames: int = 0) -> Profiler:
+    """
+    Enable request profiling on a Flask app.
+
+    Args:
+        app: The Flask application
+        profile_dir: Directory where profiles and snapshots are written
+        token: Secret required to trigger profiles by header and to use the debug endpoints
+        sample_rate: Fraction of requests to profile with the stack sampler (0 disables)
+        keep: Number of profile files to retain
+        tracemalloc_frames: Start tracemalloc with this many frames per trace (0 disables)
+    """
+    from flask import abort, g, jsonify, request, send_from_directory
+
+    profiler = Profiler(profile_dir, token=token, sample_rate=sample_rate, keep=keep)
+    if tracemalloc_frames and not tracemalloc.is_tracing():
+        tracemalloc.start(tracemalloc_frames)
+
+    @app.before_request
+    def start_profile():
+        if request.path.startswith('/debug/'):
+            return
+        mode = profiler.choose_mode(request.headers.get('X-Profile'), request.headers.get('X-Profile-Token'))
+        if mode:
+            g.profile_session = profiler.start(mode)
+
+    @app.after_request
+    def finish_profile(response):
+        session = g.pop('profile_session', None)
+        if session is None:
+            return response
+        label = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+        name = profiler.profile_name(session, label)
+
+        # Finish after the body is sent so streamed responses are covered
+        response.call_on_close(lambda: profiler.finish(session, name, label))
+        response.headers['X-Profile-Id'] = name
+        return response
+
+    def require_token():
+        supplied = request.headers.get('X-Profile-Token') or request.args.get('token')
+        if not profiler.authorized(supplied):
+            abort(404)
+
+    @app.route('/debug/profiles', methods=['GET'])
+    def list_profiles():
+        require_token()
+        return jsonify({'profiles': profiler.list_profiles()})
+
+    @app.route('/debug/profiles/<name>', methods=['GET'])
+    def download_profile(name):
+        require_token()
+        if not name.endswith(PROFILE_EXTENSIONS):
+            abort(404)
+        return send_from_directory(profiler.profile_dir, name, as_attachment=True)
+
+    @app.route('/debug/memory', methods=['POST'])
+    def memory_snapshot():
+        require_token()
+        return jsonify(profiler.memory_snapshot(limit=request.args.get('limit', 25, type=int)))
+
+    return profiler
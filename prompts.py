@@ -0,0 +1,252 @@
+"""
+Prompt Building
+Compact, token-budgeted encodings of the content embedded in LLM prompts:
+a cheap token estimator, per-call-site budgets, deduplicated skill lists
+ranked by importance (instead of blind slicing), whitespace-normalized
+resume text trimmed section by section, and prompt size reporting.
+
+Usage:
+    python prompts.py report        # prompt sizes over the data/ corpus
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+from typing import Dict, Any, List, Iterable, Callable, Optional, Tuple
+
+import metrics
+
+# Token budgets for the variable content of each call site's prompt (the fixed instructions come on top)
+BUDGETS = {
+    'questions': 800,
+    'question_bank': 1500,
+    'similarity': 3000,
+    'similarity_batch': 6000,
+    'speech_analysis': 350,
+    'resume_analysis': 3500,
+}
+
+# Skill tree node types, most important first
+NODE_TYPE_RANK = {'requirement': 0, 'skill': 1, 'qualification': 2, 'certification': 3}
+
+_TOKEN_PATTERN = re.compile(r"\w{1,6}|[^\w\s]|\n\s*|  +")
+_SPACES = re.compile(r"[ \t ]+")
+
+PROMPT_TOKENS = metrics.histogram(
+    'prompt_tokens_estimated', 'Estimated tokens in prompts sent to the xAI API', ('call_site',),
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000))
+PROMPT_ITEMS_DROPPED = metrics.counter(
+    'prompt_items_dropped_total', 'Skills or resume lines left out of prompts to fit the token budget', ('call_site',))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate BPE token count: one per punctuation mark, per six characters
+    of each word and per line break or run of indentation (single spaces merge
+    into the following word). Close enough for budgeting without a tokenizer.
+    """
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    # A few tokens of framing per message
+    return sum(estimate_tokens(m.get('content', '')) + 4 for m in messages)
+
+
+def compact_json(value: Any) -> str:
+    """JSON without indentation or spaces after separators."""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse runs of spaces, strip lines and drop blank lines (PDF extraction leaves plenty of each)."""
+    lines = (_SPACES.sub(' ', line).strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def dedupe(items: Iterable[str]) -> List[str]:
+    """Drop empty and repeated items (compared case- and whitespace-insensitively), keeping first occurrences."""
+    seen = set()
+    unique = []
+    for item in items:
+        key = ' '.join(item.lower().split())
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(item.strip())
+    return unique
+
+
+def fit_items(items: List[str], budget: int, encode: Callable[[List[str]], str] = compact_json
+              ) -> Tuple[List[str], List[str]]:
+    """
+    Take items (ordered most important first) while their encoding fits the budget.
+
+    Returns:
+        (included, dropped) lists, each in the given order
+    """
+    included = []
+    empty = estimate_tokens(encode([]))
+    used = empty
+    for index, item in enumerate(items):
+        # Each item costs its encoding (e.g. with quotes) plus a separator
+        cost = estimate_tokens(encode([item])) - empty + 1
+        if used + cost > budget:
+            return included, items[index:]
+        included.append(item)
+        used += cost
+    return included, []
+
+
+def tree_skills(tree: Optional[Dict[str, Any]], types: Iterable[str] = ('requirement', 'skill')) -> List[str]:
+    """
+    Unique node names of the given types, most important first: by node type
+    (requirements before skills), then shallower nodes, then tree order.
+    """
+    if not tree:
+        return []
+    types = set(types)
+    found = []
+
+    def walk(node, depth):
+        node_type = node.get('type')
+        if node_type in types:
+            found.append((NODE_TYPE_RANK.get(node_type, len(NODE_TYPE_RANK)), depth, len(found), node.get('name', '')))
+        for child in node.get('children') or ():
+            walk(child, depth + 1)
+
+    walk(tree, 0)
+    found.sort()
+    return dedupe(name for _, _, _, name in found)
+
+
+def rank_by_mentions(skills: List[str], text: str) -> List[str]:
+    """Order skills so those whose words appear in text come first (stable otherwise)."""
+    words = set(re.findall(r"\w+", text.lower()))
+
+    def mentioned(skill):
+        skill_words = re.findall(r"\w+", skill.lower())
+        return bool(skill_words) and any(w in words for w in skill_words if len(w) > 2 or w in ('go', 'c', 'r', 'ml', 'ai'))
+
+    return sorted(skills, key=lambda skill: not mentioned(skill))
+
+
+# Resume section headings and how much they matter for skill extraction
+SECTION_PRIORITY = (
+    (re.compile(r'skill|technolog|tool|language|stack', re.I), 0),
+    (re.compile(r'experience|employment|work|project', re.I), 1),
+    (re.compile(r'certif|licen|award|publication', re.I), 2),
+    (re.compile(r'education|course', re.I), 3),
+    (re.compile(r'summary|profile|objective|about', re.I), 4),
+    (re.compile(r'interest|hobb|reference|volunteer', re.I), 6),
+)
+DEFAULT_SECTION_PRIORITY = 5
+
+
+def _is_heading(line: str) -> bool:
+    letters = [c for c in line if c.isalpha()]
+    return 0 < len(line) <= 40 and bool(letters) and (
+        all(c.isupper() for c in letters) or (line.endswith(':') and len(line.split()) <= 4))
+
+
+def _section_priority(heading: str) -> int:
+    for pattern, priority in SECTION_PRIORITY:
+        if pattern.search(heading):
+            return priority
+    return DEFAULT_SECTION_PRIORITY
+
+
+def fit_resume_text(text: str, budget: int) -> Tuple[str, int]:
+    """
+    Normalize resume text and trim it to the token budget, dropping whole
+    sections in order of least importance (interests and references first,
+    skills and experience last). Lines before the first heading (name and
+    contact details) are kept first. Sections keep their original order.
+    Returns (text, number of lines dropped).
+    """
+    lines = normalize_whitespace(text).split('\n')
+    if estimate_tokens('\n'.join(lines)) <= budget:
+        return '\n'.join(lines), 0
+
+    # Split into (priority, [line indices]) sections
+    sections: List[Tuple[int, List[int]]] = [(-1, [])]
+    for index, line in enumerate(lines):
+        if _is_heading(line):
+            sections.append((_section_priority(line), []))
+        sections[-1][1].append(index)
+
+    keep = set()
+    used = 0
+    for priority, indices in sorted(sections, key=lambda section: section[0]):
+        for index in indices:
+            cost = estimate_tokens(lines[index]) + 1
+            if used + cost > budget:
+                break
+            keep.add(index)
+            used += cost
+    return '\n'.join(lines[i] for i in sorted(keep)), len(lines) - len(keep)
+
+
+def record(call_site: str, messages: List[Dict[str, str]], dropped: int = 0) -> int:
+    """Report a prompt's estimated size (and items dropped to fit its budget); returns the estimate."""
+    tokens = estimate_message_tokens(messages)
+    PROMPT_TOKENS.observe(tokens, call_site=call_site)
+    if dropped:
+        PROMPT_ITEMS_DROPPED.inc(dropped, call_site=call_site)
+    return tokens
+
+
+def report():
+    """Print prompt content sizes for the data/ corpus: legacy indented encoding vs compact and budgeted."""
+    import statistics
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    jobs = []
+    for path in sorted(glob.glob(os.path.join(root, 'data', 'job_skill_trees', 'job_*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            tree = json.load(f)
+        if tree.get('job_id'):
+            jobs.append(tree)
+    candidates = []
+    for path in sorted(glob.glob(os.path.join(root, 'data', 'candidate_skill_trees', 'candidate_*_skill_tree.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            candidates.append(json.load(f))
+
+    def lower_names(tree):
+        return [name.lower() for name in tree_skills(tree)]
+
+    rows = []
+    legacy = [estimate_tokens(json.dumps(lower_names(job), indent=2)) for job in jobs]
+    compact = [estimate_tokens(compact_json(fit_items(dedupe(lower_names(job)), BUDGETS['similarity'] // 2)[0]))
+               for job in jobs]
+    rows.append(('similarity: job skills', legacy, compact))
+    legacy = [estimate_tokens(json.dumps(lower_names(c), indent=2)) for c in candidates]
+    compact = [estimate_tokens(compact_json(fit_items(dedupe(lower_names(c)), BUDGETS['similarity'] // 2)[0]))
+               for c in candidates]
+    rows.append(('similarity: candidate skills', legacy, compact))
+    legacy = [estimate_tokens(json.dumps(lower_names(job)[:30], indent=2)) for job in jobs]
+    compact = [estimate_tokens(compact_json(fit_items(lower_names(job), BUDGETS['speech_analysis'])[0]))
+               for job in jobs]
+    rows.append(('speech_analysis: job skills', legacy, compact))
+
+    resumes = sorted(glob.glob(os.path.join(root, 'data', '*.pdf')))
+    if resumes:
+        from resume_skill_tree import ResumeSkillTreeGenerator
+        generator = ResumeSkillTreeGenerator(api_key='')
+        texts = [generator.extract_text_from_pdf(path) for path in resumes]
+        rows.append(('resume_analysis: resume text', [estimate_tokens(t) for t in texts],
+                     [estimate_tokens(fit_resume_text(t, BUDGETS['resume_analysis'])[0]) for t in texts]))
+
+    print(f"{'content':32} {'items':>5} {'before avg':>10} {'max':>6} {'after avg':>10} {'max':>6} {'saved':>7}")
+    for name, before, after in rows:
+        saved = 1 - sum(after) / sum(before) if sum(before) else 0.0
+        print(f"{name:32} {len(before):>5} {statistics.mean(before):>10.0f} {max(before):>6} "
+              f"{statistics.mean(after):>10.0f} {max(after):>6} {saved:>7.1%}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'report':
+        report()
+    else:
+        print("Usage: python prompts.py report")
@@ -0,0 +1,258 @@
+"""
+Question Bank
+Interview questions pre-generated for every job skill tree, each tagged with
+the skills it probes. A bank is stored per job together with the content
+hash of the tree it was generated from and rebuilt only when that tree
+changes, so question requests without a resume are answered straight from
+the bank and the xAI API is only needed to tailor questions to a candidate.
+
+Usage:
+    python question_bank.py build [--force] [--workers N]   # generate missing and stale banks
+    python question_bank.py show <job_id> [--skill NAME]
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import prompts
+import xai_client
+from job_index import JobIndex
+from skill_tree_common import tree_hash
+from storage import Storage, DEFAULT_DB_PATH, JOB_SKILL_TREES_DIR
+
+MODEL = "grok-4-fast"
+BANK_SIZE = 24
+# Questions returned per request
+DEFAULT_LIMIT = 10
+
+# Where a bank came from; template banks are replaced once an API key is available
+SOURCE_GROK = 'grok'
+SOURCE_TEMPLATE = 'template'
+
+
+def _key(skill: str) -> str:
+    return ' '.join(skill.lower().split())
+
+
+def tag_locally(question: str, skills: List[str]) -> List[str]:
+    """Skills whose name appears in the question text."""
+    text = _key(question)
+    return [skill for skill in skills if re.search(r'(?<!\w)' + re.escape(_key(skill)) + r'(?!\w)', text)]
+
+
+def template_bank(tree: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """A bank built from question templates, for when the API is unavailable."""
+    questions = []
+    for requirement in prompts.tree_skills(tree, ('requirement',)):
+        questions.append({'question': f"How does your background meet this requirement: {requirement}?",
+                          'skills': [requirement]})
+    for skill in prompts.tree_skills(tree, ('skill',)):
+        questions.append({'question': f"Can you tell me about your experience with {skill}?", 'skills': [skill]})
+    return questions[:BANK_SIZE]
+
+
+def validate_bank(entries: Any, skills: List[str]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Normalize a model response into [{'question', 'skills'}] entries.
+
+    Tags are matched case-insensitively to the tree's skill names; unknown tags are dropped and
+    questions without a valid tag are tagged by the skills they mention. Returns None if the
+    response holds no usable questions.
+    """
+    if not isinstance(entries, list):
+        return None
+    names = {_key(skill): skill for skill in skills}
+    bank = []
+    seen = set()
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'question': entry}
+        if not isinstance(entry, dict) or not isinstance(entry.get('question'), str):
+            continue
+        question = entry['question'].strip()
+        if not question or _key(question) in seen:
+            continue
+        seen.add(_key(question))
+        tags = entry.get('skills') if isinstance(entry.get('skills'), list) else []
+        tags = prompts.dedupe(names[_key(tag)] for tag in tags if isinstance(tag, str) and _key(tag) in names)
+        bank.append({'question': question, 'skills': tags or tag_locally(question, skills)})
+    return bank[:BANK_SIZE] or None
+
+
+def generate_bank(api_key: Optional[str], tree: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], str]:
+    """Generate a question bank for a job tree; returns (questions, source)."""
+    skills = prompts.tree_skills(tree)
+    if not api_key or not skills:
+        return template_bank(tree), SOURCE_TEMPLATE
+
+    prompt_skills, dropped = prompts.fit_items(skills, prompts.BUDGETS['question_bank'])
+    position = tree.get('job_title', 'Software Engineer')
+    if tree.get('location'):
+        position += f" in {tree['location']}"
+
+    prompt = f"""You are an expert interview question generator. Build a reusable bank of interview questions for the position below. The questions will be asked to many candidates, so they must not assume anything about a particular candidate.
+
+Position: {position}
+
+Requirements and skills, most important first:
+{prompts.compact_json(prompt_skills)}
+
+Write {BANK_SIZE} questions that together cover the most important requirements and skills: a mix of technical deep-dives, experience and problem-solving questions. Tag each question with the requirement or skill names (exactly as listed above) it assesses.
+
+Return a JSON array with this structure:
+[{{"question":"question text","skills":["skill name"]}}]
+
+Only return valid JSON, no additional text."""
+
+    messages = [
+        {
+            "role": "system",
+            "content": "You are an expert interview question generator building a reusable question bank. Always return valid JSON only."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+    prompts.record('question_bank', messages, len(dropped))
+
+    try:
+        result = xai_client.chat_completion('question_bank', api_key, messages, model=MODEL, temperature=0.7)
+        bank = validate_bank(json.loads(xai_client.message_content(result, default='[]')), skills)
+        if bank:
+            return bank, SOURCE_GROK
+        print(f"Question bank response for job {tree.get('job_id')} held no usable questions")
+    except Exception as e:
+        print(f"Error calling Grok API for the question bank of job {tree.get('job_id')}: {e}")
+    return template_bank(tree), SOURCE_TEMPLATE
+
+
+def select(bank: List[Dict[str, Any]], limit: int = DEFAULT_LIMIT,
+           candidate_skills: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Pick questions from a bank, in bank order (most important skills first). With
+    candidate_skills, questions about skills the candidate lists come first.
+    """
+    if not candidate_skills:
+        return bank[:limit]
+    known = {_key(skill) for skill in candidate_skills}
+
+    def relevant(entry):
+        return any(_key(tag) in known or any(_key(tag) in skill or skill in _key(tag) for skill in known)
+                   for tag in entry['skills'])
+
+    return sorted(bank, key=lambda entry: not relevant(entry))[:limit]
+
+
+def for_skill(bank: List[Dict[str, Any]], skill: str) -> List[Dict[str, Any]]:
+    """Questions tagged with the given skill."""
+    return [entry for entry in bank if _key(skill) in {_key(tag) for tag in entry['skills']}]
+
+
+def response(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Body for /api/v1/generate-interview-questions built from bank entries."""
+    return {
+        'questions': [entry['question'] for entry in entries],
+        'question_skills': [entry['skills'] for entry in entries],
+        'source': 'question_bank'
+    }
+
+
+def build(storage: Storage, job_dir: str = JOB_SKILL_TREES_DIR, api_key: Optional[str] = None,
+          force: bool = False, workers: int = 4) -> Dict[str, int]:
+    """
+    Generate banks for every job tree in job_dir whose bank is missing, stale or template-only.
+
+    Args:
+        storage: Where banks are stored
+        job_dir: Directory of job skill tree files
+        api_key: xAI API key (template banks without one)
+        force: Regenerate every bank
+        workers: Jobs generated concurrently
+
+    Returns:
+        Counts of generated, template and unchanged banks
+    """
+    stored = storage.question_bank_hashes()
+    pending = []
+    counts = {'generated': 0, 'template': 0, 'unchanged': 0}
+    # The same file per job id as the web app serves (the first by name when there are several)
+    for job_id, json_file in sorted(JobIndex(job_dir).paths().items()):
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                tree = json.load(f)
+        except Exception as e:
+            print(f"Error reading {json_file}: {e}")
+            continue
+        if not tree.get('job_id'):
+            continue
+        content_hash = tree_hash(tree)
+        current = stored.get(int(tree['job_id']))
+        # Template banks are upgraded once there is an API key (and skills to ask about)
+        upgradable = api_key and current and current[1] == SOURCE_TEMPLATE and prompts.tree_skills(tree)
+        up_to_date = current and current[0] == content_hash and not upgradable
+        if up_to_date and not force:
+            counts['unchanged'] += 1
+        else:
+            pending.append((tree, content_hash))
+
+    def generate(job):
+        tree, content_hash = job
+        questions, source = generate_bank(api_key, tree)
+        storage.save_question_bank(tree['job_id'], content_hash, source, questions)
+        return source
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for done, source in enumerate(pool.map(generate, pending), 1):
+            counts['generated' if source == SOURCE_GROK else 'template'] += 1
+            if done % 25 == 0 or done == len(pending):
+                print(f"Generated {done}/{len(pending)} question banks")
+    return counts
+
+
+def main():
+    """Main entry point."""
+    from dotenv import load_dotenv
+
+    # Load environment variables from .env file in the root directory
+    load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
+
+    parser = argparse.ArgumentParser(description="Precompute interview question banks for the job skill trees")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help="generate missing and stale banks")
+    build_parser.add_argument('--force', action='store_true', help="regenerate every bank")
+    build_parser.add_argument('--workers', type=int, default=4, help="jobs generated concurrently")
+    build_parser.add_argument('--job-dir', default=JOB_SKILL_TREES_DIR)
+    show_parser = commands.add_parser('show', help="print a job's bank")
+    show_parser.add_argument('job_id')
+    show_parser.add_argument('--skill', help="only questions tagged with this skill")
+    args = parser.parse_args()
+
+    storage = Storage(os.getenv('TALENT_POOL_DB', DEFAULT_DB_PATH))
+    if args.command == 'build':
+        api_key = (os.getenv('XAI_API_KEY') or '').strip('"\'')
+        if not api_key:
+            print("No API key found, building template banks")
+        counts = build(storage, args.job_dir, api_key, force=args.force, workers=args.workers)
+        print(f"Question banks: {counts['generated']} generated, {counts['template']} from templates, "
+              f"{counts['unchanged']} unchanged")
+        return
+
+    bank = storage.get_question_bank(args.job_id)
+    if not bank:
+        print(f"No question bank for job {args.job_id}; run `python question_bank.py build`")
+        sys.exit(1)
+    entries = for_skill(bank['questions'], args.skill) if args.skill else bank['questions']
+    print(f"Job {args.job_id}: {len(entries)} questions ({bank['source']}, {bank['created_at']})")
+    for entry in entries:
+        print(f"- {entry['question']}  [{', '.join(entry['skills'])}]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Upstream Resilience
+Tail-latency controls for xAI calls: per-call-site latency tracking (used to
+decide when to hedge a slow request), per-model circuit breakers that fail
+fast while the API is unhealthy so callers go straight to their local
+fallbacks, and per-request deadlines that cap how long upstream calls may
+take.
+"""
+
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import metrics
+
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+HEDGED_REQUESTS = metrics.counter(
+    'upstream_hedged_requests_total', 'Hedged second requests sent, by whether the hedge won', ('call_site', 'winner'))
+CIRCUIT_REJECTIONS = metrics.counter(
+    'upstream_circuit_rejections_total', 'xAI calls skipped because the circuit was open', ('model',))
+DEADLINE_EXCEEDED = metrics.counter(
+    'upstream_deadline_exceeded_total', 'xAI calls skipped because the request deadline had passed', ('call_site',))
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open, retry in {retry_after:.0f}s)")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the current request's deadline leaves no time for an upstream call."""
+
+
+class LatencyTracker:
+    """Recent successful call latencies per call site."""
+
+    def __init__(self, window: int = LATENCY_WINDOW, min_samples: int = MIN_LATENCY_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, call_site: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(call_site)
+            if samples is None:
+                samples = self._samples[call_site] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, call_site: str, pct: float) -> Optional[float]:
+        """Latency percentile for call_site, or None until enough samples are recorded."""
+        with self._lock:
+            samples = sorted(self._samples.get(call_site, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+class CircuitBreaker:
+    """
+    Opens after consecutive upstream failures, rejects calls for reset_timeout
+    seconds, then lets a single probe through (half-open) to decide whether to close.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may proceed; in half-open state only one probe at a time is allowed."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+        CIRCUIT_REJECTIONS.inc(model=self.name)
+        return False
+
+    def check(self):
+        """Raise CircuitOpen unless a call may proceed."""
+        if not self.allow():
+            raise CircuitOpen(self.name, self.retry_after())
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"Circuit for {self.name} opened after {self.failures} failures")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def cancel(self):
+        """Release a half-open probe that never reached the upstream."""
+        with self._lock:
+            self._probing = False
+
+
+latency = LatencyTracker()
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        circuit = _breakers.get(name)
+        if circuit is None:
+            circuit = _breakers[name] = CircuitBreaker(name)
+        return circuit
+
+
+def _breaker_states() -> Dict[Tuple[str, ...], float]:
+    with _breakers_lock:
+        return {(name,): _STATE_VALUES[circuit.state] for name, circuit in _breakers.items()}
+
+
+metrics.gauge('upstream_circuit_state', 'Circuit breaker state per model (0 closed, 1 half-open, 2 open)',
+              ('model',), callback=_breaker_states)
+
+
+# Deadlines
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('upstream_deadline', default=None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None if there is none."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Limit upstream calls inside the block to finish within seconds (nested deadlines only shrink)."""
+    current = _deadline.get()
+    new = time.monotonic() + seconds
+    token = _deadline.set(new if current is None else min(current, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def init_app(app, endpoint_deadlines: Dict[str, float]):
+    """
+    Give requests to the listed endpoints a deadline for their upstream calls.
+
+    Args:
+        app: The Flask application
+        endpoint_deadlines: Seconds per endpoint name; calls made after it passes raise DeadlineExceeded
+    """
+    from flask import g, request
+
+    @app.before_request
+    def start_deadline():
+        seconds = endpoint_deadlines.get(request.endpoint)
+        if seconds:
+            g.deadline_token = _deadline.set(time.monotonic() + seconds)
+
+    @app.teardown_request
+    def clear_deadline(error=None):
+        token = g.pop('deadline_token', None)
+        if token is not None:
+            _deadline.reset(token)
@@ -6,18 +6,13 @@ Uses xAI API to analyze and structure skills hierarchically.
 
 import os
 import json
-import requests
-from typing import Dict, Any
-from dotenv import load_dotenv
-
-import PyPDF2
-import pdfplumber
+from typing import Dict, Any, Union, BinaryIO
 
 from skill_tree_common import build_skill_tree, generate_html_visualization
-
-# Load environment variables from .env file in the root directory
-env_path = os.path.join(os.path.dirname(__file__), '.env')
-load_dotenv(dotenv_path=env_path)
+import metrics
+import prompts
+import tracing
+import xai_client
 
 
 class ResumeSkillTreeGenerator:
@@ -31,15 +26,22 @@ class ResumeSkillTreeGenerator:
             if self.api_key and (self.api_key.startswith('"') or self.api_key.startswith("'")):
                 self.api_key = self.api_key.strip('"\'')
         
-        self.api_url = "https://api.x.ai/v1/chat/completions"
-        
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
-        """Extract text from PDF resume."""
+    def extract_text_from_pdf(self, pdf_path: Union[str, BinaryIO]) -> str:
+        """Extract text from PDF resume, given as a path or a seekable binary file object."""
+        # The PDF libraries (and pdfminer underneath) are slow to import, so they are loaded on first use
+        try:
+            import pdfplumber
+        except ImportError:
+            pdfplumber = None
+
         text = ""
+        is_path = isinstance(pdf_path, (str, os.PathLike))
   
         # Try pdfplumber first (better for complex layouts)
         if pdfplumber:
             try:
+                if not is_path:
+                    pdf_path.seek(0)
                 with pdfplumber.open(pdf_path) as pdf:
                     for page in pdf.pages:
                         page_text = page.extract_text()
@@ -49,14 +51,14 @@ class ResumeSkillTreeGenerator:
                 print(f"pdfplumber failed, trying PyPDF2: {e}")
         
         # Fallback to PyPDF2
-        if not text and PyPDF2:
+        if not text:
             try:
-                with open(pdf_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    for page in pdf_reader.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
+                if is_path:
+                    with open(pdf_path, 'rb') as file:
+                        text = self._extract_text_with_pypdf2(file)
+                else:
+                    pdf_path.seek(0)
+                    text = self._extract_text_with_pypdf2(pdf_path)
             except Exception as e2:
                 print(f"PyPDF2 also failed: {e2}")
         
@@ -65,8 +67,20 @@ class ResumeSkillTreeGenerator:
         
         return text.strip()
     
+    def _extract_text_with_pypdf2(self, file: BinaryIO) -> str:
+        import PyPDF2
+
+        text = ""
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page in pdf_reader.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text += page_text + "\n"
+        return text
+    
     def analyze_resume_with_xai(self, resume_text: str) -> Dict[str, Any]:
         """Use xAI API to analyze resume and extract structured skill information."""
+        resume_text, dropped_lines = prompts.fit_resume_text(resume_text, prompts.BUDGETS['resume_analysis'])
         
         prompt = f"""Analyze the following resume and extract all skills, organizing them into a hierarchical skill tree structure.
 
@@ -104,42 +118,25 @@ Return a JSON structure with this format:
 
 Only return valid JSON, no additional text."""
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        messages = [
+            {
+                "role": "system",
+                "content": "You are an expert resume analyzer. Extract skills and create a structured skill tree. Always return valid JSON only."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
         
-        payload = {
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "You are an expert resume analyzer. Extract skills and create a structured skill tree. Always return valid JSON only."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "model": "grok-4-latest",
-            "stream": False,
-            "temperature": 0.3
-        }
+        prompts.record('resume_analysis', messages, dropped_lines)
         
         try:
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=60)
-            response.raise_for_status()
-            result = response.json()
-            
-            # Extract the JSON from the response
-            content = result.get('choices', [{}])[0].get('message', {}).get('content', '{}')
+            result = xai_client.chat_completion('resume_analysis', self.api_key, messages,
+                                                model="grok-4-latest", temperature=0.3)
             
-            # Try to parse JSON from the content
-            # Sometimes the API wraps it in markdown code blocks
-            content = content.strip()
-            if content.startswith('```'):
-                # Remove markdown code blocks
-                lines = content.split('\n')
-                content = '\n'.join([line for line in lines if not line.strip().startswith('```')])
+            # Extract the JSON from the response (sometimes wrapped in markdown code blocks)
+            content = xai_client.message_content(result)
             
             skill_data = json.loads(content)
             return skill_data
@@ -181,30 +178,42 @@ Only return valid JSON, no additional text."""
             "skill_relationships": []
         }
     
-    def generate_skill_tree(self, pdf_path: str, output_json: str = "resume_skill_tree.json", output_html: str = "resume_skill_tree.html"):
-        """Main method to generate skill tree from resume PDF."""
-        print(f"Extracting text from {pdf_path}...")
-        resume_text = self.extract_text_from_pdf(pdf_path)
-        print(f"Extracted {len(resume_text)} characters from PDF")
-        
-        if self.api_key:
+    def skill_tree_from_text(self, resume_text: str, use_api: bool = True) -> Dict[str, Any]:
+        """Build a skill tree from extracted resume text, with the xAI API unless use_api is False or there is no key."""
+        if use_api and self.api_key:
             print("Analyzing resume with xAI API...")
-            skill_data = self.analyze_resume_with_xai(resume_text)
+            with metrics.stage('resume_analysis'):
+                skill_data = self.analyze_resume_with_xai(resume_text)
         else:
-            print("No API key found, using fallback extraction...")
-            skill_data = self._fallback_skill_extraction(resume_text)
+            if use_api:
+                print("No API key found, using fallback extraction...")
+            with tracing.span('resume_fallback_extraction'):
+                skill_data = self._fallback_skill_extraction(resume_text)
         
         print("Building skill tree structure...")
-        skill_tree = build_skill_tree(skill_data)
+        with metrics.stage('build_skill_tree'):
+            return build_skill_tree(skill_data)
+    
+    def generate_skill_tree(self, pdf_path: Union[str, BinaryIO], output_json: str = "resume_skill_tree.json", output_html: str = None):
+        """Main method to generate skill tree from resume PDF. HTML is only written when output_html is given."""
+        print(f"Extracting text from {pdf_path if isinstance(pdf_path, (str, os.PathLike)) else 'uploaded PDF'}...")
+        with metrics.stage('pdf_extract'):
+            resume_text = self.extract_text_from_pdf(pdf_path)
+            tracing.annotate(chars=len(resume_text))
+        print(f"Extracted {len(resume_text)} characters from PDF")
         
-        # Save JSON
-        with open(output_json, 'w', encoding='utf-8') as f:
-            json.dump(skill_tree, f, indent=2, ensure_ascii=False)
-        print(f"Saved skill tree JSON to {output_json}")
+        skill_tree = self.skill_tree_from_text(resume_text)
+        
+        # Save JSON (callers that persist the tree themselves pass output_json=None)
+        if output_json:
+            with tracing.span('skill_tree_json_dump'), open(output_json, 'w', encoding='utf-8') as f:
+                json.dump(skill_tree, f, indent=2, ensure_ascii=False)
+            print(f"Saved skill tree JSON to {output_json}")
         
         # Generate HTML visualization
-        generate_html_visualization(skill_tree, output_html, "Resume Skill Tree")
-        print(f"Generated HTML visualization: {output_html}")
+        if output_html:
+            generate_html_visualization(skill_tree, output_html, "Resume Skill Tree")
+            print(f"Generated HTML visualization: {output_html}")
         
         return skill_tree
 
@@ -212,6 +221,10 @@ Only return valid JSON, no additional text."""
 def main():
     """Main entry point."""
     import sys
+    from dotenv import load_dotenv
+
+    # Load environment variables from .env file in the root directory
+    load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
     
     pdf_path = "AlbertoMejiaResume.pdf"
     if len(sys.argv) > 1:
@@ -222,7 +235,7 @@ def main():
         return
     
     generator = ResumeSkillTreeGenerator()
-    skill_tree = generator.generate_skill_tree(pdf_path)
+    skill_tree = generator.generate_skill_tree(pdf_path, output_html="resume_skill_tree.html")
     
     print("\n[SUCCESS] Skill tree generated successfully!")
     print(f"[*] Open resume_skill_tree.html in your browser to view the visualization")
@@ -0,0 +1,295 @@
+"""
+Upstream Request Scheduler
+Gates every xAI API call behind per-model request and token buckets. Waiting
+calls are queued by priority class and granted with smooth weighted
+round-robin, so interactive calls (live interviews) get most of the capacity
+without starving batch work. When no interactive calls are waiting, batch
+calls leave part of each bucket in reserve for interactive bursts.
+
+Rate limits come from the environment (requests and tokens per minute):
+    XAI_REQUESTS_PER_MINUTE, XAI_TOKENS_PER_MINUTE    defaults for every model
+    XAI_MODEL_LIMITS='{"grok-4-latest": {"rpm": 60, "tpm": 200000}}'
+
+The limits are for the whole deployment. Buckets live in each process, so
+under gunicorn (main.py sets WEB_WORKERS) every worker gets an equal share.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+import metrics
+import prompts
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+# Share of grants each class gets while both have calls waiting
+PRIORITY_WEIGHTS = {INTERACTIVE: 4, BATCH: 1}
+
+# Longest a call waits in the queue before giving up (callers then use their fallbacks)
+MAX_QUEUE_WAIT = {INTERACTIVE: 30.0, BATCH: 120.0}
+
+CALL_SITE_PRIORITY = {
+    'questions': INTERACTIVE,
+    'speech_analysis': INTERACTIVE,
+    'stt': INTERACTIVE,
+    'resume_analysis': BATCH,
+    'question_bank': BATCH,
+    'similarity': BATCH,
+    'similarity_batch': BATCH,
+}
+
+DEFAULT_REQUESTS_PER_MINUTE = 480
+DEFAULT_TOKENS_PER_MINUTE = 2_000_000
+
+# Fraction of each bucket batch calls leave unused while no interactive calls are waiting
+BATCH_RESERVE = 0.2
+
+QUEUE_WAIT = metrics.histogram(
+    'upstream_queue_wait_seconds', 'Time xAI calls waited for rate-limit capacity', ('priority', 'model'))
+RATE_LIMITED = metrics.counter(
+    'upstream_rate_limited_total', 'xAI calls rejected with 429 by the API', ('model',))
+QUEUE_TIMEOUTS = metrics.counter(
+    'upstream_queue_timeouts_total', 'xAI calls that gave up waiting for capacity', ('priority', 'model'))
+
+
+class QueueTimeout(Exception):
+    """Raised when a call waits longer than its priority class allows."""
+
+
+class TokenBucket:
+    """Continuously refilling bucket; capacity is one minute's allowance."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def fits(self, amount: float, reserve: float = 0.0) -> bool:
+        return self.tokens - min(amount, self.capacity) >= self.capacity * reserve
+
+    def seconds_until(self, amount: float, reserve: float = 0.0) -> float:
+        missing = min(amount, self.capacity) + self.capacity * reserve - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        # Can go negative when actual usage exceeds the estimate; later calls then wait out the debt
+        self.tokens -= amount
+
+
+class _Waiter:
+    __slots__ = ('priority', 'tokens')
+
+    def __init__(self, priority: str, tokens: int):
+        self.priority = priority
+        self.tokens = tokens
+
+
+class _ModelQueue:
+    """Buckets, per-priority wait queues and round-robin state for one model."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.waiting: Dict[str, deque] = {priority: deque() for priority in PRIORITY_WEIGHTS}
+        self.credit: Dict[str, float] = {priority: 0.0 for priority in PRIORITY_WEIGHTS}
+        self.paused_until = 0.0
+
+    def reserve_for(self, priority: str) -> float:
+        # The reserve is headroom for interactive bursts; while interactive calls are actually waiting,
+        # the round-robin weights decide the split instead
+        if priority == BATCH and not self.waiting[INTERACTIVE]:
+            return BATCH_RESERVE
+        return 0.0
+
+    def fits(self, waiter: _Waiter) -> bool:
+        reserve = self.reserve_for(waiter.priority)
+        return self.requests.fits(1, reserve) and self.tokens.fits(waiter.tokens, reserve)
+
+    def seconds_until(self, waiter: _Waiter) -> float:
+        reserve = self.reserve_for(waiter.priority)
+        return max(self.requests.seconds_until(1, reserve), self.tokens.seconds_until(waiter.tokens, reserve))
+
+    def next_grant(self) -> Optional[_Waiter]:
+        """Head waiter that should be granted now, by weighted round-robin among those that fit."""
+        candidates = [p for p, queue in self.waiting.items() if queue]
+        candidates.sort(key=lambda p: self.credit[p] + PRIORITY_WEIGHTS[p], reverse=True)
+        # Weight of the highest-priority head that does not fit yet; lower classes may not take the
+        # capacity it is waiting to refill, or a large interactive call would starve behind small batch calls
+        blocked = 0
+        for priority in candidates:
+            if PRIORITY_WEIGHTS[priority] < blocked:
+                continue
+            if self.fits(self.waiting[priority][0]):
+                return self.waiting[priority][0]
+            blocked = max(blocked, PRIORITY_WEIGHTS[priority])
+        return None
+
+    def grant(self, waiter: _Waiter):
+        # Smooth weighted round-robin: every waiting class earns its weight, the granted one pays the total
+        active = [p for p, queue in self.waiting.items() if queue]
+        for priority in active:
+            self.credit[priority] += PRIORITY_WEIGHTS[priority]
+        self.credit[waiter.priority] -= sum(PRIORITY_WEIGHTS[p] for p in active)
+        for priority in PRIORITY_WEIGHTS:
+            if priority not in active:
+                self.credit[priority] = 0.0
+        self.waiting[waiter.priority].popleft()
+        self.requests.take(1)
+        self.tokens.take(waiter.tokens)
+
+
+class Scheduler:
+    """Admits xAI calls per model according to rate limits and priority."""
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+                 model_limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.model_limits = model_limits or {}
+        self._models: Dict[str, _ModelQueue] = {}
+        self._changed = threading.Condition()
+
+    def _queue(self, model: str) -> _ModelQueue:
+        queue = self._models.get(model)
+        if queue is None:
+            limits = self.model_limits.get(model, {})
+            queue = self._models[model] = _ModelQueue(limits.get('rpm', self.requests_per_minute),
+                                                      limits.get('tpm', self.tokens_per_minute))
+        return queue
+
+    def acquire(self, model: str, priority: str, tokens: int, timeout: Optional[float] = None) -> float:
+        """
+        Block until the call may be sent; returns seconds waited.
+
+        Args:
+            model: Model name (or endpoint name for calls without a model); each has its own buckets
+            priority: INTERACTIVE or BATCH
+            tokens: Estimated tokens the call will use
+            timeout: Longest to wait (default MAX_QUEUE_WAIT for the priority)
+
+        Raises:
+            QueueTimeout: If capacity did not become available in time
+        """
+        timeout = MAX_QUEUE_WAIT[priority] if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._changed:
+            queue = self._queue(model)
+            waiter = _Waiter(priority, tokens)
+            queue.waiting[priority].append(waiter)
+            try:
+                while True:
+                    now = time.monotonic()
+                    queue.requests.refill(now)
+                    queue.tokens.refill(now)
+                    if now >= queue.paused_until and queue.next_grant() is waiter:
+                        queue.grant(waiter)
+                        self._changed.notify_all()
+                        break
+                    if now >= deadline:
+                        queue.waiting[priority].remove(waiter)
+                        self._changed.notify_all()
+                        QUEUE_TIMEOUTS.inc(priority=priority, model=model)
+                        raise QueueTimeout(f"{priority} call to {model} waited {timeout:g}s for capacity")
+                    pause = queue.paused_until - now
+                    refill = queue.seconds_until(waiter)
+                    self._changed.wait(min(max(pause, refill, 0.01), deadline - now, 1.0))
+            except BaseException:
+                if waiter in queue.waiting[priority]:
+                    queue.waiting[priority].remove(waiter)
+                    self._changed.notify_all()
+                raise
+        waited = time.monotonic() - start
+        QUEUE_WAIT.observe(waited, priority=priority, model=model)
+        return waited
+
+    def try_acquire(self, model: str, priority: str, tokens: int) -> bool:
+        """Take capacity without waiting, only if it is free now and no other call is queued for it."""
+        with self._changed:
+            queue = self._queue(model)
+            now = time.monotonic()
+            queue.requests.refill(now)
+            queue.tokens.refill(now)
+            if now < queue.paused_until or any(queue.waiting.values()):
+                return False
+            if not queue.fits(_Waiter(priority, tokens)):
+                return False
+            queue.requests.take(1)
+            queue.tokens.take(tokens)
+            return True
+
+    def settle(self, model: str, estimated: int, actual: int):
+        """Charge the difference between a call's estimated and reported token usage."""
+        with self._changed:
+            self._queue(model).tokens.take(actual - estimated)
+            self._changed.notify_all()
+
+    def pause(self, model: str, seconds: float):
+        """Hold all calls to model (after a 429 from the API)."""
+        RATE_LIMITED.inc(model=model)
+        with self._changed:
+            queue = self._queue(model)
+            queue.paused_until = max(queue.paused_until, time.monotonic() + seconds)
+
+    def queue_depths(self) -> Dict[Tuple[str, ...], float]:
+        with self._changed:
+            return {(priority, model): len(waiting)
+                    for model, queue in self._models.items() for priority, waiting in queue.waiting.items()}
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Current bucket levels and queue depths per model."""
+        now = time.monotonic()
+        with self._changed:
+            return [{
+                'model': model,
+                'requests_available': round(queue.requests.tokens, 1),
+                'tokens_available': round(queue.tokens.tokens),
+                'paused_for': max(0.0, round(queue.paused_until - now, 1)),
+                'waiting': {priority: len(waiting) for priority, waiting in queue.waiting.items()},
+            } for model, queue in self._models.items()]
+
+
+def priority_for(call_site: str) -> str:
+    return CALL_SITE_PRIORITY.get(call_site, INTERACTIVE)
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_completion: int = 1000) -> int:
+    """Token estimate for a chat call: the prompt plus an allowance for the completion."""
+    return prompts.estimate_message_tokens(messages) + max_completion
+
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Process-wide scheduler, configured from the environment on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                # Each worker process enforces its share of the deployment-wide limits
+                workers = max(1, int(os.getenv('WEB_WORKERS', '1')))
+                model_limits = {model: {name: value / workers for name, value in limits.items()}
+                                for model, limits in json.loads(os.getenv('XAI_MODEL_LIMITS', '{}')).items()}
+                _scheduler = Scheduler(
+                    requests_per_minute=float(os.getenv('XAI_REQUESTS_PER_MINUTE',
+                                                        DEFAULT_REQUESTS_PER_MINUTE)) / workers,
+                    tokens_per_minute=float(os.getenv('XAI_TOKENS_PER_MINUTE', DEFAULT_TOKENS_PER_MINUTE)) / workers,
+                    model_limits=model_limits)
+    return _scheduler
+
+
+metrics.gauge('upstream_queue_depth', 'xAI calls waiting for rate-limit capacity', ('priority', 'model'),
+              callback=lambda: get_scheduler().queue_depths())
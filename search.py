@@ -0,0 +1,147 @@
+"""
+Interview Search
+Full-text and skill-faceted search over stored interview transcripts and
+candidate skill trees, backed by the SQLite FTS5 index in storage.py. The
+index is updated as transcripts and candidates are saved, so an answer is
+searchable as soon as its transcription request returns.
+
+Queries take words and "quoted phrases", all of which must match (words are
+stemmed, so "used" also finds "using"); -word excludes a word and word*
+matches a prefix. Transcript results can be narrowed to a skill the speech
+analysis found and the color it was given.
+
+Usage:
+    python search.py '"rust in production"' [--skill Rust] [--color green] [--kind transcript|candidate]
+    python search.py --reindex
+"""
+
+import os
+import re
+import argparse
+from typing import Dict, Any, List, Optional
+
+from storage import Storage, DEFAULT_DB_PATH
+
+COLORS = ('red', 'yellow', 'green')
+KINDS = ('transcript', 'candidate')
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# A quoted phrase or a bare word, optionally excluded with a leading -
+_TERM = re.compile(r'(-?)"([^"]*)"?|(\S+)')
+_WORD = re.compile(r'\w+\*?', re.UNICODE)
+
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Translate a search box query into FTS5 syntax; None if it has nothing to search for.
+
+    Every term is quoted, so user input can never be a malformed FTS5 expression.
+    """
+    required, excluded = [], []
+    for match in _TERM.finditer(text):
+        negate, phrase, bare = match.group(1), match.group(2), match.group(3)
+        if bare is not None:
+            negate = '-' if bare.startswith('-') else ''
+            words = _WORD.findall(bare)
+        else:
+            words = _WORD.findall(phrase)
+        if not words:
+            continue
+        if len(words) == 1 and words[0].endswith('*'):
+            term = f'"{words[0][:-1]}"*'
+        else:
+            term = '"' + ' '.join(word.rstrip('*') for word in words) + '"'
+        (excluded if negate else required).append(term)
+    if not required:
+        return None
+    query = ' AND '.join(required)
+    for term in excluded:
+        query += f' NOT {term}'
+    return query
+
+
+def search(storage: Storage, query: Optional[str] = None, skill: Optional[str] = None,
+           color: Optional[str] = None, kind: Optional[str] = None, job_id=None,
+           file_id: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+    """
+    Search transcripts and candidate skill trees.
+
+    Args:
+        storage: Database holding the search index
+        query: Words and "phrases" to find (None: filter by the facets only)
+        skill: Transcripts whose analysis found this skill / candidates listing it
+        color: Transcripts where a skill (the given one, if any) was rated this color
+        kind: 'transcript' or 'candidate' to search only one of them
+        job_id: Only transcripts of this job
+        file_id: Only transcripts of this candidate
+        limit: Most results per kind
+
+    Returns:
+        Ranked transcripts (with the candidates they came from, best first, and skill/color
+        facet counts) and ranked candidates
+
+    Raises:
+        ValueError: On an unknown color or kind, or a query without searchable words
+    """
+    if color and color.lower() not in COLORS:
+        raise ValueError(f"color must be one of: {', '.join(COLORS)}")
+    if kind and kind not in KINDS:
+        raise ValueError(f"kind must be one of: {', '.join(KINDS)}")
+    match = None
+    if query and query.strip():
+        match = fts_query(query)
+        if match is None:
+            raise ValueError("The query has no words to search for")
+    limit = max(1, min(int(limit), MAX_LIMIT))
+
+    result: Dict[str, Any] = {'query': query, 'match': match}
+    if kind in (None, 'transcript'):
+        transcripts = storage.search_transcripts(match, skill, color, job_id, file_id, limit)
+        result['transcripts'] = transcripts
+        result['matched_candidates'] = _distinct(t['file_id'] for t in transcripts if t['file_id'])
+        result['facets'] = {'skills': storage.transcript_skill_facets(match, job_id)}
+    # Candidate trees carry no colors and belong to no job or transcript
+    if kind in (None, 'candidate') and not (color or job_id is not None or file_id):
+        result['candidates'] = storage.search_candidates(match, skill, limit)
+    return result
+
+
+def _distinct(values) -> List[Any]:
+    return list(dict.fromkeys(values))
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Search interview transcripts and candidate skill trees")
+    parser.add_argument('query', nargs='?')
+    parser.add_argument('--skill')
+    parser.add_argument('--color', choices=COLORS)
+    parser.add_argument('--kind', choices=KINDS)
+    parser.add_argument('--job-id', type=int)
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT)
+    parser.add_argument('--reindex', action='store_true', help="rebuild the search index from the stored data")
+    args = parser.parse_args()
+
+    storage = Storage(os.getenv('TALENT_POOL_DB', DEFAULT_DB_PATH))
+    if args.reindex:
+        storage.rebuild_search_index()
+        print("Search index rebuilt")
+        return
+
+    try:
+        result = search(storage, args.query, args.skill, args.color, args.kind, args.job_id, limit=args.limit)
+    except ValueError as e:
+        parser.error(str(e))
+    for transcript in result.get('transcripts', []):
+        skills = ', '.join(f"{s['skill']} ({s['color']})" for s in transcript['skills'])
+        print(f"transcript {transcript['id']}  job {transcript['job_id']}  candidate {transcript['file_id'] or '-'}  "
+              f"score {transcript['score']}\n    {transcript['snippet']}" + (f"\n    skills: {skills}" if skills else ''))
+    for candidate in result.get('candidates', []):
+        print(f"candidate {candidate['file_id']}  score {candidate['score']}\n    {candidate['snippet']}")
+    if result.get('facets', {}).get('skills'):
+        print("skills: " + ', '.join(f"{f['skill']}/{f['color']} {f['count']}" for f in result['facets']['skills']))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,19 @@
 Common functions for building and visualizing skill trees.
 """
 
-from typing import Dict, Any, List
+import json
+import hashlib
+from html import escape
+from typing import Dict, Any, List, Iterator, Optional
+
+import tracing
+
+# Hex characters in a node id
+NODE_ID_LENGTH = 12
+# Separates the names of a node's path before hashing (cannot occur in a normalized name)
+_PATH_SEPARATOR = '\x1f'
+SKILL_TYPES = ('skill', 'requirement')
+ANALYSIS_COLORS = ('red', 'yellow', 'green')
 
 
 def build_skill_tree(skill_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -137,88 +149,246 @@ def build_skill_tree(skill_data: Dict[str, Any]) -> Dict[str, Any]:
             ]
         })
     
-    return root
+    return assign_node_ids(root)
 
 
-def generate_html_visualization(skill_tree: Dict[str, Any], output_html: str, title: str = "Skill Tree"):
+def normalize_name(name: Any) -> str:
+    """Lowercased name with runs of whitespace collapsed, as skill names are matched."""
+    return ' '.join(str(name).lower().split())
+
+
+def assign_node_ids(tree: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Generate an HTML visualization of the skill tree.
+    Give every node of a skill tree a stable id, in place.
+    
+    A node's id hashes the normalized names on its path below the root, so it survives
+    regenerating or reordering the tree, and a group reused under the same path in another
+    tree (e.g. Soft Skills) gets the same ids there. Siblings with the same name are told
+    apart by their position among them.
     
     Args:
-        skill_tree: Dictionary representing the skill tree
-        output_html: Path to output HTML file
-        title: Title for the HTML page
+        tree: Dictionary representing the skill tree
+        
+    Returns:
+        The same tree
     """
-    html_content = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title}</title>
-    <style>
-        body {{
+    stack = [(tree, '')]
+    while stack:
+        node, path = stack.pop()
+        node['id'] = hashlib.blake2b(path.encode('utf-8'), digest_size=NODE_ID_LENGTH // 2).hexdigest()
+        seen: Dict[str, int] = {}
+        for child in node.get('children') or ():
+            name = normalize_name(child.get('name', ''))
+            seen[name] = seen.get(name, 0) + 1
+            if seen[name] > 1:
+                name = f"{name}#{seen[name]}"
+            stack.append((child, f"{path}{_PATH_SEPARATOR}{name}"))
+    return tree
+
+
+def node_index(tree: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Index the skill and requirement nodes of a tree by normalized name.
+    
+    Args:
+        tree: Skill tree whose nodes carry ids (see assign_node_ids)
+        
+    Returns:
+        Normalized name -> id of the first node (in tree order) with that name
+    """
+    index: Dict[str, str] = {}
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node.get('type') in SKILL_TYPES and node.get('id'):
+            index.setdefault(normalize_name(node.get('name', '')), node['id'])
+        stack.extend(reversed(node.get('children') or []))
+    return index
+
+
+def resolve_node_id(index: Dict[str, str], name: Any) -> Optional[str]:
+    """Id of the node a skill name refers to: an exact match, else the first name containing it or contained in it."""
+    name = normalize_name(name or '')
+    if not name:
+        return None
+    if name in index:
+        return index[name]
+    for indexed, node_id in index.items():
+        if name in indexed or indexed in name:
+            return node_id
+    return None
+
+
+def analysis_patch(index: Dict[str, str], skill_analysis: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Node colors set by a speech analysis, for clients to apply to the tree they show.
+    
+    Args:
+        index: Name index of the analyzed job tree (see node_index)
+        skill_analysis: The analysis, with mentioned_skills
+        
+    Returns:
+        Node id -> 'red', 'yellow' or 'green'; skills that match no node are left out
+    """
+    patch: Dict[str, str] = {}
+    skills = (skill_analysis or {}).get('mentioned_skills')
+    for skill in skills if isinstance(skills, list) else ():
+        if not isinstance(skill, dict) or not skill.get('mentioned'):
+            continue
+        color = str(skill.get('color') or '').lower()
+        node_id = resolve_node_id(index, skill.get('skill_name'))
+        if node_id and color in ANALYSIS_COLORS:
+            patch[node_id] = color
+    return patch
+
+
+def similarity_patch(index: Dict[str, str], similarity_data: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Job tree nodes a candidate has a similar skill for.
+    
+    Args:
+        index: Name index of the job tree (see node_index)
+        similarity_data: Skill similarities, with matches of job_skill to candidate_skill
+        
+    Returns:
+        Node id -> 'match' for every matched job skill
+    """
+    patch: Dict[str, str] = {}
+    for match in (similarity_data or {}).get('matches') or ():
+        node_id = index.get(normalize_name(match.get('job_skill', '')))
+        if node_id:
+            patch[node_id] = 'match'
+    return patch
+
+
+def tree_hash(tree: Dict[str, Any]) -> str:
+    """
+    Content hash of a skill tree, stable across key order and formatting.
+    
+    Node ids are derived from the names, so a tree hashes the same with or without them.
+    
+    Args:
+        tree: Dictionary representing the skill tree
+        
+    Returns:
+        Hex digest identifying the tree's content
+    """
+    canonical = json.dumps(_without_ids(tree), sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _without_ids(node: Any) -> Any:
+    if isinstance(node, dict):
+        return {key: _without_ids(value) for key, value in node.items() if key != 'id'}
+    if isinstance(node, list):
+        return [_without_ids(value) for value in node]
+    return node
+
+
+_HTML_STYLE = """    <style>
+        body {
             font-family: Arial, sans-serif;
             padding: 20px;
             background: #f5f5f5;
-        }}
-        .skill-tree {{
+        }
+        .skill-tree {
             background: white;
             padding: 20px;
             border-radius: 8px;
             box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        .skill-node {{
+        }
+        .skill-node {
             margin: 10px 0;
             padding: 10px;
             border-left: 3px solid #3b82f6;
             background: #f9fafb;
-        }}
-        .skill-node-name {{
+        }
+        .skill-node-name {
             font-weight: 600;
             font-size: 16px;
             margin-bottom: 5px;
-        }}
-        .skill-item {{
+        }
+        .skill-item {
             margin: 5px 0;
             padding: 5px 10px;
             background: white;
             border-radius: 4px;
             display: inline-block;
             margin-right: 10px;
-        }}
-        .skill-type {{
+        }
+        .skill-type {
             font-size: 12px;
             color: #6b7280;
             margin-left: 10px;
-        }}
+        }
     </style>
-</head>
+"""
+
+
+def iter_html_visualization(skill_tree: Dict[str, Any], title: str = "Skill Tree") -> Iterator[str]:
+    """
+    Yield an HTML visualization of the skill tree in chunks, suitable for streaming.
+    
+    Args:
+        skill_tree: Dictionary representing the skill tree
+        title: Title for the HTML page
+        
+    Yields:
+        Consecutive fragments of the HTML document
+    """
+    title = escape(title)
+    yield f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+{_HTML_STYLE}</head>
 <body>
     <div class="skill-tree">
         <h1>{title}</h1>
-        {_render_tree_html(skill_tree)}
-    </div>
+"""
+    yield from _iter_tree_html(skill_tree)
+    yield """    </div>
 </body>
 </html>
 """
+
+
+def render_html_visualization(skill_tree: Dict[str, Any], title: str = "Skill Tree") -> str:
+    """Render the full HTML visualization of the skill tree as a string."""
+    with tracing.span('skill_tree_html_render'):
+        return "".join(iter_html_visualization(skill_tree, title))
+
+
+def generate_html_visualization(skill_tree: Dict[str, Any], output_html: str, title: str = "Skill Tree"):
+    """
+    Generate an HTML visualization of the skill tree.
     
-    with open(output_html, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    Args:
+        skill_tree: Dictionary representing the skill tree
+        output_html: Path to output HTML file
+        title: Title for the HTML page
+    """
+    with tracing.span('skill_tree_html_render'), open(output_html, 'w', encoding='utf-8') as f:
+        f.writelines(iter_html_visualization(skill_tree, title))
 
 
-def _render_tree_html(node: Dict[str, Any], level: int = 0) -> str:
-    """Recursively render tree nodes as HTML."""
+def _iter_tree_html(node: Dict[str, Any], level: int = 0) -> Iterator[str]:
+    """Recursively yield tree nodes as HTML lines."""
     indent = "  " * level
-    html = f"{indent}<div class='skill-node'>\n"
-    html += f"{indent}  <div class='skill-node-name'>{node['name']}</div>\n"
+    yield f"{indent}<div class='skill-node'>\n"
+    yield f"{indent}  <div class='skill-node-name'>{escape(str(node['name']))}</div>\n"
     
-    if node.get('children'):
-        for child in node['children']:
-            if child.get('type') == 'skill':
-                html += f"{indent}  <span class='skill-item'>{child['name']}<span class='skill-type'>({child.get('type', 'skill')})</span></span>\n"
-            else:
-                html += _render_tree_html(child, level + 1)
+    for child in node.get('children') or ():
+        if child.get('type') == 'skill':
+            yield f"{indent}  <span class='skill-item'>{escape(str(child['name']))}<span class='skill-type'>({child.get('type', 'skill')})</span></span>\n"
+        else:
+            yield from _iter_tree_html(child, level + 1)
     
-    html += f"{indent}</div>\n"
-    return html
+    yield f"{indent}</div>\n"
+
 
+def _render_tree_html(node: Dict[str, Any], level: int = 0) -> str:
+    """Recursively render tree nodes as HTML."""
+    return "".join(_iter_tree_html(node, level))
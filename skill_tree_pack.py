@@ -0,0 +1,196 @@
+"""
+Packed Skill Tree Store
+Packs every job and candidate skill tree into a single indexed file that the
+web app memory-maps at startup, so any tree can be read straight from the
+shared page cache without opening individual JSON files.
+
+Each tree is stored as one compact UTF-8 JSON document; json.loads (a C
+parser) decodes that faster than any per-node decoder written in Python.
+
+File layout (little-endian):
+    header   magic, version, entry count, index offset, trees offset
+    index    (blob offset, blob length, key length) records, each followed by its UTF-8 key ("job:<id>")
+    trees    compact JSON documents, one per key
+
+Usage:
+    python skill_tree_pack.py build [output_path]
+"""
+
+import os
+import sys
+import glob
+import json
+import mmap
+import struct
+from typing import Dict, Any, List, Optional, Tuple
+
+from job_index import JobIndex
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOB_SKILL_TREES_DIR = os.path.join(BASE_DIR, 'data', 'job_skill_trees')
+CANDIDATE_SKILL_TREES_DIR = os.path.join(BASE_DIR, 'data', 'candidate_skill_trees')
+DEFAULT_PACK_PATH = os.path.join(BASE_DIR, 'data', 'skill_trees.pack')
+
+MAGIC = b'STPK'
+VERSION = 2
+
+_HEADER = struct.Struct('<4sHHIQQ')      # magic, version, reserved, n_entries, index, trees
+_INDEX_ENTRY = struct.Struct('<QIH')      # blob offset (from trees), blob length, key length
+
+
+def job_key(job_id) -> str:
+    return f"job:{job_id}"
+
+
+def candidate_key(file_id: str) -> str:
+    return f"candidate:{file_id}"
+
+
+def write_pack(trees: Dict[str, Dict[str, Any]], output_path: str):
+    """
+    Write a pack file containing the given trees.
+
+    Args:
+        trees: Mapping of pack key (see job_key/candidate_key) to skill tree
+        output_path: Destination path; written atomically via a temp file
+    """
+    index = bytearray()
+    blobs = bytearray()
+    for key in sorted(trees):
+        blob = json.dumps(trees[key], separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        encoded_key = key.encode('utf-8')
+        index += _INDEX_ENTRY.pack(len(blobs), len(blob), len(encoded_key)) + encoded_key
+        blobs += blob
+
+    index_offset = _HEADER.size
+    trees_offset = index_offset + len(index)
+
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, len(trees), index_offset, trees_offset))
+        f.write(index)
+        f.write(blobs)
+    os.replace(tmp_path, output_path)
+
+
+class SkillTreePack:
+    """Read-only, memory-mapped view over a pack file built by write_pack."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        magic, version, _reserved, n_entries, index_offset, trees_offset = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not a version {VERSION} skill tree pack: {path}")
+
+        self._index: Dict[str, Tuple[int, int]] = {}
+        pos = index_offset
+        for _ in range(n_entries):
+            offset, length, key_length = _INDEX_ENTRY.unpack_from(self._mm, pos)
+            pos += _INDEX_ENTRY.size
+            key = self._mm[pos:pos + key_length].decode('utf-8')
+            pos += key_length
+            self._index[key] = (trees_offset + offset, trees_offset + offset + length)
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def keys(self) -> List[str]:
+        return list(self._index)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Decode and return the tree stored under key, or None if absent."""
+        span = self._index.get(key)
+        if span is None:
+            return None
+        return json.loads(self._mm[span[0]:span[1]])
+
+
+def newest_tree_mtime(tree_dirs: Tuple[str, ...] = (JOB_SKILL_TREES_DIR, CANDIDATE_SKILL_TREES_DIR)) -> float:
+    """Latest modification time of the skill tree JSON files in tree_dirs (0 if there are none)."""
+    newest = 0.0
+    for tree_dir in tree_dirs:
+        try:
+            with os.scandir(tree_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.json') and entry.is_file():
+                        newest = max(newest, entry.stat().st_mtime)
+        except FileNotFoundError:
+            continue
+    return newest
+
+
+def open_pack(path: str = DEFAULT_PACK_PATH) -> Optional[SkillTreePack]:
+    """Open the pack at path if it exists, is valid and is newer than every tree file, otherwise return None."""
+    if not os.path.exists(path):
+        return None
+    # Trees are looked up in the pack first, so a stale pack would hide edited files
+    if newest_tree_mtime() > os.path.getmtime(path):
+        print(f"Warning: skill tree files changed after {path} was built; ignoring it until "
+              f"`python skill_tree_pack.py build` refreshes it")
+        return None
+    try:
+        return SkillTreePack(path)
+    except Exception as e:
+        print(f"Error opening skill tree pack {path}: {e}")
+        return None
+
+
+def collect_trees(jobs: Optional[JobIndex] = None) -> Dict[str, Dict[str, Any]]:
+    """Load every job and candidate skill tree JSON file keyed for packing (jobs resolved through a JobIndex)."""
+    trees: Dict[str, Dict[str, Any]] = {}
+
+    jobs = jobs or JobIndex(JOB_SKILL_TREES_DIR)
+    for job_id, json_file in sorted(jobs.paths().items()):
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Error reading {json_file}: {e}")
+            continue
+        if data.get('job_id'):
+            trees[job_key(data['job_id'])] = data
+
+    prefix, suffix = 'candidate_', '_skill_tree.json'
+    for json_file in sorted(glob.glob(os.path.join(CANDIDATE_SKILL_TREES_DIR, f'{prefix}*{suffix}'))):
+        file_id = os.path.basename(json_file)[len(prefix):-len(suffix)]
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                trees[candidate_key(file_id)] = json.load(f)
+        except Exception as e:
+            print(f"Error reading {json_file}: {e}")
+
+    return trees
+
+
+def main():
+    """Main entry point."""
+    if len(sys.argv) < 2 or sys.argv[1] != 'build':
+        print("Usage: python skill_tree_pack.py build [output_path]")
+        sys.exit(1)
+
+    output_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PACK_PATH
+    trees = collect_trees()
+    write_pack(trees, output_path)
+
+    jobs = sum(1 for key in trees if key.startswith('job:'))
+    print(f"Packed {jobs} job trees and {len(trees) - jobs} candidate trees "
+          f"into {output_path} ({os.path.getsize(output_path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Latency SLO Mode
+Keeps endpoints that wait on the xAI API within a latency budget. The
+upstream-backed work runs on a background thread; if it has not finished
+when the endpoint's budget runs out, the endpoint answers with its local
+result (the same fallback it uses when the API fails), flagged as
+provisional and carrying a result token. The final result is stored when
+the background work finishes and is fetched with GET /api/v1/results/<token>.
+Stored results are shared through the database, so any worker can serve
+the poll.
+
+Background work is bounded: at most MAX_WORKERS jobs per process may be
+outstanding. Once that many are, an endpoint answers with its local result
+as final, without a result token, until one finishes.
+"""
+
+import time
+import secrets
+import threading
+import contextvars
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Any, Callable, Optional
+
+import metrics
+import resilience
+import tracing
+
+# Finished results are kept this long for polling
+RESULT_TTL = 3600
+# Results still pending after this long were abandoned (e.g. their worker restarted)
+ABANDONED_AFTER = 300
+# Clients are told to poll again after this many seconds
+POLL_INTERVAL = 1.0
+MAX_WORKERS = 16
+
+RESPONSES = metrics.counter(
+    'slo_responses_total',
+    'Responses of SLO-mode endpoints: final, provisional, or shed (local result because the background pool was full)',
+    ('endpoint', 'outcome'))
+UPGRADE_DURATION = metrics.histogram(
+    'slo_upgrade_seconds', 'Time from request start until a provisional result was replaced by the final one',
+    ('endpoint',))
+
+
+class Expired(Exception):
+    """Raised for background work whose result token expired before it ran."""
+
+
+class SLORunner:
+    """Runs upstream-backed work against a latency budget, deferring late results to the result store."""
+
+    def __init__(self, storage, max_workers: int = MAX_WORKERS,
+                 hold: Optional[Callable[[], Optional[Callable[[], None]]]] = None):
+        """
+        Args:
+            storage: Where deferred results are stored
+            max_workers: Background jobs allowed at once
+            hold: Called in the request before its work goes to the background; returns a function to call
+                when that work finishes (e.g. admission.detach, so the request's admission slot covers it)
+        """
+        self.storage = storage
+        self.max_workers = max_workers
+        self.hold = hold
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        # Jobs submitted and not yet finished; never more than max_workers, so none wait in the pool's queue
+        self._outstanding = 0
+
+    def outstanding(self) -> int:
+        """Background jobs currently running in this process."""
+        return self._outstanding
+
+    def _reserve(self) -> bool:
+        with self._lock:
+            if self._outstanding >= self.max_workers:
+                return False
+            self._outstanding += 1
+            return True
+
+    def _finished(self, _future=None):
+        with self._lock:
+            self._outstanding -= 1
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Created on first use so preloaded apps start their threads after forking
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='slo-upgrade')
+            return self._executor
+
+    def run(self, endpoint: str, budget: float, deadline: float,
+            upstream: Callable[[], Dict[str, Any]], local: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Return upstream()'s result if it finishes within budget seconds, otherwise local()'s marked provisional.
+
+        Args:
+            endpoint: Endpoint name (metrics label and result kind)
+            budget: Latency budget in seconds; 0 waits for upstream() as if SLO mode were off
+            deadline: Seconds upstream() may take in total, counted from submission (its upstream calls fail fast after that)
+            upstream: Produces the final response body; expected to fall back locally itself on API errors
+            local: Produces the provisional response body without calling the API
+
+        Returns:
+            A response body; provisional ones carry 'provisional': True and a 'result_token'
+        """
+        if not budget:
+            return upstream()
+
+        if not self._reserve():
+            # Every background thread is taken: promising a result later would only queue more upstream work
+            RESPONSES.inc(endpoint=endpoint, outcome='shed')
+            return local()
+
+        start = time.monotonic()
+
+        # The upgrade stays part of the request's trace, which is written once it ends
+        handed = tracing.handoff()
+
+        def background():
+            if time.monotonic() - start > RESULT_TTL:
+                raise Expired(f"{endpoint} result expired before its upgrade started")
+            # A fresh context: the upgrade outlives the request, so it gets its own deadline, which started
+            # when the job was submitted
+            with resilience.deadline(start + deadline - time.monotonic()), \
+                    tracing.resume(handed, f'{endpoint}_upstream'):
+                return upstream()
+
+        release = self.hold() if self.hold else None
+
+        def finished(done):
+            self._finished()
+            if release:
+                release()
+
+        try:
+            future = self._pool().submit(contextvars.Context().run, background)
+        except BaseException:
+            finished(None)
+            raise
+        future.add_done_callback(finished)
+        try:
+            result = future.result(timeout=budget)
+        except FutureTimeout:
+            pass
+        else:
+            RESPONSES.inc(endpoint=endpoint, outcome='final')
+            return result
+        tracing.annotate(provisional=True)
+
+        token = secrets.token_urlsafe(16)
+        expire_before = (datetime.now(timezone.utc) - timedelta(seconds=RESULT_TTL)).isoformat()
+        self.storage.create_deferred_result(token, endpoint, expire_before=expire_before)
+
+        def finish(done):
+            try:
+                self.storage.finish_deferred_result(token, 'ready', done.result())
+                UPGRADE_DURATION.observe(time.monotonic() - start, endpoint=endpoint)
+            except Exception as e:
+                print(f"Background {endpoint} for result {token} failed: {e}")
+                self.storage.finish_deferred_result(token, 'failed')
+
+        future.add_done_callback(finish)
+        RESPONSES.inc(endpoint=endpoint, outcome='provisional')
+        result = local()
+        result['provisional'] = True
+        result['result_token'] = token
+        result['poll_after'] = POLL_INTERVAL
+        return result
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Status of a deferred result: pending, ready (with the result) or failed; None if unknown."""
+        entry = self.storage.get_deferred_result(token)
+        if entry is None:
+            return None
+        if entry['status'] == 'pending':
+            created = datetime.fromisoformat(entry['created_at'])
+            if datetime.now(timezone.utc) - created > timedelta(seconds=ABANDONED_AFTER):
+                return {'status': 'failed'}
+            return {'status': 'pending', 'poll_after': POLL_INTERVAL}
+        if entry['status'] == 'ready':
+            return {'status': 'ready', 'result': entry['result']}
+        return {'status': entry['status']}
@@ -17,13 +17,17 @@ const state = {
     skillTree: null,
     candidateSkillTree: null,
     skillProgress: new Map(),
-    nodeColors: new Map(), // Track manual node colors (grey -> red -> yellow -> green)
+    nodeColors: new Map(), // Node colors by node id (grey -> red -> yellow -> green)
     waveformHeights: Array(20).fill(20),
     waveformAnimationFrame: null,
     lastProcessedIndex: 0,
     applicationUrl: null,
     candidateFileId: null,
-    skillSimilarities: null // Stores similarity data from Grok API
+    skillSimilarities: null, // Similarity patch from the server: node id -> 'match'
+    sessionId: null, // Server-side interview session (event log) for the loaded job
+    sessionCursor: 0, // Sequence number of the last session event applied
+    sessionSync: null, // Pending session sync, so events are applied once and in order
+    sessionStream: null // EventSource pushing the session's events
 };
 
 // DOM elements
@@ -232,8 +236,14 @@ async function processRecordedAudio() {
         if (state.skillTree && state.skillTree.job_id) {
             formData.append('job_id', state.skillTree.job_id);
         }
+        if (state.sessionId) {
+            formData.append('session_id', state.sessionId);
+        }
+        if (state.candidateFileId) {
+            formData.append('file_id', state.candidateFileId);
+        }
         
-        const response = await fetch('http://localhost:5000/api/v1/transcribe-audio', {
+        const response = await fetchAdmitted('http://localhost:5000/api/v1/transcribe-audio', {
             method: 'POST',
             body: formData
         });
@@ -245,7 +255,12 @@ async function processRecordedAudio() {
             statusEl.parentNode.removeChild(statusEl);
         }
         
-        if (data.success && data.transcript) {
+        if (data.success && data.transcript && data.cursor) {
+            // Recorded in the interview session: arrives through the stream like any other client's events
+            if (!interviewStreamOpen()) {
+                await syncInterviewSession();
+            }
+        } else if (data.success && data.transcript) {
             // Add transcript to state
             const timestamp = new Date().toLocaleTimeString();
             state.transcript.unshift({
@@ -253,19 +268,14 @@ async function processRecordedAudio() {
                 text: data.transcript
             });
             
-            // Update skill tree based on analysis
-            if (data.skill_analysis && data.skill_analysis.mentioned_skills) {
-                updateSkillTreeFromAnalysis(data.skill_analysis);
-                
-                // Update skill tree visualization immediately with new colors
-                if (state.skillTree && skillTreeViz) {
-                    // Force re-render to show updated colors
-                    skillTreeViz.update(state.skillTree, state.candidateSkillTree, state.skillSimilarities);
-                }
+            // Recolor the skills the analysis found
+            if (data.skill_patch) {
+                applySkillPatch(data.skill_patch);
             }
             
             // Render updated transcript
             renderTranscript();
+            processTranscript();
             
             // Update skill tree visualization if not already updated
             if (state.skillTree && !skillTreeViz) {
@@ -283,6 +293,28 @@ async function processRecordedAudio() {
     }
 }
 
+const ANALYSIS_COLORS = {
+    'red': '#ef4444',
+    'yellow': '#eab308',
+    'green': '#16a34a'
+};
+
+// Apply a skill patch (node id -> analysis color), recoloring only the nodes it names
+function applySkillPatch(patch) {
+    const changed = [];
+    Object.entries(patch).forEach(([nodeId, color]) => {
+        const hexColor = ANALYSIS_COLORS[color];
+        if (hexColor) {
+            state.nodeColors.set(nodeId, hexColor);
+            changed.push(nodeId);
+        }
+    });
+    if (skillTreeViz && changed.length) {
+        skillTreeViz.applyPatch(changed);
+    }
+}
+
+// Full analyses, as recorded in interview sessions before skill trees had node ids
 function updateSkillTreeFromAnalysis(analysis) {
     if (!analysis || !analysis.mentioned_skills) return;
     
@@ -290,7 +322,7 @@ function updateSkillTreeFromAnalysis(analysis) {
     const skillTreeNames = new Map();
     function extractSkillNames(node) {
         if (node.type === 'skill' || node.type === 'requirement') {
-            skillTreeNames.set(node.name.toLowerCase(), node.name);
+            skillTreeNames.set(node.name.toLowerCase(), node.id || node.name);
         }
         if (node.children) {
             node.children.forEach(extractSkillNames);
@@ -301,43 +333,31 @@ function updateSkillTreeFromAnalysis(analysis) {
     }
     
     // Update node colors based on analysis
+    const patch = {};
     analysis.mentioned_skills.forEach(skillData => {
         const skillNameFromAnalysis = skillData.skill_name;
         const color = skillData.color; // "red", "yellow", or "green"
         
         if (color && skillData.mentioned) {
-            // Map color string to hex code
-            const colorMap = {
-                'red': '#ef4444',
-                'yellow': '#eab308',
-                'green': '#16a34a'
-            };
+            // Try to find exact match first
+            let matchedKey = skillTreeNames.get(skillNameFromAnalysis.toLowerCase());
             
-            const hexColor = colorMap[color.toLowerCase()];
-            if (hexColor) {
-                // Try to find exact match first
-                let matchedSkillName = skillTreeNames.get(skillNameFromAnalysis.toLowerCase());
-                
-                // If no exact match, try partial matching
-                if (!matchedSkillName && skillTreeNames.size > 0) {
-                    for (const [lowerName, actualName] of skillTreeNames.entries()) {
-                        if (lowerName.includes(skillNameFromAnalysis.toLowerCase()) || 
-                            skillNameFromAnalysis.toLowerCase().includes(lowerName)) {
-                            matchedSkillName = actualName;
-                            break;
-                        }
+            // If no exact match, try partial matching
+            if (!matchedKey && skillTreeNames.size > 0) {
+                for (const [lowerName, key] of skillTreeNames.entries()) {
+                    if (lowerName.includes(skillNameFromAnalysis.toLowerCase()) || 
+                        skillNameFromAnalysis.toLowerCase().includes(lowerName)) {
+                        matchedKey = key;
+                        break;
                     }
                 }
-                
-                // Use the matched name or the original name
-                const finalSkillName = matchedSkillName || skillNameFromAnalysis;
-                
-                // Update node color in state
-                state.nodeColors.set(finalSkillName, hexColor);
-                console.log(`Updated ${finalSkillName} to ${color} (${hexColor}): ${skillData.reason || ''}`);
             }
+            
+            // Use the matched node or the original name
+            patch[matchedKey || skillNameFromAnalysis] = color.toLowerCase();
         }
     });
+    applySkillPatch(patch);
 }
 
 function updateRecordButton() {
@@ -434,7 +454,7 @@ function renderJobs(jobs) {
 }
 
 // Load skill tree
-async function loadSkillTree(jobId = null) {
+async function loadSkillTree(jobId = null, sessionId = null) {
     if (!jobId) {
         const urlParams = new URLSearchParams(window.location.search);
         jobId = urlParams.get('job_id');
@@ -493,6 +513,12 @@ async function loadSkillTree(jobId = null) {
         state.questionsGenerated = false;
         state.recommendedQuestions = [];
         renderQuestions();
+        // Each job gets its own interview session, unless joining an existing one
+        if (sessionId) {
+            await joinInterviewSession(sessionId);
+        } else {
+            await startInterviewSession(skillTreeData.job_id || jobId);
+        }
     } catch (error) {
         console.error('Failed to load skill tree:', error);
         // Don't load default tree on error - show message instead
@@ -508,6 +534,150 @@ async function loadSkillTree(jobId = null) {
     }
 }
 
+// Interview sessions: the server keeps the interview as an append-only event log and
+// clients fetch only the events after their cursor
+function resetInterviewState() {
+    if (state.sessionStream) {
+        state.sessionStream.close();
+        state.sessionStream = null;
+    }
+    state.sessionId = null;
+    state.sessionCursor = 0;
+    state.transcript = [];
+    state.lastProcessedIndex = 0;
+    state.questionHistory = [];
+    state.nodeColors = new Map();
+    renderTranscript();
+    renderQuestionHistory();
+}
+
+async function startInterviewSession(jobId) {
+    resetInterviewState();
+    try {
+        const response = await fetch('http://localhost:5000/api/v1/interviews', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ job_id: jobId, file_id: state.candidateFileId })
+        });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const session = await response.json();
+        state.sessionId = session.session_id;
+        state.sessionCursor = session.cursor;
+        openInterviewStream();
+    } catch (error) {
+        // Without a session the interview is kept in the browser only
+        console.warn('Failed to start interview session:', error);
+    }
+}
+
+async function joinInterviewSession(sessionId) {
+    resetInterviewState();
+    state.sessionId = sessionId;
+    await syncInterviewSession();
+    openInterviewStream();
+}
+
+// Events are pushed over Server-Sent Events; the browser reconnects with the last event id it received
+function openInterviewStream() {
+    if (!window.EventSource || !state.sessionId) return;
+    const sessionId = state.sessionId;
+    const stream = new EventSource(`http://localhost:5000/api/v1/interviews/${sessionId}/stream?since=${state.sessionCursor}`);
+    ['transcript', 'skill_patch', 'skill_analysis', 'question_asked', 'question_skipped', 'questions'].forEach(type => {
+        stream.addEventListener(type, message => receiveInterviewEvent(JSON.parse(message.data)));
+    });
+    stream.onerror = () => {
+        // Refused (e.g. the server is at its stream limit): try again later, syncing on our own actions meanwhile
+        if (stream.readyState === EventSource.CLOSED && state.sessionStream === stream) {
+            state.sessionStream = null;
+            setTimeout(() => {
+                if (state.sessionId === sessionId && !state.sessionStream) {
+                    syncInterviewSession().then(openInterviewStream);
+                }
+            }, 10000);
+        }
+    };
+    state.sessionStream = stream;
+}
+
+function interviewStreamOpen() {
+    return Boolean(state.sessionStream && state.sessionStream.readyState === EventSource.OPEN);
+}
+
+function syncInterviewSession() {
+    state.sessionSync = (state.sessionSync || Promise.resolve()).then(async () => {
+        const sessionId = state.sessionId;
+        let more = true;
+        while (sessionId && more && state.sessionId === sessionId) {
+            const response = await fetch(`http://localhost:5000/api/v1/interviews/${sessionId}?since=${state.sessionCursor}`);
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            const page = await response.json();
+            if (state.sessionId !== sessionId) return; // Switched jobs meanwhile
+            page.events.forEach(receiveInterviewEvent);
+            state.sessionCursor = Math.max(state.sessionCursor, page.cursor);
+            more = page.more;
+        }
+    }).catch(error => {
+        console.warn('Failed to sync interview session:', error);
+    });
+    return state.sessionSync;
+}
+
+// Stream and sync can both deliver an event; each is applied once, in log order
+function receiveInterviewEvent(event) {
+    if (event.seq <= state.sessionCursor) return;
+    state.sessionCursor = event.seq;
+    applyInterviewEvent(event);
+}
+
+function applyInterviewEvent(event) {
+    const timestamp = new Date(event.created_at).toLocaleTimeString();
+    if (event.type === 'transcript') {
+        state.transcript.unshift({ timestamp: timestamp, text: event.data.text });
+        renderTranscript();
+        processTranscript();
+    } else if (event.type === 'question_asked') {
+        state.questionHistory.push({ id: event.seq, text: event.data.question, timestamp: timestamp });
+        renderQuestionHistory();
+    } else if (event.type === 'skill_patch') {
+        applySkillPatch(event.data.patch);
+    } else if (event.type === 'skill_analysis') {
+        updateSkillTreeFromAnalysis(event.data);
+    } else if (event.type === 'questions') {
+        state.questionsGenerated = true;
+        state.isLoadingQuestions = false;
+        upgradeQuestions(event.data.questions);
+    }
+}
+
+// Append an event to the session and sync; applyLocally runs instead when there is no session
+async function recordInterviewEvent(type, data, applyLocally = null) {
+    if (state.sessionId) {
+        try {
+            const response = await fetch(`http://localhost:5000/api/v1/interviews/${state.sessionId}/events`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ type: type, data: data })
+            });
+            if (response.ok) {
+                if (!interviewStreamOpen()) {
+                    await syncInterviewSession();
+                }
+                return;
+            }
+            console.warn(`Failed to record ${type} event: HTTP ${response.status}`);
+        } catch (error) {
+            console.warn(`Failed to record ${type} event:`, error);
+        }
+    }
+    if (applyLocally) {
+        applyLocally();
+    }
+}
+
 function getDefaultSkillTree() {
     return {
         name: "Skills",
@@ -581,6 +751,48 @@ function initializeSkillProgress(node) {
     }
 }
 
+// Poll for the final version of a provisional response; resolves with it, or null if it never arrives
+// Expensive endpoints answer 429 when the server is busy; wait as long as Retry-After says and try again
+async function fetchAdmitted(url, options, attempts = 3) {
+    for (let attempt = 1; ; attempt++) {
+        const response = await fetch(url, options);
+        if (response.status !== 429 || attempt >= attempts) {
+            return response;
+        }
+        const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 2;
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+    }
+}
+
+async function pollDeferredResult(token, pollAfter = 1, maxWaitSeconds = 120) {
+    const start = Date.now();
+    while (Date.now() - start < maxWaitSeconds * 1000) {
+        await new Promise(resolve => setTimeout(resolve, pollAfter * 1000));
+        try {
+            const response = await fetch(`http://localhost:5000/api/v1/results/${token}`);
+            if (!response.ok) return null;
+            const data = await response.json();
+            if (data.status === 'ready') return data.result;
+            if (data.status !== 'pending') return null;
+            pollAfter = data.poll_after || pollAfter;
+        } catch (error) {
+            console.error('Failed to poll for result:', error);
+            return null;
+        }
+    }
+    return null;
+}
+
+// Swap provisional questions for the Grok ones, keeping any the interviewer already used
+function upgradeQuestions(questions) {
+    const used = state.recommendedQuestions.filter(q => q.asked || q.skipped);
+    const fresh = questions
+        .filter(text => !used.some(q => q.text === text))
+        .map(text => ({ text: text, asked: false, skipped: false }));
+    state.recommendedQuestions = [...used, ...fresh].map((q, idx) => ({ ...q, id: idx + 1 }));
+    renderQuestions();
+}
+
 // Generate questions from skill tree
 async function generateQuestionsFromSkillTree(tree) {
     if (!tree) {
@@ -609,7 +821,7 @@ async function generateQuestionsFromSkillTree(tree) {
         const location = tree.location || '';
         const skillsList = skills.slice(0, 10).join(', ');
         
-        const response = await fetch('http://localhost:5000/api/v1/generate-interview-questions', {
+        const response = await fetchAdmitted('http://localhost:5000/api/v1/generate-interview-questions', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -619,7 +831,8 @@ async function generateQuestionsFromSkillTree(tree) {
                 location: location,
                 skills: skillsList, // Keep for fallback
                 job_skill_tree: tree, // Full job skill tree for Grok
-                candidate_skill_tree: state.candidateSkillTree || null // Candidate skill tree if available
+                candidate_skill_tree: state.candidateSkillTree || null, // Candidate skill tree if available
+                session_id: state.sessionId // Final questions are pushed to the interview's stream
             })
         });
         
@@ -633,6 +846,15 @@ async function generateQuestionsFromSkillTree(tree) {
                     skipped: false
                 }));
             }
+            // Grok missed the latency budget: these are fallback questions, the real ones follow
+            // (over the interview stream when it is open, otherwise by polling for the result)
+            if (data.provisional && data.result_token && !interviewStreamOpen()) {
+                pollDeferredResult(data.result_token, data.poll_after).then(result => {
+                    if (result && Array.isArray(result.questions) && state.skillTree === tree) {
+                        upgradeQuestions(result.questions);
+                    }
+                });
+            }
         } else {
             // Fallback questions
             state.recommendedQuestions = skills.slice(0, 5).map((skill, idx) => ({
@@ -754,16 +976,19 @@ function handleQuestionAction(questionId, action) {
     if (question) {
         if (action === 'ask') {
             question.asked = true;
-            state.questionHistory.push({
-                id: Date.now(),
-                text: question.text,
-                timestamp: new Date().toLocaleTimeString()
+            recordInterviewEvent('question_asked', { question: question.text }, () => {
+                state.questionHistory.push({
+                    id: Date.now(),
+                    text: question.text,
+                    timestamp: new Date().toLocaleTimeString()
+                });
+                renderQuestionHistory();
             });
         } else {
             question.skipped = true;
+            recordInterviewEvent('question_skipped', { question: question.text });
         }
         renderQuestions();
-        renderQuestionHistory();
     }
 }
 
@@ -979,7 +1204,7 @@ elements.resumeUpload?.addEventListener('change', async (e) => {
             formData.append('job_id', state.skillTree.job_id);
         }
         
-        const response = await fetch('http://localhost:5000/api/v1/upload-resume', {
+        const response = await fetchAdmitted('http://localhost:5000/api/v1/upload-resume', {
             method: 'POST',
             body: formData
         });
@@ -989,14 +1214,31 @@ elements.resumeUpload?.addEventListener('change', async (e) => {
         if (data.success && data.skill_tree) {
             state.candidateSkillTree = data.skill_tree;
             state.candidateFileId = data.file_id;
-            state.skillSimilarities = data.similarity_data || null;
-            elements.resumeStatus.textContent = 'Resume processed successfully!';
+            state.skillSimilarities = data.similarity_patch || null;
+            elements.resumeStatus.textContent = data.provisional
+                ? 'Resume processed (refining with Grok...)'
+                : 'Resume processed successfully!';
             elements.resumeStatus.className = 'resume-status success';
             
             // Re-render skill tree with candidate skills and similarities
             if (state.skillTree) {
                 renderSkillTree(state.skillTree);
             }
+            
+            // Grok missed the latency budget: this is a keyword-based analysis, the full one follows
+            if (data.provisional && data.result_token) {
+                pollDeferredResult(data.result_token, data.poll_after).then(result => {
+                    if (state.candidateFileId !== data.file_id) return;
+                    if (result && result.skill_tree) {
+                        state.candidateSkillTree = result.skill_tree;
+                        state.skillSimilarities = result.similarity_patch || null;
+                        if (state.skillTree) {
+                            renderSkillTree(state.skillTree);
+                        }
+                    }
+                    elements.resumeStatus.textContent = 'Resume processed successfully!';
+                });
+            }
         } else {
             throw new Error(data.error || 'Failed to process resume');
         }
@@ -1028,16 +1270,23 @@ async function init() {
     initWaveform();
     await initVideoStream();
     await loadJobs(); // Load jobs first
-    // Don't load skill tree on startup - wait for job selection
+    // Don't load skill tree on startup - wait for job selection, unless joining an interview (?interview=<id>)
+    const interviewId = new URLSearchParams(window.location.search).get('interview');
+    if (interviewId) {
+        try {
+            const response = await fetch(`http://localhost:5000/api/v1/interviews/${interviewId}?limit=1`);
+            if (response.ok) {
+                const session = await response.json();
+                await loadSkillTree(session.job_id, interviewId);
+            }
+        } catch (error) {
+            console.warn('Failed to join interview:', error);
+        }
+    }
     renderQuestionHistory();
     renderTranscript();
     renderQuestions(); // Initialize questions display
     updateMuteButton();
-    
-    // Watch for transcript updates
-    setInterval(() => {
-        processTranscript();
-    }, 1000);
 }
 
 // Start app
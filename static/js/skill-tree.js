@@ -10,8 +10,9 @@ class SkillTreeVisualization {
         this.defaultZoom = 0.7; // Default zoom level (70%)
         this.jobSkills = new Set(); // Skills from job skill tree
         this.candidateSkills = new Set(); // Skills from candidate resume
-        this.skillSimilarities = null; // Similarity data from Grok API
-        this.nodeColors = state.nodeColors || new Map(); // Manual node colors (reference to state)
+        this.skillSimilarities = null; // Similarity patch from the server: node id -> 'match'
+        this.nodeColors = state.nodeColors || new Map(); // Manual node colors by node key (reference to state)
+        this.circles = new Map(); // Node key -> circle element, for recoloring single nodes
         
         // Ensure container is empty before creating SVG
         if (container) {
@@ -89,8 +90,9 @@ class SkillTreeVisualization {
             this.candidateSkills = new Set();
         }
         
-        // Store similarity data from Grok API
+        // Store the similarity patch
         this.skillSimilarities = similarityData;
+        this.circles = new Map();
         
         // Convert data to hierarchy
         const root = d3.hierarchy(tree);
@@ -111,6 +113,21 @@ class SkillTreeVisualization {
         }
     }
     
+    // Nodes are keyed by their server-assigned id; trees without ids fall back to names
+    nodeKey(data) {
+        return data.id || data.name;
+    }
+    
+    // Recolor only the given nodes (e.g. after a skill patch), without re-rendering the tree
+    applyPatch(keys) {
+        keys.forEach(key => {
+            const circle = this.circles.get(key);
+            if (circle) {
+                d3.select(circle).style('fill', d => this.getNodeColor(d));
+            }
+        });
+    }
+    
     extractSkills(node, skillSet = new Set()) {
         if (node.type === 'skill' || node.type === 'requirement') {
             skillSet.add(node.name.toLowerCase());
@@ -138,21 +155,17 @@ class SkillTreeVisualization {
     getNodeColor(d) {
         // Check if node has a manual color set
         if (d.data.type === 'skill' || d.data.type === 'requirement') {
-            const skillName = d.data.name;
-            const manualColor = this.nodeColors.get(skillName);
+            const manualColor = this.nodeColors.get(this.nodeKey(d.data));
             if (manualColor) {
                 return manualColor;
             }
             
             // Otherwise use automatic color logic
-            const skillNameLower = skillName.toLowerCase();
+            const skillNameLower = d.data.name.toLowerCase();
             
-            // Use Grok similarity data if available
-            if (this.skillSimilarities && this.skillSimilarities.matches) {
-                const match = this.skillSimilarities.matches.find(m => 
-                    m.job_skill.toLowerCase() === skillNameLower
-                );
-                if (match) {
+            // Use the similarity patch if available
+            if (this.skillSimilarities) {
+                if (this.skillSimilarities[this.nodeKey(d.data)] === 'match') {
                     return '#eab308'; // Yellow for matching skills
                 }
             } else {
@@ -160,18 +173,9 @@ class SkillTreeVisualization {
                 if (isMatch) {
                     return '#eab308';
                 }
-            }
-            
-            // Check if this is a candidate-only skill
-            if (this.skillSimilarities && this.skillSimilarities.candidate_only) {
-                const isCandidateOnly = this.skillSimilarities.candidate_only.some(cs => 
-                    cs.toLowerCase() === skillNameLower
-                );
-                if (isCandidateOnly) {
+                if (this.candidateSkills.has(skillNameLower) && !this.jobSkills.has(skillNameLower)) {
                     return '#ef4444'; // Red for candidate-only skills
                 }
-            } else if (this.candidateSkills.has(skillNameLower) && !this.jobSkills.has(skillNameLower)) {
-                return '#ef4444';
             }
             
             // Default: progress-based colors for job skills
@@ -218,6 +222,7 @@ class SkillTreeVisualization {
                 return 4;
             })
             .style('fill', d => this.getNodeColor(d))
+            .each((d, i, elements) => this.circles.set(this.nodeKey(d.data), elements[i]))
             .style('stroke', '#09090b')
             .style('stroke-width', 1.5)
             .style('transition', 'all 0.3s ease')
@@ -233,10 +238,10 @@ class SkillTreeVisualization {
                 // Only allow clicking on skill/requirement nodes
                 if (d.data.type === 'skill' || d.data.type === 'requirement') {
                     event.stopPropagation(); // Prevent zoom on click
-                    const skillName = d.data.name;
+                    const key = this.nodeKey(d.data);
                     
                     // Check if there's already a manual color set
-                    let currentColor = this.nodeColors.get(skillName);
+                    let currentColor = this.nodeColors.get(key);
                     
                     // If no manual color, start cycle from grey (first click)
                     if (!currentColor) {
@@ -247,7 +252,7 @@ class SkillTreeVisualization {
                     const nextColor = this.getNextColor(currentColor);
                     
                     // Update the color in the state
-                    this.nodeColors.set(skillName, nextColor);
+                    this.nodeColors.set(key, nextColor);
                     
                     // Update the visual with animation
                     d3.select(event.currentTarget)
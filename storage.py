@@ -0,0 +1,663 @@
+"""
+SQLite Storage
+Persists job skill trees, candidate skill trees, similarity results,
+interview transcripts, precomputed question banks and results still being computed in the background
+(see slo.py) in a single SQLite database (WAL mode), with indexed
+lookups by job id, resume file hash and normalized skill term.
+
+Usage:
+    python storage.py import [db_path]    # import new and changed files from the JSON directories
+"""
+
+import os
+import sys
+import glob
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from job_index import JobIndex
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, 'data', 'talent_pool.db')
+JOB_SKILL_TREES_DIR = os.path.join(BASE_DIR, 'data', 'job_skill_trees')
+CANDIDATE_SKILL_TREES_DIR = os.path.join(BASE_DIR, 'data', 'candidate_skill_trees')
+# Bumped when the search tables change, so existing rows are re-indexed on startup
+SEARCH_INDEX_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY,
+    job_title TEXT NOT NULL,
+    location TEXT NOT NULL DEFAULT '',
+    application_url TEXT,
+    tree_json TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_title ON jobs (job_title);
+
+CREATE TABLE IF NOT EXISTS candidates (
+    file_id TEXT PRIMARY KEY,
+    file_hash TEXT,
+    tree_json TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_candidates_file_hash ON candidates (file_hash);
+
+CREATE TABLE IF NOT EXISTS skill_terms (
+    owner_kind TEXT NOT NULL,
+    owner_id TEXT NOT NULL,
+    term TEXT NOT NULL,
+    PRIMARY KEY (owner_kind, owner_id, term)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_skill_terms_term ON skill_terms (term, owner_kind);
+
+CREATE TABLE IF NOT EXISTS similarity_results (
+    job_id INTEGER NOT NULL,
+    file_id TEXT NOT NULL,
+    result_json TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (job_id, file_id)
+);
+CREATE INDEX IF NOT EXISTS idx_similarity_file_id ON similarity_results (file_id);
+
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER,
+    transcript TEXT NOT NULL,
+    skill_analysis_json TEXT,
+    created_at TEXT NOT NULL,
+    session_id TEXT,
+    file_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_job_id ON transcripts (job_id);
+CREATE INDEX IF NOT EXISTS idx_transcripts_file_id ON transcripts (file_id);
+
+-- Search: full text of transcripts (kept in sync by triggers), the skills and colors their
+-- analyses found, and the skill names of candidate trees
+CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5(
+    transcript, content='transcripts', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS transcripts_fts_insert AFTER INSERT ON transcripts BEGIN
+    INSERT INTO transcripts_fts (rowid, transcript) VALUES (new.id, new.transcript);
+END;
+CREATE TRIGGER IF NOT EXISTS transcripts_fts_delete AFTER DELETE ON transcripts BEGIN
+    INSERT INTO transcripts_fts (transcripts_fts, rowid, transcript) VALUES ('delete', old.id, old.transcript);
+END;
+
+CREATE TABLE IF NOT EXISTS transcript_skills (
+    transcript_id INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    color TEXT,
+    PRIMARY KEY (transcript_id, term)
+);
+CREATE INDEX IF NOT EXISTS idx_transcript_skills_term ON transcript_skills (term, color);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS candidates_fts USING fts5(
+    file_id UNINDEXED, skills, tokenize='porter unicode61'
+);
+
+CREATE TABLE IF NOT EXISTS question_banks (
+    job_id INTEGER PRIMARY KEY,
+    tree_hash TEXT NOT NULL,
+    source TEXT NOT NULL,
+    questions_json TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS deferred_results (
+    token TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result_json TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deferred_results_created_at ON deferred_results (created_at);
+
+CREATE TABLE IF NOT EXISTS interview_sessions (
+    session_id TEXT PRIMARY KEY,
+    job_id INTEGER,
+    file_id TEXT,
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS interview_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data_json TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_interview_events_session ON interview_events (session_id, seq);
+
+-- Modification times of the JSON files imported by import_json_dirs, so re-runs skip unchanged files
+CREATE TABLE IF NOT EXISTS imported_files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+
+def normalize_term(term: str) -> str:
+    """Normalize a skill name for indexed lookups."""
+    return ' '.join(term.lower().split())
+
+
+def skill_terms(tree: Dict[str, Any]) -> List[str]:
+    """Collect the distinct normalized names of all typed (leaf) nodes in a tree."""
+    terms = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node.get('type') and node.get('name'):
+            terms.add(normalize_term(node['name']))
+        stack.extend(node.get('children') or [])
+    return sorted(terms)
+
+
+def tree_text(tree: Dict[str, Any]) -> str:
+    """The names of all nodes in a tree, as text for the search index."""
+    names = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node.get('name'):
+            names.append(node['name'])
+        stack.extend(reversed(node.get('children') or []))
+    return '. '.join(names)
+
+
+def analysis_skills(skill_analysis: Optional[Dict[str, Any]]) -> List[Tuple[str, Optional[str]]]:
+    """(normalized skill, color) of every skill a speech analysis found mentioned."""
+    skills = {}
+    for skill in (skill_analysis or {}).get('mentioned_skills') or []:
+        if isinstance(skill, dict) and skill.get('mentioned') and isinstance(skill.get('skill_name'), str):
+            color = skill.get('color')
+            skills[normalize_term(skill['skill_name'])] = color.lower() if isinstance(color, str) else None
+    return sorted(skills.items())
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+class Storage:
+    """
+    Thread-safe access to the SQLite database.
+
+    Each thread (and each forked worker process) gets its own connection;
+    sqlite3 caches the prepared form of every parameterized statement on
+    the connection, so repeated queries skip re-parsing.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            self._migrate_transcripts(conn)
+            conn.executescript(SCHEMA)
+            self._build_search_index(conn)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _migrate_transcripts(self, conn: sqlite3.Connection):
+        # Databases created before transcripts were linked to sessions and candidates
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(transcripts)')}
+        if columns:
+            for column in ('session_id', 'file_id'):
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE transcripts ADD COLUMN {column} TEXT')
+
+    def _build_search_index(self, conn: sqlite3.Connection):
+        """Index rows stored before the search tables existed (once; later rows are indexed as they are saved)."""
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= SEARCH_INDEX_VERSION:
+            return
+        conn.execute("INSERT INTO transcripts_fts (transcripts_fts) VALUES ('rebuild')")
+        conn.execute('DELETE FROM transcript_skills')
+        for row in conn.execute('SELECT id, skill_analysis_json FROM transcripts WHERE skill_analysis_json IS NOT NULL').fetchall():
+            self._insert_transcript_skills(conn, row['id'], json.loads(row['skill_analysis_json']))
+        conn.execute('DELETE FROM candidates_fts')
+        for row in conn.execute('SELECT file_id, tree_json FROM candidates').fetchall():
+            self._index_candidate(conn, row['file_id'], json.loads(row['tree_json']))
+        conn.execute(f'PRAGMA user_version = {SEARCH_INDEX_VERSION}')
+
+    def _insert_transcript_skills(self, conn: sqlite3.Connection, transcript_id: int,
+                                  skill_analysis: Optional[Dict[str, Any]]):
+        conn.executemany(
+            'INSERT OR REPLACE INTO transcript_skills (transcript_id, term, color) VALUES (?, ?, ?)',
+            [(transcript_id, term, color) for term, color in analysis_skills(skill_analysis)]
+        )
+
+    def _index_candidate(self, conn: sqlite3.Connection, file_id: str, tree: Dict[str, Any]):
+        conn.execute('DELETE FROM candidates_fts WHERE file_id = ?', (file_id,))
+        conn.execute('INSERT INTO candidates_fts (file_id, skills) VALUES (?, ?)', (file_id, tree_text(tree)))
+
+    def _replace_terms(self, conn: sqlite3.Connection, owner_kind: str, owner_id: str, tree: Dict[str, Any]):
+        conn.execute('DELETE FROM skill_terms WHERE owner_kind = ? AND owner_id = ?', (owner_kind, owner_id))
+        conn.executemany(
+            'INSERT OR IGNORE INTO skill_terms (owner_kind, owner_id, term) VALUES (?, ?, ?)',
+            [(owner_kind, owner_id, term) for term in skill_terms(tree)]
+        )
+
+    # Jobs
+
+    def save_job(self, tree: Dict[str, Any]):
+        """Insert or replace a job skill tree (must carry a job_id)."""
+        job_id = int(tree['job_id'])
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO jobs (job_id, job_title, location, application_url, tree_json, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, tree.get('job_title', 'Unknown'), tree.get('location', ''),
+                 tree.get('application_url'), _dumps(tree), _now())
+            )
+            self._replace_terms(conn, 'job', str(job_id), tree)
+
+    def get_job(self, job_id) -> Optional[Dict[str, Any]]:
+        try:
+            job_id = int(job_id)
+        except (TypeError, ValueError):
+            return None
+        row = self._connection().execute('SELECT tree_json FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row['tree_json']) if row else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Job metadata sorted by title, without loading any tree bodies."""
+        rows = self._connection().execute(
+            'SELECT job_id, job_title, location FROM jobs ORDER BY job_title'
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count_jobs(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+
+    # Candidates
+
+    def save_candidate(self, file_id: str, tree: Dict[str, Any], file_hash: Optional[str] = None):
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO candidates (file_id, file_hash, tree_json, created_at) VALUES (?, ?, ?, ?)',
+                (file_id, file_hash, _dumps(tree), _now())
+            )
+            self._replace_terms(conn, 'candidate', file_id, tree)
+            self._index_candidate(conn, file_id, tree)
+
+    def get_candidate(self, file_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            'SELECT tree_json FROM candidates WHERE file_id = ?', (file_id,)
+        ).fetchone()
+        return json.loads(row['tree_json']) if row else None
+
+    def get_candidate_by_hash(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            'SELECT tree_json FROM candidates WHERE file_hash = ?', (file_hash,)
+        ).fetchone()
+        return json.loads(row['tree_json']) if row else None
+
+    # Skill lookups
+
+    def find_candidates_with_skill(self, term: str) -> List[str]:
+        """File ids of all candidates whose tree contains the given skill."""
+        rows = self._connection().execute(
+            "SELECT owner_id FROM skill_terms WHERE term = ? AND owner_kind = 'candidate' ORDER BY owner_id",
+            (normalize_term(term),)
+        ).fetchall()
+        return [row['owner_id'] for row in rows]
+
+    def find_jobs_with_skill(self, term: str) -> List[int]:
+        """Ids of all jobs whose tree requires the given skill."""
+        rows = self._connection().execute(
+            "SELECT owner_id FROM skill_terms WHERE term = ? AND owner_kind = 'job' ORDER BY owner_id",
+            (normalize_term(term),)
+        ).fetchall()
+        return [int(row['owner_id']) for row in rows]
+
+    # Analysis results
+
+    def save_similarity(self, job_id, file_id: str, similarity_data: Dict[str, Any]):
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO similarity_results (job_id, file_id, result_json, created_at) '
+                'VALUES (?, ?, ?, ?)',
+                (int(job_id), file_id, _dumps(similarity_data), _now())
+            )
+
+    def get_similarity(self, job_id, file_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            'SELECT result_json FROM similarity_results WHERE job_id = ? AND file_id = ?',
+            (int(job_id), file_id)
+        ).fetchone()
+        return json.loads(row['result_json']) if row else None
+
+    def save_transcript(self, job_id, transcript: str, skill_analysis: Optional[Dict[str, Any]] = None,
+                        session_id: Optional[str] = None, file_id: Optional[str] = None) -> int:
+        """Store a transcript; it is searchable (text and analysed skills) as soon as this returns."""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                'INSERT INTO transcripts (job_id, transcript, skill_analysis_json, created_at, session_id, file_id) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (int(job_id) if job_id else None, transcript,
+                 _dumps(skill_analysis) if skill_analysis is not None else None, _now(), session_id, file_id)
+            )
+            self._insert_transcript_skills(conn, cursor.lastrowid, skill_analysis)
+            return cursor.lastrowid
+
+    def list_transcripts(self, job_id) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(
+            'SELECT id, transcript, skill_analysis_json, created_at FROM transcripts WHERE job_id = ? ORDER BY id',
+            (int(job_id),)
+        ).fetchall()
+        return [{
+            'id': row['id'],
+            'transcript': row['transcript'],
+            'skill_analysis': json.loads(row['skill_analysis_json']) if row['skill_analysis_json'] else None,
+            'created_at': row['created_at']
+        } for row in rows]
+
+    # Search
+
+    def search_transcripts(self, match: Optional[str] = None, skill: Optional[str] = None,
+                           color: Optional[str] = None, job_id=None, file_id: Optional[str] = None,
+                           limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Transcripts matching an FTS5 query and/or an analysed skill and color, best matches first.
+
+        Args:
+            match: FTS5 query over the transcript text (None: any text, newest first)
+            skill: Only transcripts whose analysis found this skill mentioned
+            color: Only transcripts with a skill of this color (the given skill, if any)
+            job_id: Only transcripts of this job
+            file_id: Only transcripts of this candidate
+            limit: Most results returned
+        """
+        clauses, params = [], []
+        if match:
+            select = ("SELECT t.*, bm25(transcripts_fts) AS score, "
+                      "snippet(transcripts_fts, 0, '[', ']', '...', 16) AS snippet "
+                      "FROM transcripts_fts JOIN transcripts t ON t.id = transcripts_fts.rowid")
+            clauses.append('transcripts_fts MATCH ?')
+            params.append(match)
+        else:
+            select = 'SELECT t.*, 0.0 AS score, substr(t.transcript, 1, 200) AS snippet FROM transcripts t'
+        if skill or color:
+            facet = ['s.transcript_id = t.id']
+            if skill:
+                facet.append('s.term = ?')
+                params.append(normalize_term(skill))
+            if color:
+                facet.append('s.color = ?')
+                params.append(color.lower())
+            clauses.append(f"EXISTS (SELECT 1 FROM transcript_skills s WHERE {' AND '.join(facet)})")
+        if job_id is not None:
+            clauses.append('t.job_id = ?')
+            params.append(int(job_id))
+        if file_id:
+            clauses.append('t.file_id = ?')
+            params.append(file_id)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._connection().execute(
+            f'{select}{where} ORDER BY score, t.id DESC LIMIT ?', params + [int(limit)]
+        ).fetchall()
+
+        results = [{
+            'id': row['id'],
+            'job_id': row['job_id'],
+            'file_id': row['file_id'],
+            'session_id': row['session_id'],
+            'snippet': row['snippet'],
+            'score': round(-row['score'], 4),
+            'created_at': row['created_at'],
+            'skills': []
+        } for row in rows]
+        if results:
+            by_id = {result['id']: result for result in results}
+            skill_rows = self._connection().execute(
+                f"SELECT transcript_id, term, color FROM transcript_skills "
+                f"WHERE transcript_id IN ({','.join('?' * len(by_id))}) ORDER BY term",
+                list(by_id)
+            ).fetchall()
+            for row in skill_rows:
+                by_id[row['transcript_id']]['skills'].append({'skill': row['term'], 'color': row['color']})
+        return results
+
+    def transcript_skill_facets(self, match: Optional[str] = None, job_id=None, limit: int = 20) -> List[Dict[str, Any]]:
+        """How many transcripts (matching the query) mention each skill, per color."""
+        clauses, params = [], []
+        if match:
+            clauses.append('s.transcript_id IN (SELECT rowid FROM transcripts_fts WHERE transcripts_fts MATCH ?)')
+            params.append(match)
+        if job_id is not None:
+            clauses.append('s.transcript_id IN (SELECT id FROM transcripts WHERE job_id = ?)')
+            params.append(int(job_id))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._connection().execute(
+            f'SELECT s.term, s.color, COUNT(*) AS count FROM transcript_skills s{where} '
+            f'GROUP BY s.term, s.color ORDER BY count DESC, s.term LIMIT ?',
+            params + [int(limit)]
+        ).fetchall()
+        return [{'skill': row['term'], 'color': row['color'], 'count': row['count']} for row in rows]
+
+    def search_candidates(self, match: Optional[str] = None, skill: Optional[str] = None,
+                          limit: int = 20) -> List[Dict[str, Any]]:
+        """Candidates whose skill tree matches an FTS5 query and/or lists a skill, best matches first."""
+        clauses, params = [], []
+        if match:
+            clauses.append('candidates_fts MATCH ?')
+            params.append(match)
+        if skill:
+            clauses.append("file_id IN (SELECT owner_id FROM skill_terms WHERE owner_kind = 'candidate' AND term = ?)")
+            params.append(normalize_term(skill))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        if match:
+            columns = "bm25(candidates_fts) AS score, snippet(candidates_fts, 1, '[', ']', '...', 16) AS snippet"
+        else:
+            columns = '0.0 AS score, substr(skills, 1, 200) AS snippet'
+        rows = self._connection().execute(
+            f"SELECT file_id, {columns} "
+            f"FROM candidates_fts{where} ORDER BY score, file_id LIMIT ?",
+            params + [int(limit)]
+        ).fetchall()
+        return [{'file_id': row['file_id'], 'snippet': row['snippet'], 'score': round(-row['score'], 4)}
+                for row in rows]
+
+    # Question banks
+
+    def save_question_bank(self, job_id, tree_hash: str, source: str, questions: List[Dict[str, Any]]):
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO question_banks (job_id, tree_hash, source, questions_json, created_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (int(job_id), tree_hash, source, _dumps(questions), _now())
+            )
+
+    def get_question_bank(self, job_id) -> Optional[Dict[str, Any]]:
+        try:
+            job_id = int(job_id)
+        except (TypeError, ValueError):
+            return None
+        row = self._connection().execute(
+            'SELECT tree_hash, source, questions_json, created_at FROM question_banks WHERE job_id = ?', (job_id,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            'tree_hash': row['tree_hash'],
+            'source': row['source'],
+            'questions': json.loads(row['questions_json']),
+            'created_at': row['created_at']
+        }
+
+    def question_bank_hashes(self) -> Dict[int, Tuple[str, str]]:
+        """(tree hash, source) of every stored bank by job id, for finding stale banks."""
+        rows = self._connection().execute('SELECT job_id, tree_hash, source FROM question_banks').fetchall()
+        return {row['job_id']: (row['tree_hash'], row['source']) for row in rows}
+
+    # Deferred results
+
+    def create_deferred_result(self, token: str, kind: str, expire_before: Optional[str] = None):
+        """Register a pending result; rows created before expire_before are purged on the way."""
+        with self._connection() as conn:
+            if expire_before:
+                conn.execute('DELETE FROM deferred_results WHERE created_at < ?', (expire_before,))
+            now = _now()
+            conn.execute(
+                "INSERT INTO deferred_results (token, kind, status, created_at, updated_at) VALUES (?, ?, 'pending', ?, ?)",
+                (token, kind, now, now)
+            )
+
+    def finish_deferred_result(self, token: str, status: str, result: Optional[Any] = None):
+        with self._connection() as conn:
+            conn.execute(
+                'UPDATE deferred_results SET status = ?, result_json = ?, updated_at = ? WHERE token = ?',
+                (status, _dumps(result) if result is not None else None, _now(), token)
+            )
+
+    def get_deferred_result(self, token: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            'SELECT kind, status, result_json, created_at, updated_at FROM deferred_results WHERE token = ?', (token,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            'kind': row['kind'],
+            'status': row['status'],
+            'result': json.loads(row['result_json']) if row['result_json'] else None,
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at']
+        }
+
+    # Interview sessions
+
+    def create_interview_session(self, session_id: str, job_id=None, file_id: Optional[str] = None):
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT INTO interview_sessions (session_id, job_id, file_id, created_at) VALUES (?, ?, ?, ?)',
+                (session_id, int(job_id) if job_id else None, file_id, _now())
+            )
+
+    def get_interview_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            'SELECT session_id, job_id, file_id, created_at FROM interview_sessions WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def append_interview_events(self, session_id: str, events: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Append (type, data) events to a session's log; returns them with their sequence numbers."""
+        appended = []
+        with self._connection() as conn:
+            for event_type, data in events:
+                created_at = _now()
+                cursor = conn.execute(
+                    'INSERT INTO interview_events (session_id, type, data_json, created_at) VALUES (?, ?, ?, ?)',
+                    (session_id, event_type, _dumps(data), created_at)
+                )
+                appended.append({'seq': cursor.lastrowid, 'type': event_type, 'data': data, 'created_at': created_at})
+        return appended
+
+    def list_interview_events(self, session_id: str, since: int = 0, limit: int = -1) -> List[Dict[str, Any]]:
+        """A session's events with sequence numbers above since, oldest first (limit -1: all)."""
+        rows = self._connection().execute(
+            'SELECT seq, type, data_json, created_at FROM interview_events WHERE session_id = ? AND seq > ? '
+            'ORDER BY seq LIMIT ?',
+            (session_id, int(since), int(limit))
+        ).fetchall()
+        return [{
+            'seq': row['seq'],
+            'type': row['type'],
+            'data': json.loads(row['data_json']),
+            'created_at': row['created_at']
+        } for row in rows]
+
+    def rebuild_search_index(self):
+        """Re-index every transcript and candidate from scratch."""
+        with self._connection() as conn:
+            conn.execute('PRAGMA user_version = 0')
+            self._build_search_index(conn)
+
+    # Import
+
+    def import_json_dirs(self, job_dir: str = JOB_SKILL_TREES_DIR,
+                         candidate_dir: str = CANDIDATE_SKILL_TREES_DIR,
+                         jobs: Optional[JobIndex] = None) -> Dict[str, int]:
+        """
+        Import the job and candidate JSON files that are new or changed since the last import.
+
+        Args:
+            job_dir: Directory of job skill tree files
+            candidate_dir: Directory of candidate skill tree files
+            jobs: Index of job_dir (scanned here if not given); of several files with the same job id
+                only the one it resolves the id to is imported, as in the pack and the app
+
+        Returns:
+            Number of jobs and candidates imported
+        """
+        counts = {'jobs': 0, 'candidates': 0}
+        jobs = jobs or JobIndex(job_dir)
+        imported = dict(self._connection().execute('SELECT path, mtime_ns FROM imported_files').fetchall())
+
+        for job_id, json_file in sorted(jobs.paths().items()):
+            changed = self._read_if_changed(json_file, imported)
+            if changed and changed[0].get('job_id'):
+                self.save_job(changed[0])
+                self._mark_imported(json_file, changed[1])
+                counts['jobs'] += 1
+
+        prefix, suffix = 'candidate_', '_skill_tree.json'
+        for json_file in sorted(glob.glob(os.path.join(candidate_dir, f'{prefix}*{suffix}'))):
+            file_id = os.path.basename(json_file)[len(prefix):-len(suffix)]
+            changed = self._read_if_changed(json_file, imported)
+            if changed:
+                self.save_candidate(file_id, changed[0])
+                self._mark_imported(json_file, changed[1])
+                counts['candidates'] += 1
+
+        return counts
+
+    @staticmethod
+    def _read_if_changed(json_file: str, imported: Dict[str, int]) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Parsed contents and mtime of json_file, or None if it is unchanged since its last import."""
+        try:
+            mtime_ns = os.stat(json_file).st_mtime_ns
+            if imported.get(json_file) == mtime_ns:
+                return None
+            with open(json_file, 'r', encoding='utf-8') as f:
+                return json.load(f), mtime_ns
+        except Exception as e:
+            print(f"Error reading {json_file}: {e}")
+            return None
+
+    def _mark_imported(self, json_file: str, mtime_ns: int):
+        with self._connection() as conn:
+            conn.execute('INSERT OR REPLACE INTO imported_files (path, mtime_ns) VALUES (?, ?)', (json_file, mtime_ns))
+
+
+def main():
+    """Main entry point."""
+    if len(sys.argv) < 2 or sys.argv[1] != 'import':
+        print("Usage: python storage.py import [db_path]")
+        sys.exit(1)
+
+    db_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DB_PATH
+    counts = Storage(db_path).import_json_dirs()
+    print(f"Imported {counts['jobs']} jobs and {counts['candidates']} candidates into {db_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+"""
+Request Tracing
+Lightweight in-process tracing: every request gets a trace whose spans
+(pipeline stages, upstream calls, storage and rendering steps) form a tree
+timed on one clock, so a slow request reads as a single timeline. The trace
+id is taken from an incoming `traceparent` (W3C) or `X-Trace-Id` header, or
+generated, and returned in `X-Trace-Id`.
+
+Traces that were asked for (X-Trace-Token carrying the trace token, with
+either id header), randomly sampled, or longer than the slow threshold are appended
+to a local JSONL file, one record per trace and process; no collector is
+needed. Work a request hands off to a background thread (e.g. an SLO
+upgrade) stays part of its trace, which is written once that work ends.
+View a trace at /debug/traces/<trace_id> (HTML, or ?format=json).
+
+Usage:
+    python tracing.py show <trace_id> [--file traces.jsonl]   # print a stored trace as an indented timeline
+"""
+
+import os
+import re
+import json
+import time
+import random
+import secrets
+import argparse
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from html import escape
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TRACE_FILE = os.path.join(BASE_DIR, 'data', 'traces.jsonl')
+
+# Paths never traced: probes, scrapes, static files and the trace viewer itself
+UNTRACED_PREFIXES = ('/debug/', '/metrics', '/healthz', '/readyz', '/static/')
+# version-trace_id-parent_id-flags
+_TRACEPARENT = re.compile(r'^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+_TRACE_ID = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+_current: contextvars.ContextVar[Optional[Tuple['Trace', 'Span']]] = contextvars.ContextVar('trace_span', default=None)
+
+
+def new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+class Span:
+    """One timed step of a trace."""
+
+    __slots__ = ('name', 'span_id', 'parent_id', 'attrs', 'error', '_start', '_end')
+
+    def __init__(self, name: str, parent_id: Optional[str], attrs: Dict[str, Any]):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.error: Optional[str] = None
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self):
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        end = self._end if self._end is not None else time.perf_counter()
+        span = {'id': self.span_id, 'parent': self.parent_id, 'name': self.name,
+                'start_ms': round((self._start - origin) * 1000, 3), 'duration_ms': round((end - self._start) * 1000, 3)}
+        if self.attrs:
+            span['attrs'] = self.attrs
+        if self.error:
+            span['error'] = self.error
+        return span
+
+
+class Trace:
+    """The spans one process recorded for a trace id; exported once the request and any handed-off work end."""
+
+    def __init__(self, trace_id: str, sampled: bool, exporter: 'JsonlExporter', slow_seconds: float):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.exporter = exporter
+        self.slow_seconds = slow_seconds
+        self.wall_start = time.time()
+        self.origin = time.perf_counter()
+        self.root: Optional[Span] = None
+        self.spans: List[Span] = []
+        self._pending = 1
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        # Spans may be added from worker threads that copied the request's context
+        with self._lock:
+            self.spans.append(span)
+
+    def hold(self):
+        with self._lock:
+            self._pending += 1
+
+    def release(self):
+        with self._lock:
+            self._pending -= 1
+            done = self._pending == 0
+        if done:
+            self._export()
+
+    def _export(self):
+        spans = ([self.root] if self.root else []) + self.spans
+        duration = max((span._end or span._start) for span in spans) - self.origin if spans else 0.0
+        if not (self.sampled or duration >= self.slow_seconds):
+            return
+        record = {
+            'trace_id': self.trace_id,
+            'name': self.root.name if self.root else '',
+            'start': self.wall_start,
+            'duration_ms': round(duration * 1000, 3),
+            'pid': os.getpid(),
+            'spans': [span.to_dict(self.origin) for span in spans]
+        }
+        try:
+            self.exporter.export(record)
+        except OSError as e:
+            print(f"Error exporting trace {self.trace_id}: {e}")
+
+
+class JsonlExporter:
+    """Appends trace records to a JSONL file shared by all workers, rotating it to <path>.1 when it grows too large."""
+
+    def __init__(self, path: str, max_bytes: int = 20 * 1024 * 1024, recent: int = 100):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Summaries of the traces this process exported, newest last
+        self._recent: deque = deque(maxlen=recent)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, record: Dict[str, Any]):
+        line = (json.dumps(record, separators=(',', ':'), default=str) + '\n').encode('utf-8')
+        with self._lock:
+            try:
+                if os.path.getsize(self.path) + len(line) > self.max_bytes:
+                    os.replace(self.path, self.path + '.1')
+            except FileNotFoundError:
+                pass
+            # One O_APPEND write per record, so records from concurrent workers never interleave
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+            self._recent.append({key: record[key] for key in ('trace_id', 'name', 'start', 'duration_ms')})
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Traces this process exported, newest first."""
+        with self._lock:
+            return list(reversed(self._recent))
+
+    def find(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Every record of a trace, from any worker, in the current and the rotated file."""
+        records = []
+        needle = f'"trace_id":"{trace_id}"'
+        for path in (self.path + '.1', self.path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if needle in line:
+                            try:
+                                records.append(json.loads(line))
+                            except ValueError:
+                                continue
+            except FileNotFoundError:
+                continue
+        return records
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Optional[Span]]:
+    """
+    Time a block as a child of the current span; a no-op (yielding None) outside a traced request.
+
+    Args:
+        name: Span name (e.g. a pipeline stage)
+        **attrs: Attributes recorded with the span
+    """
+    current = _current.get()
+    if current is None:
+        yield None
+        return
+    trace, parent = current
+    child = Span(name, parent.span_id, attrs)
+    token = _current.set((trace, child))
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end()
+        _current.reset(token)
+        trace.add(child)
+
+
+def annotate(**attrs):
+    """Add attributes to the current span, if any."""
+    current = _current.get()
+    if current is not None:
+        current[1].set(**attrs)
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current.get()
+    return current[0].trace_id if current else None
+
+
+def handoff() -> Optional[Tuple[Trace, Span]]:
+    """Capture the current span for work continued in another thread; the trace is held open until it is resumed."""
+    current = _current.get()
+    if current is not None:
+        current[0].hold()
+    return current
+
+
+@contextmanager
+def resume(handed: Optional[Tuple[Trace, Span]], name: str, **attrs) -> Iterator[Optional[Span]]:
+    """Continue a handed-off trace (see handoff) in this thread under a new span; releases the trace afterwards."""
+    if handed is None:
+        yield None
+        return
+    trace, parent = handed
+    child = Span(name, parent.span_id, attrs)
+    token = _current.set((trace, child))
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end()
+        _current.reset(token)
+        trace.add(child)
+        trace.release()
+
+
+def token_matches(token: Optional[str], supplied: Optional[str]) -> bool:
+    return bool(token and supplied and secrets.compare_digest(token, supplied))
+
+
+def parse_trace_headers(headers, token: Optional[str] = None) -> Tuple[Optional[str], Optional[str], bool]:
+    """
+    (trace id, remote parent span id, sampled) from traceparent or X-Trace-Id; (None, None, False) without either.
+
+    Neither header forces the trace to be stored (the sampled flag of traceparent, or X-Trace-Id alone) unless it
+    comes with the X-Trace-Token matching token, so anonymous clients cannot fill the trace file.
+    """
+    authorized = token_matches(token, headers.get('X-Trace-Token'))
+    match = _TRACEPARENT.match((headers.get('traceparent') or '').strip().lower())
+    if match:
+        return match.group(1), match.group(2), authorized and bool(int(match.group(3), 16) & 1)
+    trace_id = (headers.get('X-Trace-Id') or '').strip()
+    if _TRACE_ID.match(trace_id):
+        return trace_id, None, authorized
+    return None, None, False
+
+
+def _depths(spans: List[Dict[str, Any]]) -> Dict[str, int]:
+    parents = {span['id']: span.get('parent') for span in spans}
+    depths: Dict[str, int] = {}
+    for span in spans:
+        depth, parent = 0, span.get('parent')
+        while parent in parents and depth < 64:
+            depth, parent = depth + 1, parents[parent]
+        depths[span['id']] = depth
+    return depths
+
+
+def merge_records(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One timeline from the records of a trace: spans from all processes, offset from the earliest start."""
+    if not records:
+        return {'spans': []}
+    origin = min(record['start'] for record in records)
+    spans = []
+    for record in records:
+        offset = (record['start'] - origin) * 1000
+        for span in record['spans']:
+            spans.append(dict(span, start_ms=round(span['start_ms'] + offset, 3), pid=record.get('pid')))
+    spans.sort(key=lambda span: span['start_ms'])
+    depths = _depths(spans)
+    for span in spans:
+        span['depth'] = depths[span['id']]
+    duration = max((span['start_ms'] + span['duration_ms'] for span in spans), default=0.0)
+    return {'trace_id': records[0]['trace_id'], 'name': records[0].get('name'), 'start': origin,
+            'duration_ms': round(duration, 3), 'spans': _tree_order(spans)}
+
+
+def _tree_order(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Depth-first, children by start time, so the timeline reads top to bottom
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    ids = {span['id'] for span in spans}
+    for span in spans:
+        parent = span.get('parent') if span.get('parent') in ids else None
+        children.setdefault(parent, []).append(span)
+    ordered, stack = [], list(reversed(children.get(None, [])))
+    while stack:
+        span = stack.pop()
+        ordered.append(span)
+        stack.extend(reversed(children.get(span['id'], [])))
+    return ordered
+
+
+def render_html(trace: Dict[str, Any]) -> str:
+    """A trace as an HTML waterfall."""
+    total = trace['duration_ms'] or 1.0
+    rows = []
+    for span in trace['spans']:
+        left = 100 * span['start_ms'] / total
+        width = max(100 * span['duration_ms'] / total, 0.2)
+        attrs = ', '.join(f"{key}={value}" for key, value in (span.get('attrs') or {}).items())
+        color = '#ef4444' if span.get('error') else '#3b82f6'
+        title = escape(span.get('error') or attrs, quote=True)
+        rows.append(
+            f"<tr title=\"{title}\"><td style=\"padding-left:{span['depth'] * 16 + 4}px\">{escape(span['name'])}</td>"
+            f"<td class=\"ms\">{span['start_ms']:.1f}</td><td class=\"ms\">{span['duration_ms']:.1f}</td>"
+            f"<td class=\"bar\"><div style=\"margin-left:{left:.2f}%;width:{width:.2f}%;background:{color}\"></div></td>"
+            f"<td class=\"attrs\">{escape(attrs)}</td></tr>")
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>Trace {escape(trace['trace_id'])}</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; padding: 20px; }}
+        table {{ border-collapse: collapse; width: 100%; font-size: 13px; }}
+        td, th {{ padding: 3px 4px; border-bottom: 1px solid #f4f4f5; text-align: left; white-space: nowrap; }}
+        .ms {{ text-align: right; color: #6b7280; }}
+        .bar {{ width: 45%; }}
+        .bar div {{ height: 10px; border-radius: 2px; }}
+        .attrs {{ color: #6b7280; font-size: 12px; }}
+    </style>
+</head>
+<body>
+    <h1>{escape(trace.get('name') or 'Trace')}</h1>
+    <p>Trace {escape(trace['trace_id'])}, {trace['duration_ms']:.1f} ms,
+       started {escape(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(trace['start'])))}</p>
+    <table>
+        <tr><th>Span</th><th class="ms">Start (ms)</th><th class="ms">Duration (ms)</th><th></th><th>Attributes</th></tr>
+        {''.join(rows)}
+    </table>
+</body>
+</html>
+"""
+
+
+def init_app(app, trace_file: str = DEFAULT_TRACE_FILE, sample_rate: float = 0.0, slow_seconds: float = 2.0,
+             max_bytes: int = 20 * 1024 * 1024, token: Optional[str] = None) -> JsonlExporter:
+    """
+    Trace every request of a Flask app and serve the trace viewer.
+
+    Args:
+        app: The Flask application
+        trace_file: JSONL file traces are appended to
+        sample_rate: Fraction of requests whose traces are stored regardless of duration
+        slow_seconds: Traces at least this long are always stored
+        max_bytes: Size at which the trace file is rotated
+        token: Secret required by the viewer (X-Trace-Token header or ?token=), and with X-Trace-Id to force a trace
+            to be stored; without one the viewer only answers local requests
+    """
+    from flask import abort, g, jsonify, request, Response
+
+    exporter = JsonlExporter(trace_file, max_bytes=max_bytes)
+
+    @app.before_request
+    def start_trace():
+        if request.path.startswith(UNTRACED_PREFIXES):
+            return
+        trace_id, remote_parent, sampled = parse_trace_headers(request.headers, token)
+        if not sampled and sample_rate and random.random() < sample_rate:
+            sampled = True
+        trace = Trace(trace_id or new_trace_id(), sampled, exporter, slow_seconds)
+        root = trace.root = Span(f"{request.method} {request.url_rule.rule if request.url_rule else request.path}",
+                                 remote_parent, {'path': request.path})
+        _current.set((trace, root))
+        g.trace = (trace, root)
+
+    @app.after_request
+    def finish_trace(response):
+        started = g.pop('trace', None)
+        if started is None:
+            return response
+        trace, root = started
+        root.set(status=response.status_code)
+        root.end()
+        trace.release()
+        response.headers['X-Trace-Id'] = trace.trace_id
+        return response
+
+    @app.teardown_request
+    def clear_trace(error=None):
+        # Threads are reused across requests
+        _current.set(None)
+
+    def require_access():
+        if token:
+            if not token_matches(token, request.headers.get('X-Trace-Token') or request.args.get('token')):
+                abort(404)
+        elif request.remote_addr not in ('127.0.0.1', '::1'):
+            abort(404)
+
+    @app.route('/debug/traces', methods=['GET'])
+    def list_traces():
+        require_access()
+        return jsonify({'traces': exporter.recent()})
+
+    @app.route('/debug/traces/<trace_id>', methods=['GET'])
+    def show_trace(trace_id):
+        require_access()
+        if not _TRACE_ID.match(trace_id):
+            abort(404)
+        records = exporter.find(trace_id)
+        if not records:
+            return jsonify({'error': 'Trace not found (only sampled and slow traces are stored)'}), 404
+        trace = merge_records(records)
+        if request.args.get('format') == 'json':
+            return jsonify(trace)
+        return Response(render_html(trace), mimetype='text/html')
+
+    return exporter
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Show a stored request trace")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    show = subparsers.add_parser('show')
+    show.add_argument('trace_id')
+    show.add_argument('--file', default=os.getenv('TRACE_FILE', DEFAULT_TRACE_FILE))
+    args = parser.parse_args()
+
+    records = JsonlExporter(args.file).find(args.trace_id)
+    if not records:
+        print(f"Trace {args.trace_id} not found in {args.file}")
+        return
+    trace = merge_records(records)
+    print(f"{trace['name']}  {trace['duration_ms']:.1f} ms")
+    for span in trace['spans']:
+        attrs = ' '.join(f"{key}={value}" for key, value in (span.get('attrs') or {}).items())
+        error = f"  ERROR {span['error']}" if span.get('error') else ''
+        print(f"{span['start_ms']:>10.1f} {span['duration_ms']:>10.1f}  {'  ' * span['depth']}{span['name']}  {attrs}{error}")
+
+
+if __name__ == "__main__":
+    main()
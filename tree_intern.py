@@ -0,0 +1,237 @@
+"""
+Skill Tree Interning
+Hash-conses skill trees as they are loaded: identical subtrees (by content)
+and identical strings across all trees are replaced by one shared object,
+so near-duplicate jobs and repeated groups like "Soft Skills" or
+"Programming Languages" are held in memory once. Subtrees are identified by
+a digest computed bottom-up from their children's digests, so interning a
+tree is one pass over it.
+
+Interned trees are shared and must not be mutated; copy a node before
+changing it.
+
+Usage:
+    python tree_intern.py report [--job-dir DIR] [--top N]   # dedup ratio and memory per worker
+"""
+
+import os
+import sys
+import glob
+import json
+import hashlib
+import argparse
+import threading
+import subprocess
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+import metrics
+from skill_tree_common import assign_node_ids
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOB_SKILL_TREES_DIR = os.path.join(BASE_DIR, 'data', 'job_skill_trees')
+
+DIGEST_SIZE = 16
+
+
+class TreeInterner:
+    """Table of canonical subtrees and strings shared by every tree interned through it."""
+
+    def __init__(self, count_duplicates: bool = False):
+        self._nodes: Dict[bytes, Any] = {}
+        self._strings: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.nodes_seen = self.nodes_unique = 0
+        self.strings_seen = self.strings_unique = 0
+        # Occurrences per subtree digest (for the report)
+        self.duplicates: Optional[Counter] = Counter() if count_duplicates else None
+
+    def intern(self, tree: Any) -> Any:
+        """Return the canonical version of tree, sharing subtrees and strings with earlier trees."""
+        if tree is None:
+            return None
+        with self._lock:
+            return self._intern(tree)[0]
+
+    def release(self):
+        """
+        Drop the lookup tables (about a third of the interned corpus' memory) once a batch of
+        trees is loaded. Trees interned so far stay shared; later trees only share with each other.
+        """
+        with self._lock:
+            self._nodes = {}
+            self._strings = {}
+
+    def clear(self):
+        with self._lock:
+            self._nodes = {}
+            self._strings = {}
+            self.nodes_seen = self.nodes_unique = 0
+            self.strings_seen = self.strings_unique = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'nodes_seen': self.nodes_seen,
+            'nodes_unique': self.nodes_unique,
+            'strings_seen': self.strings_seen,
+            'strings_unique': self.strings_unique,
+        }
+
+    def _intern(self, value: Any) -> Tuple[Any, bytes]:
+        if isinstance(value, str):
+            self.strings_seen += 1
+            shared = self._strings.get(value)
+            if shared is None:
+                shared = self._strings[value] = value
+                self.strings_unique += 1
+            value = shared
+            return value, hashlib.blake2b(b's' + value.encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+        if isinstance(value, dict):
+            digest = hashlib.blake2b(b'd', digest_size=DIGEST_SIZE)
+            items = []
+            for key, item in value.items():
+                key, key_digest = self._intern(key)
+                item, item_digest = self._intern(item)
+                items.append((key_digest, item_digest, key, item))
+            # Key order does not change identity
+            for key_digest, item_digest, _, _ in sorted(items, key=lambda entry: entry[0]):
+                digest.update(key_digest)
+                digest.update(item_digest)
+            return self._share(digest.digest(), lambda: {key: item for _, _, key, item in items})
+
+        if isinstance(value, list):
+            digest = hashlib.blake2b(b'l', digest_size=DIGEST_SIZE)
+            items = []
+            for item in value:
+                item, item_digest = self._intern(item)
+                digest.update(item_digest)
+                items.append(item)
+            return self._share(digest.digest(), lambda: items)
+
+        # Numbers, booleans and None
+        return value, hashlib.blake2b(b'v' + repr(value).encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+    def _share(self, digest: bytes, build) -> Tuple[Any, bytes]:
+        self.nodes_seen += 1
+        if self.duplicates is not None:
+            self.duplicates[digest] += 1
+        node = self._nodes.get(digest)
+        if node is None:
+            node = self._nodes[digest] = build()
+            self.nodes_unique += 1
+        return node, digest
+
+    def node(self, digest: bytes) -> Any:
+        return self._nodes.get(digest)
+
+
+def load_job_trees(job_dir: str = JOB_SKILL_TREES_DIR, interner: Optional[TreeInterner] = None) -> List[Dict[str, Any]]:
+    """Parse every job tree in job_dir (with node ids, as the web app serves them), interning each as it is loaded when an interner is given."""
+    trees = []
+    for json_file in sorted(glob.glob(os.path.join(job_dir, 'job_*.json'))):
+        with open(json_file, 'r', encoding='utf-8') as f:
+            tree = json.load(f)
+        if tree.get('job_id'):
+            assign_node_ids(tree)
+            trees.append(interner.intern(tree) if interner else tree)
+    return trees
+
+
+def _rss_bytes() -> int:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _measure(mode: str, job_dir: str, traced: bool = False):
+    """Print the memory the job corpus adds to a fresh process, loaded plainly or interned."""
+    import gc
+    import tracemalloc
+
+    # Like the web app: intern while loading, then release the tables
+    interner = TreeInterner() if mode == 'interned' else None
+    if traced:
+        # Live heap bytes, free of allocator fragmentation
+        tracemalloc.start()
+    gc.collect()
+    before = _rss_bytes()
+    trees = load_job_trees(job_dir, interner)
+    if interner:
+        interner.release()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] if traced else _rss_bytes() - before
+    print(json.dumps({'bytes': used, 'trees': len(trees)}))
+
+
+def subtree_size(node: Any) -> int:
+    """Number of dicts and lists in a subtree."""
+    if isinstance(node, dict):
+        return 1 + sum(subtree_size(value) for value in node.values())
+    if isinstance(node, list):
+        return 1 + sum(subtree_size(value) for value in node)
+    return 0
+
+
+def report(job_dir: str = JOB_SKILL_TREES_DIR, top: int = 10):
+    trees = load_job_trees(job_dir)
+    interner = TreeInterner(count_duplicates=True)
+    for tree in trees:
+        interner.intern(tree)
+    stats = interner.stats()
+    print(f"{len(trees)} job trees")
+    print(f"  nodes (dicts and lists)  {stats['nodes_seen']:>8} loaded  {stats['nodes_unique']:>8} unique  "
+          f"{1 - stats['nodes_unique'] / stats['nodes_seen']:>6.1%} shared")
+    print(f"  strings                  {stats['strings_seen']:>8} loaded  {stats['strings_unique']:>8} unique  "
+          f"{1 - stats['strings_unique'] / stats['strings_seen']:>6.1%} shared")
+
+    # Named subtrees that save the most nodes by being shared
+    savings = []
+    for digest, count in interner.duplicates.items():
+        node = interner.node(digest)
+        if count > 1 and isinstance(node, dict) and node.get('children'):
+            savings.append(((count - 1) * subtree_size(node), count, node.get('name', '?')))
+    print(f"  {'most shared subtrees':40} {'copies':>6} {'nodes saved':>11}")
+    for saved, count, name in sorted(savings, reverse=True)[:top]:
+        print(f"  {name[:40]:40} {count:>6} {saved:>11}")
+
+    # Memory is measured in fresh interpreters so the two modes do not share allocations
+    for label, extra in (('live heap', ['--traced']), ('resident memory', [])):
+        results = {}
+        for mode in ('plain', 'interned'):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '_measure', mode, '--job-dir', job_dir] + extra,
+                capture_output=True, text=True, check=True).stdout
+            results[mode] = json.loads(output)['bytes']
+        reduction = 1 - results['interned'] / results['plain'] if results['plain'] else 0.0
+        print(f"{label + ' for the corpus:':28} {results['plain'] / 1e6:5.1f} MB plain, "
+              f"{results['interned'] / 1e6:5.1f} MB interned ({reduction:.0%} less per worker)")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Report skill tree dedup across the job corpus")
+    parser.add_argument('command', choices=('report', '_measure'))
+    parser.add_argument('mode', nargs='?', choices=('plain', 'interned'))
+    parser.add_argument('--job-dir', default=JOB_SKILL_TREES_DIR)
+    parser.add_argument('--top', type=int, default=10, help="shared subtrees listed")
+    parser.add_argument('--traced', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.command == '_measure':
+        _measure(args.mode, args.job_dir, args.traced)
+    else:
+        report(args.job_dir, args.top)
+
+
+def _interner_stats(interner: TreeInterner):
+    return lambda: {(kind,): value for kind, value in interner.stats().items()}
+
+
+# The interner used for job trees loaded by the web app
+job_trees = TreeInterner()
+
+metrics.gauge('skill_tree_intern', 'Skill tree nodes and strings loaded vs unique after interning', ('kind',),
+              callback=_interner_stats(job_trees))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Upload Handling
+Streams multipart file uploads into size-capped spooled temporary files
+(kept in memory up to a threshold, then rolled over to an anonymous file on
+disk), enforces per-endpoint size limits, removes orphaned files left in the
+upload folders and tracks bytes in flight.
+"""
+
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from typing import Dict, List, Optional, BinaryIO
+
+from flask import Flask, Request, current_app, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import metrics
+
+# Allowance for multipart boundaries and form fields on top of the file size cap
+FORM_OVERHEAD_BYTES = 64 * 1024
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class UploadStats:
+    """Process-wide counters for upload traffic."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bytes_in_flight = 0
+        self.peak_bytes_in_flight = 0
+        self.files_in_flight = 0
+        self.bytes_received_total = 0
+        self.files_total = 0
+        self.files_spilled_to_disk = 0
+        self.rejected_total = 0
+        self.orphans_removed_total = 0
+
+    def add(self, nbytes: int):
+        with self._lock:
+            self.bytes_in_flight += nbytes
+            self.bytes_received_total += nbytes
+            self.peak_bytes_in_flight = max(self.peak_bytes_in_flight, self.bytes_in_flight)
+
+    def opened(self):
+        with self._lock:
+            self.files_in_flight += 1
+            self.files_total += 1
+
+    def released(self, nbytes: int, spilled: bool):
+        with self._lock:
+            self.bytes_in_flight -= nbytes
+            self.files_in_flight -= 1
+            if spilled:
+                self.files_spilled_to_disk += 1
+
+    def rejected(self):
+        with self._lock:
+            self.rejected_total += 1
+
+    def orphans_removed(self, count: int):
+        with self._lock:
+            self.orphans_removed_total += count
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'bytes_in_flight': self.bytes_in_flight,
+                'peak_bytes_in_flight': self.peak_bytes_in_flight,
+                'files_in_flight': self.files_in_flight,
+                'bytes_received_total': self.bytes_received_total,
+                'files_total': self.files_total,
+                'files_spilled_to_disk': self.files_spilled_to_disk,
+                'rejected_total': self.rejected_total,
+                'orphans_removed_total': self.orphans_removed_total,
+            }
+
+
+stats = UploadStats()
+
+
+def _stat(name: str):
+    return lambda: {(): stats.snapshot()[name]}
+
+
+metrics.gauge('upload_bytes_in_flight', 'Bytes of uploaded files currently held by requests',
+              callback=_stat('bytes_in_flight'))
+metrics.gauge('upload_files_in_flight', 'Uploaded files currently held by requests',
+              callback=_stat('files_in_flight'))
+metrics.counter('upload_bytes_received_total', 'Bytes of uploaded files received',
+                callback=_stat('bytes_received_total'))
+metrics.counter('upload_files_spilled_total', 'Uploaded files that spilled from memory to disk',
+                callback=_stat('files_spilled_to_disk'))
+metrics.counter('upload_rejected_total', 'Uploads rejected for exceeding size limits',
+                callback=_stat('rejected_total'))
+metrics.counter('upload_orphans_removed_total', 'Orphaned upload files removed by the janitor',
+                callback=_stat('orphans_removed_total'))
+
+
+class SpooledUpload(tempfile.SpooledTemporaryFile):
+    """Spooled temporary file that enforces a size cap and reports bytes in flight."""
+
+    def __init__(self, max_bytes: Optional[int], spool_bytes: int, spool_dir: Optional[str] = None):
+        super().__init__(max_size=spool_bytes, mode='w+b', dir=spool_dir)
+        self.max_bytes = max_bytes
+        self.bytes_written = 0
+        self._released = False
+        stats.opened()
+
+    def write(self, data) -> int:
+        size = len(data)
+        if self.max_bytes is not None and self.bytes_written + size > self.max_bytes:
+            stats.rejected()
+            raise RequestEntityTooLarge()
+        self.bytes_written += size
+        stats.add(size)
+        return super().write(data)
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            stats.released(self.bytes_written, self._rolled)
+        super().close()
+
+
+class UploadRequest(Request):
+    """Request class that streams uploaded files into SpooledUpload files."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        max_bytes = config['UPLOAD_SIZE_LIMITS'].get(self.endpoint, config.get('UPLOAD_DEFAULT_SIZE_LIMIT'))
+        return SpooledUpload(max_bytes, config['UPLOAD_SPOOL_MAX_MEMORY'], config.get('UPLOAD_SPOOL_DIR'))
+
+
+def file_md5(stream: BinaryIO) -> str:
+    """MD5 of a seekable stream's content, read in chunks; rewinds the stream afterwards."""
+    stream.seek(0)
+    digest = hashlib.md5()
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def init_app(app: Flask, size_limits: Dict[str, int], spool_max_memory: int = 1024 * 1024,
+             spool_dir: Optional[str] = None, default_size_limit: Optional[int] = None):
+    """
+    Install bounded upload handling on a Flask app.
+
+    Args:
+        app: The Flask application
+        size_limits: Maximum uploaded file size in bytes per endpoint name
+        spool_max_memory: Bytes kept in memory per file before spilling to disk
+        spool_dir: Directory for spilled upload data
+        default_size_limit: File size cap for endpoints not in size_limits
+    """
+    app.request_class = UploadRequest
+    app.config['UPLOAD_SIZE_LIMITS'] = dict(size_limits)
+    app.config['UPLOAD_DEFAULT_SIZE_LIMIT'] = default_size_limit
+    app.config['UPLOAD_SPOOL_MAX_MEMORY'] = spool_max_memory
+    app.config['UPLOAD_SPOOL_DIR'] = spool_dir
+    app.config['MAX_CONTENT_LENGTH'] = max(list(size_limits.values()) + [default_size_limit or 0]) + FORM_OVERHEAD_BYTES
+
+    @app.before_request
+    def reject_oversized_upload():
+        limit = app.config['UPLOAD_SIZE_LIMITS'].get(request.endpoint)
+        if limit is not None and request.content_length and request.content_length > limit + FORM_OVERHEAD_BYTES:
+            stats.rejected()
+            raise RequestEntityTooLarge()
+
+    @app.errorhandler(RequestEntityTooLarge)
+    def upload_too_large(e):
+        limit = app.config['UPLOAD_SIZE_LIMITS'].get(request.endpoint, app.config['UPLOAD_DEFAULT_SIZE_LIMIT'])
+        message = 'File too large.'
+        if limit:
+            message += f' Maximum size is {limit / (1024 * 1024):.0f} MB.'
+        return jsonify({'error': message}), 413
+
+
+class UploadJanitor:
+    """Background thread that deletes stale files left behind in upload folders."""
+
+    def __init__(self, folders: List[str], max_age_seconds: float = 3600, interval_seconds: float = 600):
+        self.folders = folders
+        self.max_age_seconds = max_age_seconds
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def sweep(self) -> int:
+        """Remove files older than max_age_seconds; returns the number removed."""
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        for folder in self.folders:
+            try:
+                entries = list(os.scandir(folder))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    print(f"Error removing orphaned upload {entry.path}: {e}")
+        if removed:
+            stats.orphans_removed(removed)
+            print(f"Removed {removed} orphaned upload file(s)")
+        return removed
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sweep()
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        """Start the janitor thread in this process (safe to call again after fork)."""
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._stop.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='upload-janitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
@@ -0,0 +1,453 @@
+"""
+xAI API Client
+Shared helpers for calling the xAI chat-completions and audio-transcriptions
+endpoints. Every call is tagged with a call site name so latency and token
+usage can be attributed per feature, and is admitted by the rate-limiting
+scheduler (scheduler.py) according to its priority. Slow calls are hedged,
+and calls fail fast while a circuit breaker is open or the request deadline
+has passed (resilience.py).
+"""
+
+import io
+import os
+import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, BinaryIO, Callable, Optional
+
+import metrics
+import resilience
+import scheduler
+import tracing
+
+DEFAULT_API_BASE = "https://api.x.ai/v1"
+DEFAULT_TIMEOUT = 60
+
+# Times a call is re-queued after a 429 before the error reaches the caller
+MAX_RATE_LIMIT_RETRIES = 2
+DEFAULT_RETRY_AFTER = 5.0
+
+# Scheduler bucket for transcription calls, which have no model
+TRANSCRIPTION_MODEL = 'audio-transcriptions'
+
+# A second copy of a call is sent once the first has taken longer than this percentile of recent
+# latencies for its call site (but never sooner than HEDGE_MIN_DELAY seconds)
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_DELAY = 1.0
+HEDGE_MAX_WORKERS = 32
+HEDGE_MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+
+# Calls are not started with less than this much of the request deadline left
+MIN_CALL_TIME = 0.5
+
+# Calls currently waiting on the API, so shutdown can drain them
+_in_flight = 0
+_in_flight_changed = threading.Condition()
+
+
+def api_base() -> str:
+    """Base URL of the xAI API (overridable with XAI_API_BASE, e.g. for a local mock server)."""
+    return os.getenv('XAI_API_BASE', DEFAULT_API_BASE).rstrip('/')
+
+
+def _outcome(error: Exception) -> str:
+    import requests
+
+    if isinstance(error, requests.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.HTTPError):
+        if error.response is not None and error.response.status_code == 429:
+            return 'rate_limited'
+        return 'http_error'
+    return 'error'
+
+
+def in_flight() -> int:
+    """Number of API calls currently in progress in this process."""
+    return _in_flight
+
+
+def wait_idle(timeout: float) -> bool:
+    """Block until no API calls are in progress or timeout elapses; returns True if idle."""
+    with _in_flight_changed:
+        return _in_flight_changed.wait_for(lambda: _in_flight == 0, timeout)
+
+
+def _track(delta: int):
+    global _in_flight
+    with _in_flight_changed:
+        _in_flight += delta
+        _in_flight_changed.notify_all()
+
+
+metrics.gauge('upstream_requests_in_flight', 'xAI API calls currently in progress',
+              callback=lambda: {(): in_flight()})
+
+
+def _post(call_site: str, url: str, timeout: float, **kwargs) -> Dict[str, Any]:
+    # requests (and certifi's CA bundle lookup) is imported on the first call rather than at startup
+    import requests
+
+    start = time.perf_counter()
+    outcome = 'ok'
+    attempt = getattr(_attempts, 'current', None)
+    _track(1)
+    try:
+        if attempt is None:
+            response = requests.post(url, timeout=timeout, **kwargs)
+        else:
+            # A hedged copy: its connection is tracked so the copy that loses can be aborted
+            with requests.Session() as session:
+                session.mount('http://', _attempt_adapter())
+                session.mount('https://', _attempt_adapter())
+                response = session.post(url, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        result = response.json()
+    except Exception as e:
+        outcome = 'cancelled' if attempt is not None and attempt.cancelled else _outcome(e)
+        raise
+    finally:
+        _track(-1)
+        metrics.UPSTREAM_REQUEST_DURATION.observe(time.perf_counter() - start, call_site=call_site, outcome=outcome)
+    resilience.latency.record(call_site, time.perf_counter() - start)
+    metrics.record_token_usage(call_site, result)
+    return result
+
+
+def _retry_after(response) -> float:
+    try:
+        return float(response.headers.get('Retry-After', DEFAULT_RETRY_AFTER))
+    except ValueError:
+        return DEFAULT_RETRY_AFTER
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code == 429
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """Errors that count against the circuit breaker: the API is unreachable, slow or failing."""
+    import requests
+
+    if isinstance(error, requests.HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    return isinstance(error, requests.RequestException)
+
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+# Hedges are skipped rather than queued when every hedge worker is busy
+_hedge_slots = threading.BoundedSemaphore(HEDGE_MAX_WORKERS)
+
+
+def _hedge_pool() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix='xai-hedge')
+        return _hedge_executor
+
+
+class _Attempt:
+    """One copy of a hedged call; cancel() aborts its connection so the thread waiting on it returns."""
+
+    def __init__(self):
+        self.cancelled = False
+        self._sockets = []
+        self._lock = threading.Lock()
+
+    def track(self, sock):
+        with self._lock:
+            self._sockets.append(sock)
+            cancelled = self.cancelled
+        if cancelled:
+            _abort(sock)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            sockets = list(self._sockets)
+        for sock in sockets:
+            _abort(sock)
+
+
+def _abort(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+# Attempt whose connections are opened on this thread
+_attempts = threading.local()
+_adapter_class = None
+
+
+def _attempt_adapter():
+    """requests transport adapter that reports each new connection's socket to the thread's attempt."""
+    global _adapter_class
+    if _adapter_class is None:
+        from requests.adapters import HTTPAdapter
+        from urllib3.connection import HTTPConnection, HTTPSConnection
+        from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+        def track(connection):
+            attempt = getattr(_attempts, 'current', None)
+            if attempt is not None and connection.sock is not None:
+                attempt.track(connection.sock)
+
+        class TrackedHTTPConnection(HTTPConnection):
+            def connect(self):
+                super().connect()
+                track(self)
+
+        class TrackedHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                super().connect()
+                track(self)
+
+        class TrackedHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = TrackedHTTPConnection
+
+        class TrackedHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = TrackedHTTPSConnection
+
+        class AttemptAdapter(HTTPAdapter):
+            def init_poolmanager(self, *args, **kwargs):
+                super().init_poolmanager(*args, **kwargs)
+                self.poolmanager.pool_classes_by_scheme = {
+                    'http': TrackedHTTPConnectionPool, 'https': TrackedHTTPSConnectionPool}
+
+        _adapter_class = AttemptAdapter
+    return _adapter_class()
+
+
+def _run_attempt(attempt: _Attempt, send: Callable[[float], Dict[str, Any]], timeout: float) -> Dict[str, Any]:
+    _attempts.current = attempt
+    try:
+        return send(timeout)
+    finally:
+        _attempts.current = None
+
+
+def _send_hedged(call_site: str, model: str, priority: str, tokens: int,
+                 send: Callable[[float], Dict[str, Any]], timeout: float) -> Dict[str, Any]:
+    """
+    Send a call, racing a second copy if the first runs past the call site's recent p95 latency.
+
+    The first copy runs on the calling thread; the hedge runs on the hedge pool. Whichever answers
+    first aborts the other's connection.
+    """
+    delay = resilience.latency.percentile(call_site, HEDGE_PERCENTILE)
+    if delay is None:
+        return send(timeout)
+    delay = max(delay, HEDGE_MIN_DELAY)
+    if delay >= timeout:
+        return send(timeout)
+
+    first = _Attempt()
+    lock = threading.Lock()
+    state = {'first_done': False, 'hedge': None}
+
+    def hedge_done(future):
+        _hedge_slots.release()
+        if not future.cancelled() and future.exception() is None:
+            first.cancel()
+
+    def launch():
+        with lock:
+            if state['first_done'] or not _hedge_slots.acquire(blocking=False):
+                return
+            # Hedge only with spare rate-limit capacity; a hedge must never push other calls into the queue
+            if not scheduler.get_scheduler().try_acquire(model, priority, tokens):
+                _hedge_slots.release()
+                return
+            attempt = _Attempt()
+            future = _hedge_pool().submit(_run_attempt, attempt, send, timeout - delay)
+            state['hedge'] = (attempt, future)
+        future.add_done_callback(hedge_done)
+
+    timer = threading.Timer(delay, launch)
+    timer.daemon = True
+    timer.start()
+    error = None
+    try:
+        result = _run_attempt(first, send, timeout)
+    except Exception as e:
+        error = e
+    finally:
+        timer.cancel()
+        with lock:
+            state['first_done'] = True
+            hedge = state['hedge']
+
+    if hedge is None:
+        if error is not None:
+            raise error
+        return result
+    attempt, future = hedge
+    if error is None:
+        attempt.cancel()
+        future.add_done_callback(lambda f: _settle_loser(model, tokens, f))
+        resilience.HEDGED_REQUESTS.inc(call_site=call_site, winner='original')
+        return result
+    try:
+        result = future.result()
+    except Exception:
+        # Both copies failed; the original's error is the one the caller's retry policy understands
+        raise error
+    resilience.HEDGED_REQUESTS.inc(call_site=call_site, winner='hedge')
+    return result
+
+
+def _settle_loser(model: str, tokens: int, future):
+    # A losing hedge that completed before it was aborted reports its usage; an aborted one keeps
+    # its estimate, since the API may have charged for the work already done
+    if future.cancelled() or future.exception() is not None:
+        return
+    usage = future.result().get('usage') or {}
+    if tokens and usage.get('total_tokens'):
+        scheduler.get_scheduler().settle(model, tokens, usage['total_tokens'])
+
+
+def _scheduled(call_site: str, model: str, tokens: int, priority: Optional[str],
+               send: Callable[[float], Dict[str, Any]], timeout: float, hedge: bool = True) -> Dict[str, Any]:
+    """
+    Send a call once the circuit breaker, the request deadline and the scheduler allow it.
+
+    send(timeout) performs one attempt. Slow attempts are hedged, and a 429 pauses the model for
+    Retry-After and re-queues the call. The call is recorded as a span of the current trace.
+    """
+    priority = priority or scheduler.priority_for(call_site)
+    with tracing.span('xai_call', call_site=call_site, model=model, priority=priority) as call_span:
+        return _scheduled_call(call_site, model, tokens, priority, send, timeout, hedge, call_span)
+
+
+def _scheduled_call(call_site: str, model: str, tokens: int, priority: str,
+                    send: Callable[[float], Dict[str, Any]], timeout: float, hedge: bool,
+                    call_span: Optional[tracing.Span]) -> Dict[str, Any]:
+    import requests
+
+    gate = scheduler.get_scheduler()
+    circuit = resilience.breaker(model)
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        if call_span:
+            call_span.set(attempts=attempt + 1)
+        left = resilience.remaining()
+        if left is not None and left < MIN_CALL_TIME:
+            resilience.DEADLINE_EXCEEDED.inc(call_site=call_site)
+            raise resilience.DeadlineExceeded(f"No time left in the request deadline for the {call_site} call")
+        circuit.check()
+
+        call_timeout = timeout
+        try:
+            max_wait = scheduler.MAX_QUEUE_WAIT[priority]
+            with tracing.span('rate_limit_wait'):
+                gate.acquire(model, priority, tokens, timeout=max_wait if left is None else min(max_wait, left))
+            left = resilience.remaining()
+            if left is not None:
+                call_timeout = max(min(timeout, left), MIN_CALL_TIME)
+            if hedge:
+                result = _send_hedged(call_site, model, priority, tokens, send, call_timeout)
+            else:
+                result = send(call_timeout)
+        except Exception as e:
+            if isinstance(e, requests.Timeout) and call_timeout < timeout:
+                # Cut short by the request deadline, not a sign of an unhealthy upstream
+                circuit.cancel()
+            elif _is_upstream_failure(e):
+                circuit.record_failure()
+            elif isinstance(e, requests.HTTPError):
+                circuit.record_success()
+            else:
+                circuit.cancel()
+            if not _is_rate_limited(e) or attempt == MAX_RATE_LIMIT_RETRIES:
+                raise
+            gate.pause(model, _retry_after(e.response))
+            continue
+
+        circuit.record_success()
+        usage = result.get('usage') or {}
+        if call_span and usage.get('total_tokens'):
+            call_span.set(tokens=usage['total_tokens'])
+        if tokens and usage.get('total_tokens'):
+            gate.settle(model, tokens, usage['total_tokens'])
+        return result
+
+
+def chat_completion(call_site: str, api_key: str, messages: List[Dict[str, str]], model: str,
+                    temperature: float, timeout: float = DEFAULT_TIMEOUT,
+                    priority: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Call the chat-completions endpoint and return the parsed response body.
+
+    Args:
+        call_site: Name of the feature making the call (used as a metrics label)
+        api_key: xAI API key
+        messages: Chat messages
+        model: Model name
+        temperature: Sampling temperature
+        timeout: Request timeout in seconds
+        priority: Scheduler priority class (default from the call site, see scheduler.CALL_SITE_PRIORITY)
+
+    Raises:
+        requests.RequestException: On connection errors, timeouts and non-2xx responses
+        scheduler.QueueTimeout: If the call waited too long for rate-limit capacity
+        resilience.CircuitOpen: If the model's circuit breaker is open
+        resilience.DeadlineExceeded: If the current request's deadline has (nearly) passed
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+    payload = {
+        "messages": messages,
+        "model": model,
+        "stream": False,
+        "temperature": temperature
+    }
+    def send(attempt_timeout: float) -> Dict[str, Any]:
+        return _post(call_site, f"{api_base()}/chat/completions", attempt_timeout, headers=headers, json=payload)
+
+    return _scheduled(call_site, model, scheduler.estimate_tokens(messages), priority, send, timeout)
+
+
+def message_content(result: Dict[str, Any], default: str = '{}') -> str:
+    """Text of the first choice in a chat-completions response, with markdown code fences removed."""
+    content = result.get('choices', [{}])[0].get('message', {}).get('content', default)
+    content = content.strip()
+
+    # Remove markdown code blocks if present
+    if content.startswith('```'):
+        lines = content.split('\n')
+        content = '\n'.join([line for line in lines if not line.strip().startswith('```')])
+    return content
+
+
+def transcribe(call_site: str, api_key: str, filename: str, audio_file: BinaryIO, content_type: str,
+               timeout: float = DEFAULT_TIMEOUT, priority: Optional[str] = None) -> Dict[str, Any]:
+    """Call the audio-transcriptions endpoint and return the parsed response body (raises like chat_completion)."""
+    headers = {
+        "Authorization": f"Bearer {api_key}"
+    }
+    start = audio_file.tell()
+    size = audio_file.seek(0, os.SEEK_END) - start
+    audio_file.seek(start)
+    # A hedge needs its own copy of the body, so only small recordings are hedged
+    audio_bytes = audio_file.read() if size <= HEDGE_MAX_UPLOAD_BYTES else None
+
+    def send(attempt_timeout: float) -> Dict[str, Any]:
+        if audio_bytes is not None:
+            body = io.BytesIO(audio_bytes)
+        else:
+            # Rewind in case a rate-limited attempt already consumed the file
+            audio_file.seek(start)
+            body = audio_file
+        files = {
+            "file": (filename, body, content_type)
+        }
+        return _post(call_site, f"{api_base()}/audio/transcriptions", attempt_timeout, headers=headers, files=files)
+
+    return _scheduled(call_site, TRANSCRIPTION_MODEL, 0, priority, send, timeout, hedge=audio_bytes is not None)